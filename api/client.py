@@ -1,4 +1,5 @@
 import os
+import time
 import requests
 import logging
 import pytz
@@ -32,15 +33,26 @@ NBA_API_URL = "https://api.actionnetwork.com/web/v2/scoreboard/publicbetting/nba
 
 def make_request(url, params=None):
     """Make an API request with error handling"""
+    from services.metrics import metrics  # Import here to avoid circular imports
+    from services.tracing import tracer
+    endpoint = url.rstrip('/').rsplit('/', 1)[-1]  # e.g. "nba" or "ncaab"
+    started = time.perf_counter()
     try:
         logger.debug(f"Making API request to {url} with params {params}")
-        response = requests.get(url, headers=API_HEADERS, params=params, timeout=30)
+        with tracer.span('upstream_fetch', endpoint=endpoint):
+            response = requests.get(url, headers=API_HEADERS, params=params, timeout=30)
         response.raise_for_status()
         # Removed temporary logging of raw response
-        return response.json()
+        data = response.json()
+        metrics.observe('upstream_fetch', time.perf_counter() - started, endpoint=endpoint)
+        return data
     except requests.exceptions.RequestException as e:
+        metrics.observe('upstream_fetch', time.perf_counter() - started, success=False, endpoint=endpoint)
         logger.error(f"API request failed: {e}")
         return None
+    except Exception:
+        metrics.observe('upstream_fetch', time.perf_counter() - started, success=False, endpoint=endpoint)
+        raise
 
 def get_eastern_time_date(date_str=None):
     """Gets current date in Eastern Time (ET) zone in YYYYMMDD format."""
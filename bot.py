@@ -9,7 +9,7 @@ import sys
 # Import our modules
 from config import BOT_TOKEN, ADMIN_IDS
 from logging_setup import logger
-from middleware import MaintenanceMiddleware, ErrorHandlingMiddleware, UserTrackingMiddleware
+from middleware import FastPathMiddleware
 from services.alert_monitor import alert_monitor
 from services.metrics import metrics
 
@@ -17,6 +17,11 @@ async def on_startup(dispatcher: Dispatcher, bot: Bot):
     """Actions to perform on bot startup."""
     logger.info("Bot starting up...")
 
+    # Executor calls inherit the caller's context, so trace spans follow run_in_executor
+    from services.tracing import tracer, ContextThreadPoolExecutor
+    asyncio.get_running_loop().set_default_executor(ContextThreadPoolExecutor())
+    await tracer.start()
+
     # 2. Initial data fetch
     from utils.game_processing import fetch_and_store_data
     logger.info("Performing initial data fetch...")
@@ -24,6 +29,28 @@ async def on_startup(dispatcher: Dispatcher, bot: Bot):
     await fetch_and_store_data(sport="ncaab")
     logger.info("Initial data fetch complete.")
 
+    # Load fade alert subscriptions before the first alert scan
+    from services.subscriptions import subscription_manager
+    await subscription_manager.load()
+
+    # Start the user stats write-behind flusher
+    from services.user_manager import user_manager
+    await user_manager.start()
+
+    # Start outbox workers (resumes deliveries interrupted by the last shutdown)
+    from services.outbox import outbox
+    await outbox.start()
+
+    # Resume broadcasts interrupted by the last shutdown
+    from services.broadcast import broadcast_engine
+    await broadcast_engine.resume()
+
+    # Start the event loop lag sampler and the local Prometheus metrics endpoint
+    from services.loop_monitor import loop_monitor
+    from services.metrics_server import metrics_server
+    await loop_monitor.start()
+    await metrics_server.start()
+
     # 3. Start periodic tasks
     from tasks.periodic import start_periodic_tasks
     await start_periodic_tasks(bot)
@@ -56,6 +83,25 @@ async def on_shutdown(dispatcher: Dispatcher, bot: Bot):
         except Exception as e:
             logger.warning(f"Could not send shutdown notification to admin {admin_id}: {e}")
 
+    # Stop the fade pipeline, broadcasts, outbox workers and the send scheduler before the session goes away,
+    # then write out buffered user stats
+    from tasks.pipeline import fade_pipeline
+    from services.outbox import outbox
+    from services.broadcast import broadcast_engine
+    from services.send_scheduler import send_scheduler
+    await fade_pipeline.stop()
+    await broadcast_engine.stop()
+    await outbox.stop()
+    await send_scheduler.stop()
+    from services.user_manager import user_manager
+    await user_manager.stop()
+    from services.metrics_server import metrics_server
+    from services.loop_monitor import loop_monitor
+    await metrics_server.stop()
+    await loop_monitor.stop()
+    from services.tracing import tracer
+    await tracer.stop()
+
     # 2. Close bot session
     logger.info("Closing bot session...")
     try:
@@ -81,10 +127,8 @@ bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTM
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 
-# Register middlewares in order (outer middleware runs first)
-dp.update.outer_middleware(MaintenanceMiddleware())
-dp.update.outer_middleware(ErrorHandlingMiddleware())
-dp.update.outer_middleware(UserTrackingMiddleware())
+# One fused pre-dispatch middleware: maintenance, error handling, bans, rate limits and activity tracking
+dp.update.outer_middleware(FastPathMiddleware())
 
 # Register handlers
 from handlers import register_all_handlers
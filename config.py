@@ -1,6 +1,7 @@
 import os
 import asyncio
 import logging
+from types import MappingProxyType
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -28,22 +29,38 @@ if not ADMIN_IDS:
 
 COMMAND_TIMEOUT = 10  # seconds before considering a command "slow"
 
+# Prometheus metrics endpoint; bound to localhost by default, METRICS_PORT=0 disables it
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+try:
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+except ValueError:
+    print("ERROR: Invalid METRICS_PORT in environment variables. Metrics endpoint disabled.")
+    METRICS_PORT = 0
+
 class Config:
-    """Configuration management class for storing and retrieving bot settings."""
+    """
+    Configuration management class for storing and retrieving bot settings.
+
+    Settings are published as an immutable snapshot that is replaced on every
+    update (copy-on-write), so reads never take the lock; only writers serialize.
+    """
     def __init__(self):
-        self._settings = {
+        self._settings = MappingProxyType({
             # Default settings
             'max_retries': 3,
             'update_interval': 300,
             'maintenance_mode': False,
             'fade_rating_threshold': 3,
-        }
-        self._lock = asyncio.Lock()  # Lock for thread safety
+        })
+        self._lock = asyncio.Lock()  # Serializes writers only
+
+    def get(self, key, default=None):
+        """Get a configuration setting by key without awaiting (for per-update hot paths)."""
+        return self._settings.get(key, default)
 
     async def get_setting(self, key, default=None):
         """Get a configuration setting by key."""
-        async with self._lock:
-            return self._settings.get(key, default)
+        return self._settings.get(key, default)
 
     async def update_setting(self, key, value_str):
         """Update a setting with proper type conversion."""
@@ -66,7 +83,7 @@ class Config:
                     # New setting, use as string by default
                     value = value_str
                 
-                self._settings[key] = value
+                self._settings = MappingProxyType({**self._settings, key: value})
                 from logging_setup import logger
                 logger.info(f"Updated setting {key} to {value}")
                 return True
@@ -78,8 +95,7 @@ class Config:
 
     async def get_all_settings(self):
         """Get a dictionary of all settings."""
-        async with self._lock:
-            return self._settings.copy()
+        return dict(self._settings)
             
     def is_admin(self, user_id):
         """Check if a user ID is in the admin list."""
@@ -13,8 +13,8 @@ from .game_repo import (
     update_or_insert_data, get_scheduled_games, get_game_by_team
 )
 from .alert_repo import (
-    get_fade_alert_stats, get_recent_fade_alerts, get_pending_fade_alerts,
-    store_fade_alert, update_fade_alert_result
+    get_fade_alert_stats, get_fade_alert_stats_by_edge, get_fade_alert_clv_stats, get_recent_fade_alerts,
+    get_pending_fade_alerts, store_fade_alert, update_fade_alert_result
 )
 from .utils import get_eastern_time_date
 
@@ -34,7 +34,8 @@ __all__ = [
     # Game Repo functions
     'update_or_insert_data', 'get_scheduled_games', 'get_game_by_team',
     # Alert Repo functions
-    'get_fade_alert_stats', 'get_recent_fade_alerts', 'get_pending_fade_alerts',
+    'get_fade_alert_stats', 'get_fade_alert_stats_by_edge', 'get_fade_alert_clv_stats',
+    'get_recent_fade_alerts', 'get_pending_fade_alerts',
     'store_fade_alert', 'update_fade_alert_result',
     # Utils functions (already imported)
     'get_eastern_time_date'
@@ -2,7 +2,9 @@ import logging
 from datetime import datetime, timedelta
 import pytz
 from .connection import get_fade_alerts_collection, get_collection_name # Import getter function and name helper
-from typing import Optional
+from typing import Optional, List, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
 # Get logger
 logger = logging.getLogger(__name__)
@@ -54,6 +56,42 @@ def get_fade_alert_stats(sport=None, days=30):
         logger.error(f"Error getting fade alert stats: {e}")
         return []
 
+# Bucket edges for the vig-free fade signal (T% - fair probability), used to slice stats by edge
+FAIR_GAP_BUCKETS = [-100, 10, 20, 30, 40, 101]
+
+def get_fade_alert_stats_by_edge(sport=None, days=30):
+    """Gets settled fade alert results bucketed by the no-vig fade signal (T% - fair probability)."""
+    try:
+        cutoff_date = datetime.now(pytz.UTC) - timedelta(days=days)
+        match = {
+            "created_at": {"$gte": cutoff_date},
+            "status": {"$in": ["won", "lost"]},
+            "fair_gap": {"$type": "number"}
+        }
+        if sport:
+            match["sport"] = sport
+
+        pipeline = [
+            {"$match": match},
+            {
+                "$bucket": {
+                    "groupBy": "$fair_gap",
+                    "boundaries": FAIR_GAP_BUCKETS,
+                    "default": "other",
+                    "output": {
+                        "total": {"$sum": 1},
+                        "winners": {"$sum": {"$cond": [{"$eq": ["$status", "won"]}, 1, 0]}},
+                        "avg_hold": {"$avg": "$market_hold"},
+                        "avg_fade_ev": {"$avg": "$fade_ev"}
+                    }
+                }
+            }
+        ]
+        return list(get_fade_alerts_collection().aggregate(pipeline))
+    except Exception as e:
+        logger.error(f"Error getting fade alert stats by edge: {e}")
+        return []
+
 def get_recent_fade_alerts(sport=None, limit=10):
     """Gets most recent fade alerts with their results."""
     try:
@@ -139,6 +177,131 @@ def update_fade_alert_result(alert_id, status):
         logger.error(f"Error updating fade alert result: {e}")
         return False
 
+def bulk_update_fade_alert_results(results: List[Tuple[object, str]]) -> int:
+    """Updates the status of many fade alerts (by _id) in a single bulk write. Returns modified count."""
+    if not results:
+        return 0
+    try:
+        now = datetime.now(pytz.UTC)
+        operations = [
+            UpdateOne({"_id": alert_id}, {"$set": {"status": status, "updated_at": now}})
+            for alert_id, status in results
+        ]
+        result = get_fade_alerts_collection().bulk_write(operations, ordered=False)
+        return result.modified_count
+    except Exception as e:
+        logger.error(f"Error bulk updating {len(results)} fade alert results: {e}")
+        return 0
+
+def bulk_set_fade_alert_fields(updates: List[Tuple[object, dict]]) -> int:
+    """Sets arbitrary fields on many fade alerts (by _id) in a single bulk write. Returns modified count."""
+    if not updates:
+        return 0
+    try:
+        now = datetime.now(pytz.UTC)
+        operations = [
+            UpdateOne({"_id": alert_id}, {"$set": {**fields, "updated_at": now}})
+            for alert_id, fields in updates
+        ]
+        result = get_fade_alerts_collection().bulk_write(operations, ordered=False)
+        return result.modified_count
+    except Exception as e:
+        logger.error(f"Error bulk setting fields on {len(updates)} fade alerts: {e}")
+        return 0
+
+def get_fade_alerts_awaiting_close(sport: str, game_ids: list):
+    """Gets alerts on the given games whose closing line value has not been finalized yet."""
+    try:
+        return list(get_fade_alerts_collection().find({
+            "sport": sport,
+            "game_id": {"$in": game_ids},
+            "clv_final": {"$ne": True}
+        }))
+    except Exception as e:
+        logger.error(f"Error getting fade alerts awaiting close for {sport}: {e}")
+        return []
+
+def fade_alert_ref(alert: dict) -> str:
+    """
+    Natural key of a fade alert (sport, game, market, faded side, date). Freshly
+    stored alerts don't carry their _id back, so deliveries reference alerts by this.
+    """
+    return (f"{alert.get('sport')}:{alert.get('game_id')}:{alert.get('market')}:"
+            f"{alert.get('faded_outcome_label')}:{alert.get('date')}")
+
+def get_fade_alerts_for_games(game_ids: list) -> List[dict]:
+    """Gets every alert (any status) on the given games."""
+    try:
+        return list(get_fade_alerts_collection().find({"game_id": {"$in": game_ids}}))
+    except Exception as e:
+        logger.error(f"Error getting fade alerts for {len(game_ids)} games: {e}")
+        return []
+
+def get_pending_fade_alerts_for_games(game_ids: list, date: str) -> List[dict]:
+    """
+    Gets the pending alerts stored for the given games on a date. Errors are raised,
+    not swallowed: an empty result would read as "no alerts yet" and duplicate them.
+    """
+    return list(get_fade_alerts_collection().find({
+        "game_id": {"$in": game_ids},
+        "date": date,
+        "status": "pending"
+    }))
+
+def store_fade_alerts(alerts: List[dict]) -> List[dict]:
+    """
+    Stores many new fade alerts in one unordered write (see store_fade_alert).
+    Returns the alerts that were inserted; on a partial failure that is every alert
+    without a write error.
+    """
+    if not alerts:
+        return []
+    try:
+        now = datetime.now(pytz.UTC)
+        for alert in alerts:
+            alert["created_at"] = now
+            alert["updated_at"] = now
+        get_fade_alerts_collection().insert_many(alerts, ordered=False)
+        return alerts
+    except BulkWriteError as e:
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+        logger.error(f"Error storing {len(failed)} of {len(alerts)} fade alerts "
+                     f"({e.details.get('nInserted', 0)} inserted): {e}")
+        return [alert for index, alert in enumerate(alerts) if index not in failed]
+    except Exception as e:
+        logger.error(f"Error storing {len(alerts)} fade alerts: {e}")
+        return []
+
+def get_fade_alert_clv_stats(sport=None, days=30):
+    """Gets closing line value aggregates per sport for alerts whose CLV has been finalized."""
+    try:
+        cutoff_date = datetime.now(pytz.UTC) - timedelta(days=days)
+        match = {
+            "created_at": {"$gte": cutoff_date},
+            "clv_final": True,
+            "clv_price": {"$type": "number"}
+        }
+        if sport:
+            match["sport"] = sport
+
+        pipeline = [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": "$sport",
+                    "total": {"$sum": 1},
+                    "beat_close": {"$sum": {"$cond": [{"$gt": ["$clv_price", 0]}, 1, 0]}},
+                    "avg_clv_price": {"$avg": "$clv_price"},
+                    "avg_clv_line": {"$avg": "$clv_line"}
+                }
+            },
+            {"$sort": {"_id": 1}}
+        ]
+        return list(get_fade_alerts_collection().aggregate(pipeline))
+    except Exception as e:
+        logger.error(f"Error getting fade alert CLV stats: {e}")
+        return []
+
 def get_fade_alerts_since(date_str: str):
     """Gets all fade alerts created on or after a specific date (YYYYMMDD)."""
     try:
@@ -172,9 +335,3 @@ def update_fade_performance_stats(stats_data: dict):
     except Exception as e:
         logger.error(f"Error updating fade performance stats: {e}")
         return False
-
-def get_fade_alert_subscribers(game_id, sport):
-    """Placeholder: Get users subscribed to alerts for a specific game."""
-    # In a real implementation, this would query a user preferences/subscriptions table
-    logger.warning("Placeholder function get_fade_alert_subscribers called. Returning empty list.")
-    return [] # Return empty list for now
@@ -0,0 +1,76 @@
+import logging
+from datetime import datetime
+import pytz
+from typing import Optional, List
+from .connection import get_broadcasts_collection
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+def create_broadcast(text: str, admin_id: int, admin_chat_id: int, total_users: int) -> Optional[dict]:
+    """Records a new broadcast with an empty checkpoint. Returns the stored document."""
+    try:
+        now = datetime.now(pytz.UTC)
+        broadcast = {
+            "text": text,
+            "admin_id": admin_id,
+            "admin_chat_id": admin_chat_id,
+            "progress_message_id": None,
+            "status": "running",
+            "total_users": total_users,
+            "last_user_id": None, # Checkpoint: every user up to this ID has been queued in the outbox
+            "sent": 0,
+            "failed": 0,
+            "pruned": 0,
+            "started_at": now,
+            "updated_at": now
+        }
+        result = get_broadcasts_collection().insert_one(broadcast)
+        broadcast["_id"] = result.inserted_id
+        return broadcast
+    except Exception as e:
+        logger.error(f"Error creating broadcast by admin {admin_id}: {e}")
+        return None
+
+def checkpoint_broadcast(broadcast_id, last_user_id, sent: int, failed: int, pruned: int) -> bool:
+    """Advances a broadcast's checkpoint (every user up to it is queued) and stores its delivery totals."""
+    try:
+        get_broadcasts_collection().update_one(
+            {"_id": broadcast_id},
+            {"$set": {"last_user_id": last_user_id, "sent": sent, "failed": failed, "pruned": pruned,
+                      "updated_at": datetime.now(pytz.UTC)}}
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error checkpointing broadcast {broadcast_id}: {e}")
+        return False
+
+def update_broadcast(broadcast_id, **fields) -> bool:
+    """Sets arbitrary fields (status, progress_message_id, finished_at, ...) on a broadcast."""
+    try:
+        fields["updated_at"] = datetime.now(pytz.UTC)
+        get_broadcasts_collection().update_one({"_id": broadcast_id}, {"$set": fields})
+        return True
+    except Exception as e:
+        logger.error(f"Error updating broadcast {broadcast_id}: {e}")
+        return False
+
+def get_broadcast(broadcast_id) -> Optional[dict]:
+    """Gets a broadcast by ID."""
+    try:
+        return get_broadcasts_collection().find_one({"_id": broadcast_id})
+    except Exception as e:
+        logger.error(f"Error getting broadcast {broadcast_id}: {e}")
+        return None
+
+def get_running_broadcasts() -> List[dict]:
+    """
+    Gets broadcasts to resume: still running when the process stopped, or interrupted
+    because recipients could not be read (their checkpoint is intact).
+    """
+    try:
+        return list(get_broadcasts_collection().find(
+            {"status": {"$in": ["running", "interrupted"]}}).sort("started_at", 1))
+    except Exception as e:
+        logger.error(f"Error getting running broadcasts: {e}")
+        return []
@@ -1,7 +1,9 @@
 import os
+import sys
 import logging
+import threading
 from dotenv import load_dotenv
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, monitoring
 from pymongo.errors import OperationFailure
 
 # Get logger
@@ -12,8 +14,60 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME") # Get DB name from env
 
+class MongoOpStats(monitoring.CommandListener):
+    """
+    Per-command Mongo latency and failure counts, fed by pymongo's command monitoring.
+    Events arrive on executor threads, so updates are locked. Commands issued inside
+    a trace are also recorded as spans, named by command and collection.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ops = {}  # command name -> {'count', 'failed', 'total_seconds', 'max_seconds'}
+        self._targets = {}  # request id -> collection, for commands issued inside a trace
+
+    @staticmethod
+    def _tracer():
+        # Never imported from here: db loads before services, so only use it once it exists
+        tracing = sys.modules.get('services.tracing')
+        return tracing.tracer if tracing and tracing.tracer.current_span() is not None else None
+
+    def _record(self, event, failed: bool):
+        seconds = event.duration_micros / 1_000_000
+        target = self._targets.pop(event.request_id, None)
+        tracer = self._tracer()
+        if tracer:
+            name = f"mongo.{event.command_name}"
+            tracer.record(f"{name}:{target}" if target else name, seconds)
+        with self._lock:
+            op = self.ops.get(event.command_name)
+            if op is None:
+                op = self.ops[event.command_name] = {'count': 0, 'failed': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+            op['count'] += 1
+            op['total_seconds'] += seconds
+            op['max_seconds'] = max(op['max_seconds'], seconds)
+            if failed:
+                op['failed'] += 1
+
+    def started(self, event):
+        if self._tracer():
+            target = event.command.get(event.command_name)
+            if isinstance(target, str):
+                self._targets[event.request_id] = target
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(op) for name, op in self.ops.items()}
+
+mongo_op_stats = MongoOpStats()
+
 # MongoDB connection
-client = MongoClient(MONGO_URI)
+client = MongoClient(MONGO_URI, event_listeners=[mongo_op_stats])
 
 if not MONGO_DB_NAME:
     raise ValueError("MONGO_DB_NAME environment variable not set.")
@@ -82,6 +136,17 @@ def get_users_collection():
     # Typically, users should persist across modes, but adjust if needed
     return db["users"]
 
+def get_subscriptions_collection():
+    # Alert subscriptions belong to users, so they persist across modes like the users collection
+    return db["subscriptions"]
+
+def get_broadcasts_collection():
+    # Broadcasts target the (unprefixed) users collection, so they are not prefixed either
+    return db["broadcasts"]
+
+def get_outbox_collection():
+    return db[get_collection_name("outbox")]
+
 def get_raw_api_responses_collection():
     # Raw responses might also be shared or separated based on need
     return db[get_collection_name("raw_api_responses")]
@@ -111,15 +176,31 @@ def setup_indexes():
             ],
             "users": [ # Users collection is not prefixed
                 [("user_id", ASCENDING)],
-                [("last_seen", ASCENDING)]
+                [("last_seen", ASCENDING)],
+                [("blocked", ASCENDING), ("user_id", ASCENDING)],
+                [("ban.until", ASCENDING)] # Active bans, loaded at startup
             ],
+            "broadcasts": [ # Not prefixed
+                [("status", ASCENDING)]
+            ],
+            "subscriptions": [ # Not prefixed either
+                [("user_id", ASCENDING)],
+                [("active", ASCENDING), ("sports", ASCENDING), ("min_rating", ASCENDING)]
+            ],
+            "outbox": [
+                [("status", ASCENDING), ("next_attempt_at", ASCENDING)],
+                [("status", ASCENDING), ("priority", ASCENDING), ("rank", ASCENDING), ("next_attempt_at", ASCENDING)],
+                [("message_class", ASCENDING), ("created_at", ASCENDING)],
+                [("game_ids", ASCENDING), ("status", ASCENDING)], # Alert cards to edit in place
+                [("broadcast_id", ASCENDING), ("status", ASCENDING)] # Broadcast progress and cancellation
+            ], # Unique idempotency key index handled separately
              "raw_api_responses": [] # TTL index handled separately
         }
 
         # Create indexes for both normal and maintenance collections
         for base_name, indexes in collections_indexes.items():
             # Users collection is special, not prefixed
-            collection_names_to_index = [base_name] if base_name == "users" else [base_name, f"{MAINTENANCE_PREFIX}{base_name}"]
+            collection_names_to_index = [base_name] if base_name in ("users", "subscriptions", "broadcasts") else [base_name, f"{MAINTENANCE_PREFIX}{base_name}"]
             
             for collection_name in collection_names_to_index:
                 collection = db[collection_name]
@@ -134,6 +215,13 @@ def setup_indexes():
                         else:
                             logger.debug(f"Index {index_spec} already exists for {collection_name}")
         
+        # Unique idempotency keys so re-enqueueing a delivery is a no-op
+        for collection_name in ["outbox", f"{MAINTENANCE_PREFIX}outbox"]:
+            try:
+                db[collection_name].create_index([("idempotency_key", ASCENDING)], unique=True)
+            except OperationFailure as e:
+                logger.warning(f"Could not create unique idempotency index for {collection_name}: {e}")
+
         # Create TTL index for raw responses (expire after 24 hours)
         try:
             # Apply TTL index to both normal and maintenance raw response collections
@@ -104,6 +104,10 @@ def _process_game_data(raw_game_data: dict) -> Optional[dict]:
         return None # Indicate failure to process
 
 
+def process_raw_games(raw_games: list) -> list:
+    """Processes a list of raw API game objects, dropping any that fail to process."""
+    return [processed for raw_game in raw_games if (processed := _process_game_data(raw_game or {})) is not None]
+
 def get_scheduled_games(collection, date):
     """Gets scheduled games for the date with betting data."""
     try:
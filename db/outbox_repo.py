@@ -0,0 +1,269 @@
+import logging
+from datetime import datetime, timedelta
+import pytz
+from typing import List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from .connection import get_outbox_collection
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+def enqueue_outbox_messages(messages: List[dict]) -> int:
+    """
+    Adds messages to the outbox. Each message needs an idempotency_key, chat_id,
+    text and message_class; messages whose key is already in the outbox are ignored.
+    Returns the number of newly queued messages. Database errors are raised, so a
+    failed write can't be mistaken for a batch of duplicates.
+    """
+    if not messages:
+        return 0
+    now = datetime.now(pytz.UTC)
+    operations = []
+    for message in messages:
+        doc = {
+            "status": "pending",
+            "attempts": 0,
+            "parse_mode": None,
+            "priority": None,
+            "rank": 0, # Order within a priority class (lower first), e.g. alert rating/tip-off
+            "next_attempt_at": now,
+            "created_at": now,
+            **message,
+        }
+        operations.append(UpdateOne(
+            {"idempotency_key": message["idempotency_key"]},
+            {"$setOnInsert": doc},
+            upsert=True
+        ))
+    result = get_outbox_collection().bulk_write(operations, ordered=False)
+    return result.upserted_count
+
+def claim_outbox_messages(limit: int, lease_seconds: int = 60) -> List[dict]:
+    """
+    Atomically claims up to `limit` due messages for sending, in three round trips:
+    pick candidate IDs, flip the ones still claimable to 'sending' under a fresh
+    claim token, and read back what this call won (another worker may take some of
+    the candidates first). Messages stuck in 'sending' longer than the lease (e.g.
+    the worker died) are claimed again.
+    """
+    try:
+        now = datetime.now(pytz.UTC)
+        query = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "locked_at": {"$lt": now - timedelta(seconds=lease_seconds)}},
+        ]}
+        collection = get_outbox_collection()
+        candidates = [doc["_id"] for doc in collection.find(
+            query, {"_id": 1}, sort=[("priority", 1), ("rank", 1), ("next_attempt_at", 1)], limit=limit
+        )]
+        if not candidates:
+            return []
+        claim_id = ObjectId()
+        # Re-checking the query per document makes the flip atomic against other workers
+        collection.update_many(
+            {"_id": {"$in": candidates}, **query},
+            {"$set": {"status": "sending", "locked_at": now, "claim_id": claim_id}, "$inc": {"attempts": 1}}
+        )
+        claimed = list(collection.find({"_id": {"$in": candidates}, "claim_id": claim_id}))
+        order = {message_id: i for i, message_id in enumerate(candidates)}
+        claimed.sort(key=lambda doc: order[doc["_id"]])
+        return claimed
+    except Exception as e:
+        logger.error(f"Error claiming outbox messages: {e}")
+        return []
+
+def release_outbox_message(message_id) -> bool:
+    """
+    Puts a claimed message back in the queue without counting the attempt, e.g. when
+    its lease ran out while it was still waiting for the send scheduler.
+    """
+    try:
+        get_outbox_collection().update_one(
+            {"_id": message_id, "status": "sending"},
+            {"$set": {"status": "pending", "next_attempt_at": datetime.now(pytz.UTC)},
+             "$inc": {"attempts": -1}, "$unset": {"locked_at": ""}}
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error releasing outbox message {message_id}: {e}")
+        return False
+
+def mark_outbox_sent(message_id, telegram_message_id: Optional[int] = None) -> bool:
+    """Marks a message delivered, recording the Telegram message ID and delivery latency."""
+    try:
+        collection = get_outbox_collection()
+        now = datetime.now(pytz.UTC)
+        doc = collection.find_one({"_id": message_id}, {"created_at": 1})
+        latency_ms = None
+        if doc and doc.get("created_at"):
+            created_at = doc["created_at"]
+            if created_at.tzinfo is None:
+                created_at = pytz.UTC.localize(created_at)
+            latency_ms = (now - created_at).total_seconds() * 1000
+        collection.update_one(
+            {"_id": message_id},
+            {"$set": {"status": "sent", "sent_at": now, "latency_ms": latency_ms,
+                      "telegram_message_id": telegram_message_id, "last_error": None},
+             "$unset": {"locked_at": ""}}
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error marking outbox message {message_id} sent: {e}")
+        return False
+
+def mark_outbox_retry(message_id, error: str, delay_seconds: float) -> bool:
+    """Returns a failed message to the queue to be retried after a delay."""
+    try:
+        get_outbox_collection().update_one(
+            {"_id": message_id},
+            {"$set": {"status": "pending", "last_error": error,
+                      "next_attempt_at": datetime.now(pytz.UTC) + timedelta(seconds=delay_seconds)},
+             "$unset": {"locked_at": ""}}
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error scheduling retry for outbox message {message_id}: {e}")
+        return False
+
+def mark_outbox_failed(message_id, error: str, blocked: bool = False) -> bool:
+    """Marks a message permanently failed (no more retries); `blocked` when the chat blocked the bot or is gone."""
+    try:
+        get_outbox_collection().update_one(
+            {"_id": message_id},
+            {"$set": {"status": "failed", "last_error": error, "blocked": blocked, "failed_at": datetime.now(pytz.UTC)},
+             "$unset": {"locked_at": ""}}
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error marking outbox message {message_id} failed: {e}")
+        return False
+
+def mark_outbox_expired(message_id, reason: str) -> bool:
+    """Drops a message that is no longer worth sending (e.g. an alert whose game has started)."""
+    try:
+        get_outbox_collection().update_one(
+            {"_id": message_id},
+            {"$set": {"status": "expired", "last_error": reason, "expired_at": datetime.now(pytz.UTC)},
+             "$unset": {"locked_at": ""}}
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error expiring outbox message {message_id}: {e}")
+        return False
+
+def expire_broadcast_deliveries(broadcast_id, reason: str) -> int:
+    """Drops a broadcast's deliveries that haven't been sent yet (e.g. it was cancelled)."""
+    try:
+        result = get_outbox_collection().update_many(
+            {"broadcast_id": broadcast_id, "status": "pending"},
+            {"$set": {"status": "expired", "last_error": reason, "expired_at": datetime.now(pytz.UTC)}}
+        )
+        return result.modified_count
+    except Exception as e:
+        logger.error(f"Error expiring deliveries for broadcast {broadcast_id}: {e}")
+        return 0
+
+def get_broadcast_delivery_counts(broadcast_id) -> Optional[dict]:
+    """
+    Counts a broadcast's deliveries: queued (pending or sending), sent, failed,
+    pruned (failed because the user blocked the bot) and expired. None on error.
+    """
+    try:
+        counts = {"queued": 0, "sent": 0, "failed": 0, "pruned": 0, "expired": 0}
+        pipeline = [
+            {"$match": {"broadcast_id": broadcast_id}},
+            {"$group": {"_id": {"status": "$status", "blocked": "$blocked"}, "count": {"$sum": 1}}}
+        ]
+        for row in get_outbox_collection().aggregate(pipeline):
+            status = row["_id"].get("status")
+            if status in ("pending", "sending"):
+                counts["queued"] += row["count"]
+            elif status == "failed":
+                counts["pruned" if row["_id"].get("blocked") else "failed"] += row["count"]
+            elif status in counts:
+                counts[status] += row["count"]
+        return counts
+    except Exception as e:
+        logger.error(f"Error counting deliveries for broadcast {broadcast_id}: {e}")
+        return None
+
+def release_inflight_outbox_messages() -> int:
+    """Returns every 'sending' message to 'pending'. Called at startup, when no worker can still own them."""
+    try:
+        result = get_outbox_collection().update_many(
+            {"status": "sending"},
+            {"$set": {"status": "pending", "next_attempt_at": datetime.now(pytz.UTC)}, "$unset": {"locked_at": ""}}
+        )
+        return result.modified_count
+    except Exception as e:
+        logger.error(f"Error releasing in-flight outbox messages: {e}")
+        return 0
+
+def get_outbox_stats(hours: int = 24) -> List[dict]:
+    """
+    Gets delivery counts and latency for messages created in the last X hours,
+    per message class and, for alerts, per rating (the alert priority class).
+    """
+    try:
+        cutoff = datetime.now(pytz.UTC) - timedelta(hours=hours)
+        pipeline = [
+            {"$match": {"created_at": {"$gte": cutoff}}},
+            {
+                "$group": {
+                    "_id": {"message_class": "$message_class", "rating": "$rating"},
+                    "total": {"$sum": 1},
+                    "sent": {"$sum": {"$cond": [{"$eq": ["$status", "sent"]}, 1, 0]}},
+                    "failed": {"$sum": {"$cond": [{"$eq": ["$status", "failed"]}, 1, 0]}},
+                    "expired": {"$sum": {"$cond": [{"$eq": ["$status", "expired"]}, 1, 0]}},
+                    "pending": {"$sum": {"$cond": [{"$in": ["$status", ["pending", "sending"]]}, 1, 0]}},
+                    "retried": {"$sum": {"$cond": [{"$gt": ["$attempts", 1]}, 1, 0]}},
+                    "avg_latency_ms": {"$avg": "$latency_ms"},
+                    "max_latency_ms": {"$max": "$latency_ms"}
+                }
+            },
+            {"$sort": {"_id.message_class": 1, "_id.rating": -1}}
+        ]
+        return list(get_outbox_collection().aggregate(pipeline))
+    except Exception as e:
+        logger.error(f"Error getting outbox stats: {e}")
+        return []
+
+def get_alert_cards(game_ids: list, days: int = 3) -> List[dict]:
+    """
+    Gets delivered alert messages that show any of the given games and can still
+    be edited in place (sent within the last X days and not gone from the chat).
+    """
+    try:
+        cutoff = datetime.now(pytz.UTC) - timedelta(days=days)
+        return list(get_outbox_collection().find({
+            "game_ids": {"$in": game_ids},
+            "status": "sent",
+            "telegram_message_id": {"$ne": None},
+            "alert_refs": {"$exists": True},
+            "card_closed": {"$ne": True},
+            "created_at": {"$gte": cutoff},
+        }))
+    except Exception as e:
+        logger.error(f"Error getting alert cards for {len(game_ids)} games: {e}")
+        return []
+
+def update_alert_cards(edited: List[tuple], closed: List[object]) -> int:
+    """
+    Records edits applied to delivered alert cards: (message_id, new_text) pairs
+    store the text now shown; `closed` cards (deleted in the chat) stop being edited.
+    """
+    if not edited and not closed:
+        return 0
+    try:
+        now = datetime.now(pytz.UTC)
+        operations = [
+            UpdateOne({"_id": message_id}, {"$set": {"text": text, "edited_at": now}, "$inc": {"edit_count": 1}})
+            for message_id, text in edited
+        ]
+        operations += [UpdateOne({"_id": message_id}, {"$set": {"card_closed": True}}) for message_id in closed]
+        result = get_outbox_collection().bulk_write(operations, ordered=False)
+        return result.modified_count
+    except Exception as e:
+        logger.error(f"Error recording {len(edited)} alert card edits: {e}")
+        return 0
@@ -0,0 +1,69 @@
+import logging
+from datetime import datetime
+import pytz
+from typing import Optional, List
+from .connection import get_subscriptions_collection
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+def upsert_subscription(user_id: int, chat_id: int, sports: List[str], markets: List[str],
+                        min_rating: int, quiet_start: Optional[int] = None, quiet_end: Optional[int] = None) -> Optional[dict]:
+    """Creates or replaces a user's fade alert subscription. Returns the stored document."""
+    try:
+        now = datetime.now(pytz.UTC)
+        subscription = {
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "sports": sports,
+            "markets": markets,
+            "min_rating": min_rating,
+            "quiet_start": quiet_start,
+            "quiet_end": quiet_end,
+            "active": True,
+            "updated_at": now
+        }
+        get_subscriptions_collection().update_one(
+            {"user_id": user_id},
+            {"$set": subscription, "$setOnInsert": {"created_at": now}},
+            upsert=True
+        )
+        return subscription
+    except Exception as e:
+        logger.error(f"Error saving subscription for user {user_id}: {e}")
+        return None
+
+def set_subscription_quiet_hours(user_id: int, quiet_start: Optional[int], quiet_end: Optional[int]) -> bool:
+    """Updates the quiet hours (Eastern, 0-23) of an existing subscription."""
+    try:
+        result = get_subscriptions_collection().update_one(
+            {"user_id": user_id},
+            {"$set": {"quiet_start": quiet_start, "quiet_end": quiet_end, "updated_at": datetime.now(pytz.UTC)}}
+        )
+        return result.matched_count > 0
+    except Exception as e:
+        logger.error(f"Error setting quiet hours for user {user_id}: {e}")
+        return False
+
+def deactivate_subscription(user_id: int) -> bool:
+    """Turns off a user's subscription, keeping their preferences for a later /subscribe."""
+    try:
+        result = get_subscriptions_collection().update_one(
+            {"user_id": user_id, "active": True},
+            {"$set": {"active": False, "updated_at": datetime.now(pytz.UTC)}}
+        )
+        return result.modified_count > 0
+    except Exception as e:
+        logger.error(f"Error deactivating subscription for user {user_id}: {e}")
+        return False
+
+def get_active_subscriptions(sport: Optional[str] = None) -> List[dict]:
+    """Gets all active subscriptions, optionally only those covering a sport."""
+    try:
+        query = {"active": True}
+        if sport:
+            query["sports"] = sport
+        return list(get_subscriptions_collection().find(query, {"_id": 0}))
+    except Exception as e:
+        logger.error(f"Error getting active subscriptions: {e}")
+        return []
@@ -1,41 +1,106 @@
 import logging
 from datetime import datetime
+from typing import Optional
 import pytz
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from .connection import get_users_collection # Import the getter function
 
 # Get logger
 logger = logging.getLogger(__name__)
 
-async def save_user_stats(user_id, commands, last_seen, join_date=None, ban_history=None, warning_history=None):
-    """Save user statistics to database."""
+def save_user_stats_batch(updates: dict) -> list:
+    """
+    Writes buffered user activity in one bulk write. `updates` maps user_id to a delta:
+    command counts since the last flush (added with $inc), last_seen, join_date and new
+    ban/warning history entries (appended with $push). Returns the user IDs that could
+    not be written, so the caller can keep their deltas for the next flush.
+    """
+    if not updates:
+        return []
+    user_ids = list(updates.keys())
     try:
-        # Create document to update/insert
-        update_data = {
-            "user_id": user_id,
-            "commands": commands,
-            "last_seen": last_seen,
-            "updated_at": datetime.now(pytz.UTC)
-        }
-        
-        # Only add these fields if they have values
-        if join_date:
-            update_data["join_date"] = join_date
-            
-        if ban_history:
-            update_data["ban_history"] = ban_history
-            
-        if warning_history:
-            update_data["warning_history"] = warning_history
-        
-        # Upsert the user document
-        result = get_users_collection().update_one(
-            {"user_id": user_id},
-            {"$set": update_data},
-            upsert=True
+        now = datetime.now(pytz.UTC)
+        operations = []
+        for user_id in user_ids:
+            delta = updates[user_id]
+            update = {"$set": {"updated_at": now}}
+            if delta.get("last_seen"):
+                update["$set"]["last_seen"] = delta["last_seen"]
+                update["$set"]["blocked"] = False # Any interaction means the user can be messaged again
+            commands = {f"commands.{command.replace('.', '_')}": count
+                        for command, count in delta.get("commands", {}).items() if count}
+            if commands:
+                update["$inc"] = commands
+            if delta.get("join_date"):
+                update["$min"] = {"join_date": delta["join_date"]} # Keep the earliest join across restarts
+            history = {field: {"$each": delta[field]} for field in ("ban_history", "warning_history") if delta.get(field)}
+            if history:
+                update["$push"] = history
+            operations.append(UpdateOne({"user_id": user_id}, update, upsert=True))
+        get_users_collection().bulk_write(operations, ordered=False)
+        logger.debug(f"Saved stats for {len(operations)} users")
+        return []
+    except BulkWriteError as e:
+        failed = [user_ids[error["index"]] for error in e.details.get("writeErrors", [])]
+        logger.error(f"Error saving stats for {len(failed)} of {len(user_ids)} users: {e}")
+        return failed
+    except Exception as e:
+        logger.error(f"Error saving stats for {len(user_ids)} users: {e}")
+        return user_ids
+
+def get_user_state(user_id: int) -> Optional[dict]:
+    """
+    Loads the stats and history stored for one user, or None if the user is unknown.
+    Database errors are raised, so a failed read isn't mistaken for an unknown user.
+    """
+    return get_users_collection().find_one(
+        {"user_id": user_id},
+        {"_id": 0, "commands": 1, "last_seen": 1, "join_date": 1, "ban_history": 1, "warning_history": 1, "ban": 1}
+    )
+
+def save_user_ban(user_id: int, ban: dict) -> bool:
+    """
+    Stores a user's current ban ({until, reason, by_admin}); bans are looked up by ban.until.
+    Database errors are raised: a ban that only exists in memory would be lifted by a restart.
+    """
+    get_users_collection().update_one(
+        {"user_id": user_id},
+        {"$set": {"ban": ban, "updated_at": datetime.now(pytz.UTC)}},
+        upsert=True
+    )
+
+def get_active_bans(now: float) -> dict:
+    """Gets every ban that hasn't expired yet as {user_id: ban}. Database errors are raised."""
+    cursor = get_users_collection().find({"ban.until": {"$gt": now}}, {"_id": 0, "user_id": 1, "ban": 1})
+    return {doc["user_id"]: doc["ban"] for doc in cursor if doc.get("user_id") is not None}
+
+def get_user_ids_page(after_user_id=None, limit: int = 500) -> list:
+    """
+    Gets the next page of reachable user IDs in ascending order, for streaming broadcasts.
+    Database errors are raised: an empty page means the end of the stream, so a failed
+    read must not look like one.
+    """
+    query = {"blocked": {"$ne": True}}
+    if after_user_id is not None:
+        query["user_id"] = {"$gt": after_user_id}
+    cursor = get_users_collection().find(query, {"_id": 0, "user_id": 1}).sort("user_id", 1).limit(limit)
+    return [doc["user_id"] for doc in cursor if doc.get("user_id") is not None]
+
+def count_reachable_users() -> int:
+    """Counts users that have not blocked the bot. Database errors are raised rather than read as zero users."""
+    return get_users_collection().count_documents({"blocked": {"$ne": True}})
+
+def mark_users_blocked(user_ids: list) -> int:
+    """Flags users who blocked the bot (or deleted their account) so sends skip them."""
+    if not user_ids:
+        return 0
+    try:
+        result = get_users_collection().update_many(
+            {"user_id": {"$in": user_ids}},
+            {"$set": {"blocked": True, "blocked_at": datetime.now(pytz.UTC)}}
         )
-        
-        logger.debug(f"Saved stats for user {user_id}")
-        return True
+        return result.modified_count
     except Exception as e:
-        logger.error(f"Error saving user stats for {user_id}: {e}")
-        return False
\ No newline at end of file
+        logger.error(f"Error marking {len(user_ids)} users blocked: {e}")
+        return 0
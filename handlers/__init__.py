@@ -3,6 +3,8 @@ from .general import register_general_handlers
 from .nba import register_nba_handlers
 from .ncaab import register_ncaab_handlers
 from .fade import register_fade_handlers
+from .subscription import register_subscription_handlers
+from .slate import register_slate_handlers
 from .admin import register_admin_handlers
 
 def register_all_handlers(dp: Dispatcher):
@@ -13,5 +15,7 @@ def register_all_handlers(dp: Dispatcher):
     register_nba_handlers(dp)
     register_ncaab_handlers(dp)
     register_fade_handlers(dp)
+    register_subscription_handlers(dp)
+    register_slate_handlers(dp)
     
     # Import and register any other handlers here
\ No newline at end of file
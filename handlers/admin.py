@@ -2,6 +2,7 @@ from aiogram import Router, F, types
 from aiogram.filters import Command
 from aiogram.exceptions import TelegramAPIError
 import asyncio
+import html
 import time
 from datetime import datetime, timedelta
 
@@ -12,6 +13,16 @@ from utils.message_helpers import send_long_message
 from services.user_manager import user_manager
 from services.metrics import metrics
 from services.alert_monitor import alert_monitor
+from services.send_scheduler import send_scheduler, PRIORITY_REPLY
+from services.outbox import outbox
+from services.broadcast import broadcast_engine
+from services.alert_cards import alert_cards
+from services.admission import admission
+from services.slate_cache import slate_cache
+from services.tracing import tracer
+from services.loop_monitor import loop_monitor
+from tasks.pipeline import fade_pipeline
+from utils.render_cache import render_cache
 from db.connection import is_maintenance_mode, set_maintenance_mode, clear_maintenance_collections
 
 
@@ -22,13 +33,13 @@ router = Router()
 async def cmd_warn(message: types.Message):
     """Warn a user (admin only)."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     try:
         args = message.text.split(maxsplit=2)
         if len(args) < 3:
-            await message.answer(
+            await send_scheduler.answer(message,
                 "Usage: `/warn <user\\_id> <reason>`\n"  # Escape _ for MarkdownV2
                 "Example: `/warn 123456 Spamming commands`",
                 parse_mode="MarkdownV2"
@@ -39,12 +50,12 @@ async def cmd_warn(message: types.Message):
         reason = args[2].strip()
 
         if not user_id_str.isdigit():
-            await message.answer(f"❌ Invalid User ID: '{user_id_str}'. Must be an integer.")
+            await send_scheduler.answer(message, f"❌ Invalid User ID: '{user_id_str}'. Must be an integer.")
             return
         user_id = int(user_id_str)
 
         if not reason:
-            await message.answer("❌ Please provide a reason for the warning.")
+            await send_scheduler.answer(message, "❌ Please provide a reason for the warning.")
             return
 
         await user_manager.warn_user(user_id, reason, message.from_user.id)
@@ -60,19 +71,22 @@ async def cmd_warn(message: types.Message):
         if warning_count >= 3:
             ban_duration_hours = 24
             ban_reason = f"Automatic {ban_duration_hours}h ban after {warning_count} warnings."
-            await user_manager.tempban_user(user_id, ban_duration_hours, ban_reason, message.from_user.id)
-
-            admin_feedback += f"\n\n🚫 User `{user_id}` automatically banned for {ban_duration_hours} hours due to repeated warnings." # Use Markdown code format for ID
-            user_notification += f"🚫 *You have been automatically banned for {hbold(str(ban_duration_hours))} hours.*" # Use MarkdownV2 bold
+            try:
+                await user_manager.tempban_user(user_id, ban_duration_hours, ban_reason, message.from_user.id)
+            except Exception as e:
+                logger.error(f"Could not save automatic ban for user {user_id}: {e}", exc_info=True)
+                admin_feedback += "\n\n❌ The automatic ban could not be saved, so it was not applied\\. Use /tempban to retry\\."
+            else:
+                admin_feedback += f"\n\n🚫 User `{user_id}` automatically banned for {ban_duration_hours} hours due to repeated warnings." # Use Markdown code format for ID
+                user_notification += f"🚫 *You have been automatically banned for {hbold(str(ban_duration_hours))} hours.*" # Use MarkdownV2 bold
         else:
             user_notification += f"Accumulating multiple warnings ({warning_count}/3) may lead to a temporary ban."
 
-        await message.answer(admin_feedback, parse_mode="MarkdownV2")
+        await send_scheduler.answer(message, admin_feedback, parse_mode="MarkdownV2")
 
         # Notify the warned user
         try:
-            from bot import bot  # Import here to avoid circular imports
-            await bot.send_message(user_id, user_notification, parse_mode="MarkdownV2")
+            await send_scheduler.send_message(user_id, user_notification, parse_mode="MarkdownV2")
         except TelegramAPIError as e:
             logger.warning(f"Could not notify user {user_id} about warning (they might have blocked the bot): {e}")
         except Exception as e:
@@ -80,7 +94,7 @@ async def cmd_warn(message: types.Message):
 
     except Exception as e:
         logger.error(f"Error in /warn command: {e}", exc_info=True)
-        await message.answer("❌ An error occurred while issuing the warning.")
+        await send_scheduler.answer(message, "❌ An error occurred while issuing the warning.")
 
 
 @router.message(Command("tempban"))
@@ -88,13 +102,13 @@ async def cmd_warn(message: types.Message):
 async def cmd_tempban(message: types.Message):
     """Temporarily ban a user (admin only)."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     try:
         args = message.text.split(maxsplit=3)
         if len(args) < 4:
-            await message.answer(
+            await send_scheduler.answer(message,
                 "Usage: `/tempban <user\\_id> <hours> <reason>`\n" # Escape _ for MarkdownV2
                 "Example: `/tempban 123456 48 Repeated spam`",
                 parse_mode="MarkdownV2"
@@ -106,28 +120,33 @@ async def cmd_tempban(message: types.Message):
         reason = args[3].strip()
 
         if not user_id_str.isdigit():
-            await message.answer(f"❌ Invalid User ID: '{user_id_str}'. Must be an integer.")
+            await send_scheduler.answer(message, f"❌ Invalid User ID: '{user_id_str}'. Must be an integer.")
             return
         user_id = int(user_id_str)
 
         if not duration_str.isdigit():
-            await message.answer(f"❌ Invalid duration: '{duration_str}'. Must be an integer number of hours.")
+            await send_scheduler.answer(message, f"❌ Invalid duration: '{duration_str}'. Must be an integer number of hours.")
             return
         duration_hours = int(duration_str)
 
         if not (1 <= duration_hours <= 720):  # Limit ban duration (e.g., 1 hour to 30 days)
-            await message.answer("❌ Ban duration must be between 1 and 720 hours.")
+            await send_scheduler.answer(message, "❌ Ban duration must be between 1 and 720 hours.")
             return
 
         if not reason:
-            await message.answer("❌ Please provide a reason for the temporary ban.")
+            await send_scheduler.answer(message, "❌ Please provide a reason for the temporary ban.")
             return
 
         from aiogram.utils.markdown import hbold, hitalic, hcode, hlink, hpre, escape_md # Import escape_md (if not already imported)
         escaped_reason = escape_md(reason) # Escape user-provided reason
 
-        await user_manager.tempban_user(user_id, duration_hours, reason, message.from_user.id)
-        await message.answer(
+        try:
+            await user_manager.tempban_user(user_id, duration_hours, reason, message.from_user.id)
+        except Exception as e:
+            logger.error(f"Could not save ban for user {user_id}: {e}", exc_info=True)
+            await send_scheduler.answer(message, f"❌ The ban for user {user_id} could not be saved, so it was not applied. Please try again.")
+            return
+        await send_scheduler.answer(message,
             f"🚫 User `{user_id}` has been temporarily banned.\n" # Use Markdown code format for ID
             f"Duration: {duration_hours} hours\n"
             f"Reason: {escaped_reason}",
@@ -136,11 +155,10 @@ async def cmd_tempban(message: types.Message):
 
         # Notify the banned user
         try:
-            from bot import bot  # Import here to avoid circular imports
             from aiogram.utils.markdown import hbold, escape_md # Import escape_md (if not already imported)
             escaped_reason = escape_md(reason) # Escape user-provided reason
 
-            await bot.send_message(
+            await send_scheduler.send_message(
                 user_id,
                 f"🚫 You have been temporarily banned for {hbold(str(duration_hours))} hours.\n" # Use MarkdownV2 bold
                 f"Reason: {escaped_reason}\n\n"
@@ -154,7 +172,7 @@ async def cmd_tempban(message: types.Message):
 
     except Exception as e:
         logger.error(f"Error in /tempban command: {e}", exc_info=True)
-        await message.answer("❌ An error occurred while processing the temporary ban.")
+        await send_scheduler.answer(message, "❌ An error occurred while processing the temporary ban.")
 
 
 @router.message(Command("userinfo"))
@@ -162,18 +180,18 @@ async def cmd_tempban(message: types.Message):
 async def cmd_userinfo(message: types.Message):
     """View detailed user information and history (admin only)."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     try:
         args = message.text.split()
         if len(args) < 2:
-            await message.answer("Usage: /userinfo [user_id]")
+            await send_scheduler.answer(message, "Usage: /userinfo [user_id]")
             return
 
         user_id_str = args[1]
         if not user_id_str.isdigit():
-            await message.answer(f"❌ Invalid User ID: '{user_id_str}'. Must be an integer.")
+            await send_scheduler.answer(message, f"❌ Invalid User ID: '{user_id_str}'. Must be an integer.")
             return
         user_id = int(user_id_str)
 
@@ -183,12 +201,12 @@ async def cmd_userinfo(message: types.Message):
             try:
                 from bot import bot  # Import here to avoid circular imports
                 user = await bot.get_chat(user_id)
-                await message.answer(f"⚠️ User {user_id} ({user.full_name}) exists but has no activity stats.")
+                await send_scheduler.answer(message, f"⚠️ User {user_id} ({user.full_name}) exists but has no activity stats.")
             except TelegramAPIError:
-                await message.answer(f"❌ User {user_id} not found in Telegram or our records.")
+                await send_scheduler.answer(message, f"❌ User {user_id} not found in Telegram or our records.")
             except Exception as e:
                 logger.error(f"Error checking user existence in TG: {e}", exc_info=True)
-                await message.answer(f"❌ User {user_id} not found in our records.")
+                await send_scheduler.answer(message, f"❌ User {user_id} not found in our records.")
             return
 
         current_time = time.time()
@@ -250,7 +268,7 @@ async def cmd_userinfo(message: types.Message):
 
     except Exception as e:
         logger.error(f"Error in /userinfo command: {e}", exc_info=True)
-        await message.answer("❌ Error retrieving user information.")
+        await send_scheduler.answer(message, "❌ Error retrieving user information.")
 
 
 @router.message(Command("banlist"))
@@ -258,19 +276,17 @@ async def cmd_userinfo(message: types.Message):
 async def cmd_banlist(message: types.Message):
     """View currently banned users (admin only)."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     try:
         current_time = time.time()
         banned_list_details = []
 
-        # Access safely if UserManager becomes async
-        async with user_manager._lock:
-            active_bans = {uid: info for uid, info in user_manager.banned_users.items() if info['until'] > current_time}
+        active_bans = user_manager.get_active_bans()
 
         if not active_bans:
-            await message.answer("✅ No users are currently banned.")
+            await send_scheduler.answer(message, "✅ No users are currently banned.")
             return
 
         ban_msg = ["🚫 <b>Currently Banned Users:</b>\n"]
@@ -289,7 +305,7 @@ async def cmd_banlist(message: types.Message):
 
     except Exception as e:
         logger.error(f"Error in /banlist command: {e}", exc_info=True)
-        await message.answer("❌ Error retrieving ban list.")
+        await send_scheduler.answer(message, "❌ Error retrieving ban list.")
 
 
 @router.message(Command("botstats"))
@@ -297,7 +313,7 @@ async def cmd_banlist(message: types.Message):
 async def cmd_botstats(message: types.Message):
     """Displays bot performance and usage statistics (admin only)."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     try:
@@ -312,13 +328,14 @@ async def cmd_botstats(message: types.Message):
         stats_msg.append(f"📉 Overall Error Rate: {stats['overall_error_rate']:.2f}%")
 
         if stats["command_stats"]:
-            stats_msg.append("\n🚀 <b>Command Performance (Top 10 by Usage):</b>")
+            stats_msg.append(f"\n🚀 <b>Command Latency, last {stats['window_minutes']:.0f} min (Top 10 by Usage):</b>")
             limit = 10
             count = 0
             for cmd, cmd_stats in stats["command_stats"].items():
                 stats_msg.append(
                     f"/{cmd}: {cmd_stats['usage_count']} uses, "
-                    f"{cmd_stats['avg_latency_ms']:.0f}ms avg, "
+                    f"p50 {cmd_stats['p50_ms']:.0f}ms, p90 {cmd_stats['p90_ms']:.0f}ms, "
+                    f"p99 {cmd_stats['p99_ms']:.0f}ms, p99.9 {cmd_stats['p999_ms']:.0f}ms, "
                     f"{cmd_stats['error_rate_percent']:.1f}% errors"
                 )
                 count += 1
@@ -329,14 +346,105 @@ async def cmd_botstats(message: types.Message):
                 stats_msg.append(f"... and {len(stats['command_stats']) - limit} more commands")
 
         else:
-            stats_msg.append("\nNo command performance data logged yet.")
+            stats_msg.append(f"\nNo commands logged in the last {stats['window_minutes']:.0f} minutes.")
+
+        send_stats = send_scheduler.get_stats()
+        depth = send_stats['queue_depth']
+        latency = send_stats['avg_latency_ms']
+        stats_msg.append("\n📤 <b>Outbound Send Queue:</b>")
+        stats_msg.append(
+            f"Queued: {sum(depth.values())} (reply {depth['reply']}, alert {depth['alert']}, broadcast {depth['broadcast']})"
+        )
+        stats_msg.append(
+            f"Throughput: {send_stats['throughput_per_sec']:.1f} msg/s (last 60s), "
+            f"{send_stats['sent']} sent, {send_stats['failed']} failed"
+        )
+        stats_msg.append(
+            f"Avg latency: reply {latency['reply']:.0f}ms, alert {latency['alert']:.0f}ms, broadcast {latency['broadcast']:.0f}ms"
+        )
+        stats_msg.append(f"Flood waits (RetryAfter): {send_stats['retry_after']}, retried {send_stats['retried']}")
+        if send_stats['paused_for'] > 0:
+            stats_msg.append(f"⏸️ Paused for {send_stats['paused_for']:.0f}s by Telegram flood control")
+
+        for live in broadcast_engine.get_live_stats():
+            stats_msg.append(
+                f"📣 Broadcast {live['broadcast_id']}: {live['processed']}/{live['total']} processed, "
+                f"{live['pruned']} pruned, {live['rate']:.1f} msg/s"
+            )
+
+        cache_stats = render_cache.get_stats()
+        stats_msg.append("\n🗂️ <b>Alert Render Cache:</b>")
+        stats_msg.append(
+            f"Hit ratio: {cache_stats['hit_ratio']:.1f}% ({cache_stats['hits']} hits, {cache_stats['misses']} misses), "
+            f"{cache_stats['entries']}/{cache_stats['max_entries']} entries"
+        )
+        slate_stats = slate_cache.get_stats()
+        stats_msg.append(
+            f"Slate pages: {slate_stats['hit_ratio']:.1f}% served from cache "
+            f"({slate_stats['hits']}/{slate_stats['hits'] + slate_stats['misses']}), {slate_stats['slates']} slates cached"
+        )
+
+        outbox_stats = await outbox.get_stats(hours=24)
+        if outbox_stats:
+            stats_msg.append("\n📬 <b>Outbox Delivery (24h):</b>")
+            for row in outbox_stats:
+                avg_latency = row.get('avg_latency_ms')
+                max_latency = row.get('max_latency_ms')
+                latency_str = f", latency avg {avg_latency / 1000:.1f}s / max {max_latency / 1000:.1f}s" if avg_latency is not None else ""
+                group = row.get('_id') or {}
+                label = group.get('message_class')
+                if group.get('rating'):
+                    label = f"{label} {group['rating']}★"
+                expired_str = f", {row['expired']} expired" if row.get('expired') else ""
+                stats_msg.append(
+                    f"{label}: {row.get('sent', 0)}/{row.get('total', 0)} sent, "
+                    f"{row.get('pending', 0)} pending, {row.get('failed', 0)} failed{expired_str}, "
+                    f"{row.get('retried', 0)} retried{latency_str}"
+                )
+
+        pipeline_stats = fade_pipeline.get_stats()
+        stats_msg.append("\n🛠️ <b>Fade Pipeline:</b>")
+        stats_msg.append(
+            f"Runs: {pipeline_stats['completed']} completed, {pipeline_stats['unchanged']} unchanged, "
+            f"{pipeline_stats['failed']} failed, {pipeline_stats['inflight']} in flight"
+        )
+        for name, stage in pipeline_stats['stages'].items():
+            stats_msg.append(
+                f"{name}: {stage['jobs']} jobs, avg {stage['avg_ms']:.0f}ms, max {stage['max_ms']:.0f}ms, "
+                f"{stage['queued']} queued, {stage['errors']} errors"
+            )
+
+        card_stats = alert_cards.get_stats()
+        stats_msg.append(
+            f"🃏 Alert cards edited in place: {card_stats['edited']} "
+            f"({card_stats['unchanged']} unchanged, {card_stats['closed']} closed, {card_stats['failed']} failed)"
+        )
+
+        flush_stats = user_manager.get_flush_stats()
+        stats_msg.append(
+            f"💾 User stats write-behind: {flush_stats['dirty']} pending, {flush_stats['users_written']} saved in "
+            f"{flush_stats['flushes']} flushes (last {flush_stats['last_flush_ms']:.0f}ms), {flush_stats['failed']} retried"
+        )
+        user_cache = user_manager.get_cache_stats()
+        stats_msg.append(
+            f"👥 User cache: {user_cache['cached']}/{user_manager.max_cached_users} loaded, "
+            f"{user_cache['hit_ratio']:.1f}% hits, {user_cache['evictions']} evicted, {user_cache['active_bans']} active bans"
+        )
+
+        stats_msg.append("\n🚦 <b>Admission Control:</b>")
+        for name, adm in admission.get_stats().items():
+            stats_msg.append(
+                f"{name}: {adm['running']}/{adm['limit']} running, {adm['waiting']} waiting, {adm['admitted']} admitted, "
+                f"{adm['queued']} queued (avg wait {adm['avg_wait_ms']:.0f}ms, max {adm['max_wait_ms']:.0f}ms), "
+                f"shed {adm['shed_full']} full / {adm['shed_timeout']} timed out, {adm['served_stale']} served cached"
+            )
 
         full_message = "\n".join(stats_msg)
         await send_long_message(message.chat.id, full_message)
 
     except Exception as e:
         logger.error(f"Error in /botstats command: {e}", exc_info=True)
-        await message.answer("❌ An error occurred while generating bot statistics.")
+        await send_scheduler.answer(message, "❌ An error occurred while generating bot statistics.")
 
 
 @router.message(Command("health"))
@@ -344,7 +452,7 @@ async def cmd_botstats(message: types.Message):
 async def cmd_health(message: types.Message):
     """Checks system health (CPU, Memory) - Admin only."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     try:
@@ -368,11 +476,69 @@ async def cmd_health(message: types.Message):
             # f"💾 DB Status: {'Connected' if db_status else 'Disconnected'}"
         ]
 
-        await message.answer("\n".join(health_msg))
+        lag = loop_monitor.get_stats()
+        health_msg.append(
+            f"🐢 Event Loop Lag: p50 {lag['p50_ms']:.1f}ms, p99 {lag['p99_ms']:.1f}ms, "
+            f"max {lag['max_ms']:.0f}ms, {lag['stalls']} stalls"
+        )
+        offenders = loop_monitor.get_offenders(limit=5)
+        if offenders:
+            health_msg.append("\n<b>Blocking Call Sites (by total stall time):</b>")
+            for offender in offenders:
+                health_msg.append(
+                    f"• <code>{html.escape(offender['site'])}</code>: {offender['count']}x, "
+                    f"total {offender['total_ms']:.0f}ms, max {offender['max_ms']:.0f}ms"
+                )
+
+        await send_scheduler.answer(message, "\n".join(health_msg))
 
     except Exception as e:
         logger.error(f"Error in /health command: {e}", exc_info=True)
-        await message.answer("❌ An error occurred while checking system health.")
+        await send_scheduler.answer(message, "❌ An error occurred while checking system health.")
+
+
+@router.message(Command("traces"))
+@rate_limited_command()
+async def cmd_traces(message: types.Message):
+    """Shows the slowest recent traces broken down by stage (admin only)."""
+    if not config.is_admin(message.from_user.id):
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
+        return
+
+    args = message.text.split()[1:]
+    limit = 5
+    name = None
+    for arg in args:
+        if arg.isdigit():
+            limit = max(1, min(int(arg), 20))
+        else:
+            name = arg
+
+    try:
+        traces = tracer.slowest(limit=limit, name=name)
+        if not traces:
+            await send_scheduler.answer(message, "ℹ️ No traces recorded yet." if name is None else f"ℹ️ No recent traces for {name}.")
+            return
+
+        trace_msg = [f"🔎 <b>Slowest {len(traces)} of the last {len(tracer.traces)} traces</b>"]
+        for trace in traces:
+            root = trace.root
+            started = datetime.fromtimestamp(trace.started_at).strftime('%H:%M:%S')
+            error = f" ❌ {root.error}" if root.error else ""
+            trace_msg.append(f"\n<b>{root.name}</b> {root.duration * 1000:.0f}ms at {started}{error}")
+            rows = tracer.breakdown(trace)
+            for row in rows[:15]:
+                count = f" ×{row['count']}" if row['count'] > 1 else ""
+                errors = f" ({row['errors']} failed)" if row['errors'] else ""
+                trace_msg.append(f"{'  ' * row['depth']}{row['name']}{count}: {row['total'] * 1000:.0f}ms{errors}")
+            if len(rows) > 15:
+                trace_msg.append(f"  … {len(rows) - 15} more")
+
+        await send_long_message(message.chat.id, "\n".join(trace_msg))
+
+    except Exception as e:
+        logger.error(f"Error in /traces command: {e}", exc_info=True)
+        await send_scheduler.answer(message, "❌ Error retrieving traces.")
 
 
 @router.message(Command("broadcast"))
@@ -380,56 +546,39 @@ async def cmd_health(message: types.Message):
 async def cmd_broadcast(message: types.Message):
     """Sends a message to all known users (admin only)."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     args = message.text.split(maxsplit=1)
     if len(args) < 2 or not args[1].strip():
-        await message.answer(
+        await send_scheduler.answer(message,
             "Usage: /broadcast [message text]\n"
-            "The message will be sent to all users who have interacted with the bot."
+            "The message will be sent to all users who have interacted with the bot.\n"
+            "/broadcast cancel - Stop any broadcast in progress."
         )
         return
 
     broadcast_text = args[1].strip()
-    # Get all user IDs from stats (or a dedicated user table if you have one)
-    async with user_manager._lock:
-        all_user_ids = list(user_manager.user_stats.keys())
-
-    if not all_user_ids:
-        await message.answer("❌ No users found to broadcast to.")
+    if broadcast_text.lower() == "cancel":
+        cancelled = await broadcast_engine.cancel()
+        await send_scheduler.answer(message, f"🛑 Cancelled {cancelled} running broadcast(s)." if cancelled else "No broadcast is running.")
         return
 
-    await message.answer(f"🚀 Starting broadcast to {len(all_user_ids)} users...")
-    logger.info(f"Admin {message.from_user.id} initiated broadcast to {len(all_user_ids)} users.")
-
-    success_count = 0
-    fail_count = 0
-    start_time = time.time()
+    # Recipients are streamed from the users collection; progress is checkpointed as it goes
+    try:
+        broadcast = await broadcast_engine.start_broadcast(broadcast_text, message.from_user.id, message.chat.id)
+    except Exception as e:
+        logger.error(f"Error starting broadcast: {e}", exc_info=True)
+        await send_scheduler.answer(message, "❌ Could not read the recipient list. Please try again later.")
+        return
+    if not broadcast:
+        await send_scheduler.answer(message, "❌ No users found to broadcast to.")
+        return
 
-    from bot import bot  # Import here to avoid circular imports
-    for user_id in all_user_ids:
-        try:
-            await bot.send_message(user_id, broadcast_text)
-            success_count += 1
-            await asyncio.sleep(0.05)  # Small delay to avoid rate limits
-        except TelegramAPIError as e:
-            logger.warning(f"Failed to broadcast to user {user_id}: {e}")
-            fail_count += 1
-        except Exception as e:
-            logger.error(f"Unexpected error broadcasting to user {user_id}: {e}")
-            fail_count += 1
-
-        # Periodic progress update for long broadcasts
-        if (success_count + fail_count) % 100 == 0:
-            await message.answer(f"Progress: {success_count + fail_count}/{len(all_user_ids)} users processed...")
-
-    elapsed_time = time.time() - start_time
-    await message.answer(
-        f"✅ Broadcast Complete!\n\n"
-        f"Sent: {success_count}\n"
-        f"Failed: {fail_count}\n"
-        f"Time: {elapsed_time:.1f} seconds"
+    logger.info(f"Admin {message.from_user.id} started broadcast {broadcast['_id']} to {broadcast['total_users']} users.")
+    await send_scheduler.answer(message,
+        f"🚀 Starting broadcast to {broadcast['total_users']} users...\n"
+        f"Progress updates will follow here. The broadcast resumes automatically after a restart."
     )
 
 
@@ -438,7 +587,7 @@ async def cmd_broadcast(message: types.Message):
 async def cmd_config(message: types.Message):
     """Views or updates bot configuration settings (admin only)."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     # config is already imported at the top level
@@ -447,7 +596,7 @@ async def cmd_config(message: types.Message):
     # Usage: /config list | /config [setting] | /config [setting] [new_value]
 
     if len(args) == 1:
-        await message.answer("Usage: /config list | /config [setting] | /config [setting] [new_value]")
+        await send_scheduler.answer(message, "Usage: /config list | /config [setting] | /config [setting] [new_value]")
         return
 
     sub_command = args[1].lower()
@@ -457,7 +606,7 @@ async def cmd_config(message: types.Message):
         settings_text = ["📋 <b>Bot Configuration Settings:</b>\n"]
         for key, value in settings.items():
             settings_text.append(f"• {key} = {value}")
-        await message.answer("\n".join(settings_text))
+        await send_scheduler.answer(message, "\n".join(settings_text))
         return
 
     elif len(args) == 2:
@@ -465,9 +614,9 @@ async def cmd_config(message: types.Message):
         setting_key = sub_command
         value = await config.get_setting(setting_key)
         if value is None:
-            await message.answer(f"❌ Setting '{setting_key}' not found.")
+            await send_scheduler.answer(message, f"❌ Setting '{setting_key}' not found.")
         else:
-            await message.answer(f"📝 {setting_key} = {value}")
+            await send_scheduler.answer(message, f"📝 {setting_key} = {value}")
         return
 
     elif len(args) == 3:
@@ -476,13 +625,13 @@ async def cmd_config(message: types.Message):
         new_value = args[2]
         result = await config.update_setting(setting_key, new_value)
         if result:
-            await message.answer(f"✅ Updated: {setting_key} = {new_value}")
+            await send_scheduler.answer(message, f"✅ Updated: {setting_key} = {new_value}")
         else:
-            await message.answer(f"❌ Failed to update setting '{setting_key}'.")
+            await send_scheduler.answer(message, f"❌ Failed to update setting '{setting_key}'.")
         return
 
     else:
-        await message.answer("❌ Invalid command format. Use /config list | /config [setting] | /config [setting] [value]")
+        await send_scheduler.answer(message, "❌ Invalid command format. Use /config list | /config [setting] | /config [setting] [value]")
 
 
 @router.message(Command("getlogs"))
@@ -490,7 +639,7 @@ async def cmd_config(message: types.Message):
 async def cmd_getlogs(message: types.Message):
     """Retrieves recent bot logs (admin only)."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     import os
@@ -512,23 +661,23 @@ async def cmd_getlogs(message: types.Message):
         
         # Send as text if it's small enough, or as a text file
         if len(log_content) < 4000:
-            await message.answer(f"📋 Last {lines_to_get} log lines:\n```\n{log_content}\n```")
+            await send_scheduler.answer(message, f"📋 Last {lines_to_get} log lines:\n```\n{log_content}\n```")
         else:
             from io import BytesIO
             log_file = BytesIO(log_content.encode('utf-8'))
             from bot import bot  # Import here to avoid circular imports
-            await bot.send_document(
-                message.chat.id, 
+            await send_scheduler.call(message.chat.id, lambda: bot.send_document(
+                message.chat.id,
                 types.BufferedInputFile(
-                    log_file.getvalue(), 
+                    log_file.getvalue(),
                     filename=f"bot_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
                 ),
                 caption=f"📋 Last {lines_to_get} log lines"
-            )
+            ), PRIORITY_REPLY)
 
     except Exception as e:
         logger.error(f"Error retrieving logs in /getlogs: {e}", exc_info=True)
-        await message.answer(f"❌ Error retrieving logs: {type(e).__name__}: {e}")
+        await send_scheduler.answer(message, f"❌ Error retrieving logs: {type(e).__name__}: {e}")
 
 
 
@@ -537,7 +686,7 @@ async def cmd_getlogs(message: types.Message):
 async def cmd_maintenance(message: types.Message):
     """Manage bot maintenance mode (admin only)."""
     if not config.is_admin(message.from_user.id):
-        await message.answer("❌ This command is restricted to administrators.")
+        await send_scheduler.answer(message, "❌ This command is restricted to administrators.")
         return
 
     args = message.text.split(maxsplit=1)
@@ -546,32 +695,33 @@ async def cmd_maintenance(message: types.Message):
     logger.info(f"Admin {message.from_user.id} used /maintenance {subcommand}")
 
     try:
+        loop = asyncio.get_running_loop()  # The maintenance helpers are synchronous DB calls
         if subcommand == "on":
-            set_maintenance_mode(True)
-            await message.answer("🔧 Maintenance mode **enabled**. Bot will use separate 'maintenance_*' collections.")
+            await loop.run_in_executor(None, set_maintenance_mode, True)
+            await send_scheduler.answer(message, "🔧 Maintenance mode **enabled**. Bot will use separate 'maintenance_*' collections.")
         elif subcommand == "off":
-            set_maintenance_mode(False)
-            await message.answer("✅ Maintenance mode **disabled**. Bot is using normal collections.")
+            await loop.run_in_executor(None, set_maintenance_mode, False)
+            await send_scheduler.answer(message, "✅ Maintenance mode **disabled**. Bot is using normal collections.")
         elif subcommand == "status":
-            status = is_maintenance_mode()
-            await message.answer(f"🔧 Maintenance mode is currently **{'ENABLED' if status else 'DISABLED'}**.")
+            status = await loop.run_in_executor(None, is_maintenance_mode)
+            await send_scheduler.answer(message, f"🔧 Maintenance mode is currently **{'ENABLED' if status else 'DISABLED'}**.")
         elif subcommand == "clear":
-            if not is_maintenance_mode():
-                await message.answer("⚠️ Cannot clear maintenance data: Maintenance mode is currently **DISABLED**.")
+            if not await loop.run_in_executor(None, is_maintenance_mode):
+                await send_scheduler.answer(message, "⚠️ Cannot clear maintenance data: Maintenance mode is currently **DISABLED**.")
                 return
             
-            await message.answer("⏳ Clearing maintenance data (collections starting with 'maintenance_')... This might take a moment.")
-            success = clear_maintenance_collections() # This is synchronous
+            await send_scheduler.answer(message, "⏳ Clearing maintenance data (collections starting with 'maintenance_')... This might take a moment.")
+            success = await loop.run_in_executor(None, clear_maintenance_collections)
             if success:
-                await message.answer("✅ Maintenance data cleared successfully.")
+                await send_scheduler.answer(message, "✅ Maintenance data cleared successfully.")
             else:
-                await message.answer("❌ Failed to clear maintenance data. Check logs.")
+                await send_scheduler.answer(message, "❌ Failed to clear maintenance data. Check logs.")
         else:
-            await message.answer("Usage: /maintenance [on|off|clear|status]")
+            await send_scheduler.answer(message, "Usage: /maintenance [on|off|clear|status]")
 
     except Exception as e:
         logger.error(f"Error in /maintenance command: {e}", exc_info=True)
-        await message.answer("❌ An error occurred while managing maintenance mode.")
+        await send_scheduler.answer(message, "❌ An error occurred while managing maintenance mode.")
 
 
 def register_admin_handlers(dp):
@@ -1,122 +1,116 @@
 import asyncio
+from typing import List, Optional
 from aiogram import Dispatcher, types
 from aiogram.filters import Command
 from logging_setup import logger
 import db
+from db.alert_repo import FAIR_GAP_BUCKETS
 from utils.rate_limiter import rate_limited_command
-from utils.game_processing import fetch_and_process_games
 from utils.message_helpers import send_long_message
-from tasks.fade_alerts import process_new_fade_alerts # Corrected function name
+from services.send_scheduler import send_scheduler
+from utils.formatters import render_fade_digests
+from tasks.pipeline import fade_pipeline
+from services.admission import admission
+
+SPORT_ICONS = {'nba': "🏀", 'ncaab': "🏫"}
+
+async def _fade_digests(sport: str, date: str) -> Optional[List[str]]:
+    """
+    Renders the fade pipeline's current alerts for a slate as digest messages.
+    Returns None if no games were found for the date.
+    """
+    output = await fade_pipeline.get_output(sport, date)
+    if not output or not output['games']:
+        return None
+    logger.info(f"[{sport} fades] pipeline output: {len(output['games'])} games, {len(output['alerts'])} alerts.")
+    return render_fade_digests(output['alerts'], f"{sport.upper()} Fade Alerts")
+
+async def send_sport_fades(message: types.Message, sport: str):
+    """Replies with today's fade digests for one sport."""
+    date, time_str = db.get_eastern_time_date()
+    name = sport.upper()
+    await send_scheduler.answer(message, f"🔍 Analyzing {name} games for fade opportunities ({time_str})...")
+    fade_messages = await _fade_digests(sport, date)
+
+    if fade_messages is None:
+        await send_scheduler.answer(message, f"{SPORT_ICONS[sport]} No {name} games found for today ({date}) to analyze.")
+    elif not fade_messages:
+        await send_scheduler.answer(message, f"✅ No significant {name} fade opportunities found based on current criteria.")
+    else:
+        for alert_msg in fade_messages:
+            await send_scheduler.answer(message, alert_msg, parse_mode='HTML') # Revert back to HTML
+
+async def send_cached_fades(message: types.Message, sports: List[str]) -> bool:
+    """
+    Answers a shed fade command from the pipeline's last output, however old.
+    Returns False unless every requested sport has cached output.
+    """
+    outputs = [(sport, fade_pipeline.peek_output(sport)) for sport in sports]
+    if not all(output for _, output in outputs):
+        return False
+    updated = ", ".join(f"{sport.upper()} {output['updated']}" for sport, output in outputs)
+    await send_scheduler.answer(message, f"⏳ Busy right now, showing fade alerts as of {updated}.")
+    for sport, output in outputs:
+        fade_messages = render_fade_digests(output['alerts'], f"{sport.upper()} Fade Alerts")
+        if not fade_messages:
+            await send_scheduler.answer(message, f"{SPORT_ICONS[sport]} No significant {sport.upper()} fade opportunities found.")
+        for alert_msg in fade_messages:
+            await send_scheduler.answer(message, alert_msg, parse_mode='HTML')
+    return True
 
 async def cmd_fadenba(message: types.Message):
     """Handle /fadenba command - Show NBA fade betting opportunities."""
     logger.info(f"User {message.from_user.id} requested NBA fade alerts.")
     try:
-        date, time_str = db.get_eastern_time_date()
-        games = await fetch_and_process_games("nba", date)
-        # --- Add Diagnostic Logging ---
-        logger.info(f"[cmd_fadenba] fetch_and_process_games returned {len(games)} games for date {date}.")
-        # --- End Diagnostic Logging ---
-
-        if not games:
-            await message.answer(f"🏀 No NBA games found for today ({date}) to analyze.")
-            return
-
-        await message.answer(f"🔍 Analyzing NBA games for fade opportunities ({time_str})...")
-        # --- Add Diagnostic Logging ---
-        logger.info(f"[cmd_fadenba] Calling process_new_fade_alerts with {len(games)} games.")
-        # --- End Diagnostic Logging ---
-        fade_messages = await process_new_fade_alerts(games, "nba")
-        # --- Add Diagnostic Logging ---
-        logger.info(f"[cmd_fadenba] process_new_fade_alerts returned {len(fade_messages)} messages.")
-        # --- End Diagnostic Logging ---
-        
-        if not fade_messages:
-            await message.answer("✅ No significant NBA fade opportunities found based on current criteria.")
-        else:
-            for alert_msg in fade_messages:
-                await message.answer(alert_msg, parse_mode='HTML') # Revert back to HTML
-                await asyncio.sleep(0.1) # Small delay between messages
-
+        await send_sport_fades(message, "nba")
     except Exception as e:
         logger.error(f"Error in cmd_fadenba: {e}", exc_info=True)
-        await message.answer("❌ An error occurred processing NBA fade opportunities.")
+        await send_scheduler.answer(message, "❌ An error occurred processing NBA fade opportunities.")
 
 async def cmd_fadencaab(message: types.Message):
     """Handle /fadencaab command - Show NCAAB fade betting opportunities."""
     logger.info(f"User {message.from_user.id} requested NCAAB fade alerts.")
     try:
-        date, time_str = db.get_eastern_time_date()
-        games = await fetch_and_process_games("ncaab", date)
-
-        if not games:
-            await message.answer(f"🏫 No NCAAB games found for today ({date}) to analyze.")
-            return
-
-        await message.answer(f"🔍 Analyzing NCAAB games for fade opportunities ({time_str})...")
-        fade_messages = await process_new_fade_alerts(games, "ncaab")
-        
-        if not fade_messages:
-            await message.answer("✅ No significant NCAAB fade opportunities found based on current criteria.")
-        else:
-            for alert_msg in fade_messages:
-                await message.answer(alert_msg, parse_mode='HTML') # Revert back to HTML
-                await asyncio.sleep(0.1) # Small delay between messages
-
+        await send_sport_fades(message, "ncaab")
     except Exception as e:
         logger.error(f"Error in cmd_fadencaab: {e}", exc_info=True)
-        await message.answer("❌ An error occurred processing NCAAB fade opportunities.")
+        await send_scheduler.answer(message, "❌ An error occurred processing NCAAB fade opportunities.")
 
 async def cmd_fades(message: types.Message):
     """Handle /fades command - Show today's fade opportunities for both NBA and NCAAB."""
     logger.info(f"User {message.from_user.id} requested all fade alerts.")
     date, time_str = db.get_eastern_time_date()
-    await message.answer(f"🔍 Fetching and analyzing games for all fade opportunities ({time_str})...")
+    await send_scheduler.answer(message, f"🔍 Fetching and analyzing games for all fade opportunities ({time_str})...")
 
     try:
-        nba_fade_messages = []
-        ncaab_fade_messages = []
-        any_nba_games = False
-        any_ncaab_games = False
-
-        # Process NBA
-        nba_games = await fetch_and_process_games("nba", date)
-        if nba_games:
-            any_nba_games = True
-            nba_fade_messages = await process_new_fade_alerts(nba_games, "nba")
-            if not nba_fade_messages:
-                 await message.answer("🏀 No significant NBA fade opportunities found.")
-        else:
-            await message.answer(f"🏀 No NBA games found for today ({date}).")
-
-        await asyncio.sleep(0.5)  # Small delay
-
-        # Process NCAAB
-        ncaab_games = await fetch_and_process_games("ncaab", date)
-        if ncaab_games:
-            any_ncaab_games = True
-            ncaab_fade_messages = await process_new_fade_alerts(ncaab_games, "ncaab")
-            if not ncaab_fade_messages:
-                 await message.answer("🏫 No significant NCAAB fade opportunities found.")
-        else:
-            await message.answer(f"🏫 No NCAAB games found for today ({date}).")
+        # Both slates are read from the pipeline concurrently
+        nba_fade_messages, ncaab_fade_messages = await asyncio.gather(
+            _fade_digests("nba", date), _fade_digests("ncaab", date))
+
+        if nba_fade_messages is None:
+            await send_scheduler.answer(message, f"🏀 No NBA games found for today ({date}).")
+        elif not nba_fade_messages:
+            await send_scheduler.answer(message, "🏀 No significant NBA fade opportunities found.")
+        if ncaab_fade_messages is None:
+            await send_scheduler.answer(message, f"🏫 No NCAAB games found for today ({date}).")
+        elif not ncaab_fade_messages:
+            await send_scheduler.answer(message, "🏫 No significant NCAAB fade opportunities found.")
 
         # Send collected messages
-        all_fade_messages = nba_fade_messages + ncaab_fade_messages
+        all_fade_messages = (nba_fade_messages or []) + (ncaab_fade_messages or [])
         if all_fade_messages:
-            await message.answer("--- Fade Opportunities Found ---")
+            await send_scheduler.answer(message, "--- Fade Opportunities Found ---")
             for alert_msg in all_fade_messages:
-                await message.answer(alert_msg, parse_mode='HTML') # Revert back to HTML
-                await asyncio.sleep(0.1)
-        elif any_nba_games or any_ncaab_games: # Only say no fades if games were actually checked
-             await message.answer("✅ No significant fade opportunities found for either sport.")
+                await send_scheduler.answer(message, alert_msg, parse_mode='HTML') # Revert back to HTML
+        elif nba_fade_messages is not None or ncaab_fade_messages is not None: # Only say no fades if games were actually checked
+             await send_scheduler.answer(message, "✅ No significant fade opportunities found for either sport.")
         # If no games found for either, messages were already sent above.
 
-        await message.answer("✅ Fade analysis complete.")
+        await send_scheduler.answer(message, "✅ Fade analysis complete.")
 
     except Exception as e:
         logger.error(f"Error in cmd_fades: {e}", exc_info=True)
-        await message.answer("❌ An error occurred processing fade opportunities.")
+        await send_scheduler.answer(message, "❌ An error occurred processing fade opportunities.")
 
 async def cmd_fadestats(message: types.Message):
     """Handle /fadestats command - Show fade alert performance stats."""
@@ -160,11 +154,54 @@ async def cmd_fadestats(message: types.Message):
         if len(stats_msg) == 1:  # Only header was added
             stats_msg.append("No fade alert results available for the past 30 days.")
 
-        await message.answer("\n".join(stats_msg))
+        # Slice results by the vig-free fade signal when the alert fired
+        edge_stats = await loop.run_in_executor(
+            None,
+            lambda: db.get_fade_alert_stats_by_edge()
+        )
+        if edge_stats:
+            stats_msg.append("\n📐 <b>Results by Edge (T% - no-vig probability):</b>")
+            for bucket in edge_stats:
+                lower = bucket.get('_id')
+                if lower not in FAIR_GAP_BUCKETS[:-1]:
+                    continue
+                upper = FAIR_GAP_BUCKETS[FAIR_GAP_BUCKETS.index(lower) + 1]
+                if lower == FAIR_GAP_BUCKETS[0]:
+                    label = f"Below {upper}%"
+                elif upper == FAIR_GAP_BUCKETS[-1]:
+                    label = f"{lower}%+"
+                else:
+                    label = f"{lower}-{upper}%"
+                total = bucket.get('total', 0)
+                winners = bucket.get('winners', 0)
+                win_rate = (winners / total * 100) if total else 0
+                stats_msg.append(
+                    f"{label}: {winners}W - {total - winners}L ({win_rate:.1f}% win rate, "
+                    f"avg fade EV {bucket.get('avg_fade_ev') or 0:+.1f}%, avg hold {bucket.get('avg_hold') or 0:.1f}%)"
+                )
+
+        # Closing line value: did the fades beat the market before results came in
+        clv_stats = await loop.run_in_executor(
+            None,
+            lambda: db.get_fade_alert_clv_stats()
+        )
+        if clv_stats:
+            stats_msg.append("\n📈 <b>Closing Line Value:</b>")
+            for row in clv_stats:
+                total = row.get('total', 0)
+                beat = row.get('beat_close', 0)
+                beat_rate = (beat / total * 100) if total else 0
+                line_str = f", avg line {row['avg_clv_line']:+.1f} pts" if row.get('avg_clv_line') is not None else ""
+                stats_msg.append(
+                    f"{str(row.get('_id', '?')).upper()}: beat the close {beat}/{total} ({beat_rate:.1f}%), "
+                    f"avg price {row.get('avg_clv_price') or 0:+.1f}%{line_str}"
+                )
+
+        await send_scheduler.answer(message, "\n".join(stats_msg))
 
     except Exception as e:
         logger.error(f"Error in cmd_fadestats: {e}", exc_info=True)
-        await message.answer("❌ An error occurred retrieving fade statistics.")
+        await send_scheduler.answer(message, "❌ An error occurred retrieving fade statistics.")
 
 async def cmd_fadehistory(message: types.Message):
     """Handle /fadehistory command - Show recent fade alert results."""
@@ -246,7 +283,7 @@ async def cmd_fadehistory(message: types.Message):
 
     except Exception as e:
         logger.error(f"Error in cmd_fadehistory: {e}", exc_info=True)
-        await message.answer("❌ An error occurred retrieving fade history.")
+        await send_scheduler.answer(message, "❌ An error occurred retrieving fade history.")
 
 def register_fade_handlers(dp: Dispatcher):
     """Register fade-related command handlers."""
@@ -273,4 +310,9 @@ def register_fade_handlers(dp: Dispatcher):
     dp.message.register(
         rate_limited_command("Please wait before requesting fade history.")(cmd_fadehistory),
         Command("fadehistory")
-    )
\ No newline at end of file
+    )
+
+    # Cached answers for fade commands shed by admission control
+    admission.register_fallback("fadenba", lambda message: send_cached_fades(message, ["nba"]))
+    admission.register_fallback("fadencaab", lambda message: send_cached_fades(message, ["ncaab"]))
+    admission.register_fallback("fades", lambda message: send_cached_fades(message, ["nba", "ncaab"]))
\ No newline at end of file
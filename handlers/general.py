@@ -3,6 +3,7 @@ from aiogram.filters import Command
 from logging_setup import logger
 from db.utils import get_eastern_time_date # Import specific function
 from utils.rate_limiter import rate_limited_command
+from services.send_scheduler import send_scheduler
 
 async def cmd_start(message: types.Message):
     """Handle /start command."""
@@ -15,7 +16,7 @@ async def cmd_start(message: types.Message):
     #     await db.record_user_join(user.id, user.username, user.full_name)
 
     eastern_date, eastern_time = get_eastern_time_date()
-    await message.answer(
+    await send_scheduler.answer(message,
         f"Hello, <b>{user.full_name}</b>! 👋\n\n"
         f"Welcome to the Sports Betting Info Bot.\n"
         f"I provide game schedules, scores, betting odds, and fade opportunities for NBA and NCAAB.\n\n"
@@ -53,6 +54,12 @@ async def cmd_help(message: types.Message):
 /fadestats - View historical performance of fade alerts (win rates by rating).
 /fadehistory - Show results of the most recent fade alerts.
 
+🔔 <b>Alert Subscriptions:</b>
+/subscribe [nba|ncaab|all] [min rating] [market] - Get new fade alerts sent to you automatically.
+/unsubscribe - Stop automatic fade alerts.
+/mysubscription - Show your subscription settings.
+/quiet [start-end|off] - Pause alerts during these Eastern hours (e.g., 23-8).
+
 <i>Fade alerts identify situations where public betting patterns suggest potential value in betting against the public favorite. Use responsibly.</i>
 """
 
@@ -67,6 +74,7 @@ async def cmd_help(message: types.Message):
 /banlist - List currently banned users and remaining time.
 /botstats - View bot performance and usage statistics.
 /health - Check current system resource usage (CPU, Memory).
+/traces [count] [name] - Show the slowest recent traces by stage.
 /broadcast [message] - Send a message to all known users (use with caution!).
 /config [setting] [value] - View or update a bot configuration setting.
 /config list - List all configurable settings.
@@ -75,7 +83,7 @@ async def cmd_help(message: types.Message):
 """
 
     help_text += f"\n-----------------------------\n🕒 Current Time: {eastern_date} {eastern_time}"
-    await message.answer(help_text)
+    await send_scheduler.answer(message, help_text)
 
 def register_general_handlers(dp: Dispatcher):
     """Register general command handlers."""
@@ -109,7 +117,7 @@ async def cmd_explain(message: types.Message):
         "🔹 <b>Fade:</b> Betting *against* a particular outcome, often one that is heavily favored by the public (high ticket percentage) but not necessarily backed by sharp money (money percentage) or implied odds."
     )
     try:
-        await message.answer(explanation, parse_mode='HTML')
+        await send_scheduler.answer(message, explanation, parse_mode='HTML')
     except Exception as e:
         logger.error(f"Error sending explanation: {e}", exc_info=True)
-        await message.answer("❌ Sorry, couldn't send the explanation.")
+        await send_scheduler.answer(message, "❌ Sorry, couldn't send the explanation.")
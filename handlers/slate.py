@@ -0,0 +1,90 @@
+from aiogram import Dispatcher, F, types
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from logging_setup import logger
+from services.slate_cache import slate_cache, SPORT_TITLES
+from services.send_scheduler import send_scheduler, PRIORITY_REPLY
+from services.admission import admission
+from db.utils import get_eastern_time_date
+
+# Callback data: slate:<sport>:<date>:<page index>
+SLATE_CALLBACK_PREFIX = "slate:"
+
+def slate_keyboard(sport: str, date: str, page: int, total_pages: int) -> types.InlineKeyboardMarkup:
+    """Prev / page indicator / next buttons for a slate page."""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="◀️ Prev" if page > 0 else "·",
+                   callback_data=f"{SLATE_CALLBACK_PREFIX}{sport}:{date}:{page - 1}" if page > 0 else f"{SLATE_CALLBACK_PREFIX}noop")
+    builder.button(text=f"{page + 1}/{total_pages}", callback_data=f"{SLATE_CALLBACK_PREFIX}noop")
+    builder.button(text="Next ▶️" if page < total_pages - 1 else "·",
+                   callback_data=f"{SLATE_CALLBACK_PREFIX}{sport}:{date}:{page + 1}" if page < total_pages - 1 else f"{SLATE_CALLBACK_PREFIX}noop")
+    return builder.as_markup()
+
+async def send_slate(message: types.Message, sport: str, date: str) -> bool:
+    """
+    Sends the first page of a day's slate with navigation buttons.
+    Returns False if there are no games for the date.
+    """
+    pages, updated = await slate_cache.get_pages(sport, date, refresh=True)
+    if not pages:
+        return False
+    text = f"{pages[0]}\n\n<i>Updated {updated}</i>"
+    markup = slate_keyboard(sport, date, 0, len(pages)) if len(pages) > 1 else None
+    await send_scheduler.answer(message, text, reply_markup=markup)
+    return True
+
+async def send_cached_slate(message: types.Message, sport: str) -> bool:
+    """
+    Answers a shed /nba or /ncaab from the cached slate, however old. Only serves
+    today's slate (no date argument). Returns False if nothing is cached.
+    """
+    if len(message.text.split()) > 1:
+        return False
+    date = get_eastern_time_date()[0]
+    pages, updated = slate_cache.peek(sport, date)
+    if not pages:
+        return False
+    text = f"{pages[0]}\n\n<i>⏳ Busy right now, showing the slate as of {updated}</i>"
+    markup = slate_keyboard(sport, date, 0, len(pages)) if len(pages) > 1 else None
+    await send_scheduler.answer(message, text, reply_markup=markup)
+    return True
+
+async def on_slate_page(callback: types.CallbackQuery):
+    """Handles slate navigation by editing the slate message to the requested page."""
+    try:
+        parts = callback.data[len(SLATE_CALLBACK_PREFIX):].split(":")
+        if len(parts) != 3 or not parts[2].lstrip('-').isdigit():
+            await callback.answer()
+            return
+        sport, date, page = parts[0], parts[1], int(parts[2])
+        if sport not in SPORT_TITLES:
+            await callback.answer()
+            return
+
+        pages, updated = await slate_cache.get_pages(sport, date)
+        if not pages:
+            await callback.answer("This slate is no longer available. Run the command again.", show_alert=True)
+            return
+        page = max(0, min(page, len(pages) - 1))
+        text = f"{pages[page]}\n\n<i>Updated {updated}</i>"
+        markup = slate_keyboard(sport, date, page, len(pages))
+        await send_scheduler.call(
+            callback.message.chat.id,
+            lambda: callback.message.edit_text(text, reply_markup=markup),
+            PRIORITY_REPLY
+        )
+        await callback.answer()
+    except TelegramBadRequest as e:
+        if 'message is not modified' not in str(e).lower():
+            logger.warning(f"Could not change slate page for user {callback.from_user.id}: {e}")
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error handling slate page callback '{callback.data}': {e}", exc_info=True)
+        await callback.answer("❌ Could not load that page.")
+
+def register_slate_handlers(dp: Dispatcher):
+    """Register slate navigation callback handlers."""
+    dp.callback_query.register(on_slate_page, F.data.startswith(SLATE_CALLBACK_PREFIX))
+    # Cached answers for slate commands shed by admission control
+    for sport in ("nba", "ncaab"):
+        admission.register_fallback(sport, lambda message, sport=sport: send_cached_slate(message, sport))
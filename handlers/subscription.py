@@ -0,0 +1,122 @@
+from aiogram import Dispatcher, types
+from aiogram.filters import Command
+from logging_setup import logger
+from config import config
+from utils.rate_limiter import rate_limited_command
+from services.subscriptions import subscription_manager, SPORTS, MARKETS, MAX_RATING
+from services.send_scheduler import send_scheduler
+
+SUBSCRIBE_USAGE = (
+    "Usage: /subscribe [nba|ncaab|all] [min rating 1-5] [spread|total|moneyline|all]\n"
+    "Example: <code>/subscribe nba 4 spread</code>"
+)
+
+def _format_subscription(sub: dict) -> str:
+    """Formats a subscription for display."""
+    quiet = "off"
+    if sub.get('quiet_start') is not None and sub.get('quiet_end') is not None:
+        quiet = f"{sub['quiet_start']:02d}:00-{sub['quiet_end']:02d}:00 ET"
+    return (
+        f"🔔 <b>Your Fade Alert Subscription</b>\n"
+        f"Sports: {', '.join(s.upper() for s in sub.get('sports', []))}\n"
+        f"Markets: {', '.join(sub.get('markets', []))}\n"
+        f"Minimum rating: {'⭐' * int(sub.get('min_rating', 1))} ({sub.get('min_rating')}-Star)\n"
+        f"Quiet hours: {quiet}"
+    )
+
+async def cmd_subscribe(message: types.Message):
+    """Handle /subscribe command - Receive new fade alerts automatically."""
+    args = message.text.split()[1:]
+    sports = list(SPORTS)
+    markets = list(MARKETS)
+    min_rating = await config.get_setting('fade_rating_threshold', 3)
+
+    for arg in args:
+        value = arg.lower()
+        if value in SPORTS:
+            sports = [value]
+        elif value == 'all':
+            continue
+        elif value.isdigit() and 1 <= int(value) <= MAX_RATING:
+            min_rating = int(value)
+        elif value.capitalize() in MARKETS:
+            markets = [value.capitalize()]
+        else:
+            await send_scheduler.answer(message, f"❌ Unknown option '{arg}'.\n{SUBSCRIBE_USAGE}")
+            return
+
+    sub = await subscription_manager.subscribe(
+        message.from_user.id, message.chat.id, sports, markets, min_rating
+    )
+    if not sub:
+        await send_scheduler.answer(message, "❌ Could not save your subscription. Please try again later.")
+        return
+    await send_scheduler.answer(message,
+        f"{_format_subscription(sub)}\n\nNew fade alerts matching these settings will be sent here. "
+        f"Use /unsubscribe to stop or /quiet to set quiet hours."
+    )
+
+async def cmd_unsubscribe(message: types.Message):
+    """Handle /unsubscribe command - Stop automatic fade alerts."""
+    if await subscription_manager.unsubscribe(message.from_user.id):
+        await send_scheduler.answer(message, "🔕 You will no longer receive fade alerts automatically.")
+    else:
+        await send_scheduler.answer(message, "You don't have an active subscription. Use /subscribe to start one.")
+
+async def cmd_mysubscription(message: types.Message):
+    """Handle /mysubscription command - Show the user's current subscription."""
+    sub = subscription_manager.get(message.from_user.id)
+    if not sub:
+        await send_scheduler.answer(message, f"You don't have an active subscription.\n{SUBSCRIBE_USAGE}")
+        return
+    await send_scheduler.answer(message, _format_subscription(sub))
+
+async def cmd_quiet(message: types.Message):
+    """Handle /quiet command - Set or clear quiet hours (Eastern time)."""
+    args = message.text.split()[1:]
+    if not args:
+        await send_scheduler.answer(message, "Usage: /quiet [start-end|off] (Eastern hours 0-23), e.g. <code>/quiet 23-8</code>")
+        return
+
+    if args[0].lower() == 'off':
+        quiet_start, quiet_end = None, None
+    else:
+        try:
+            start_str, end_str = args[0].split('-')
+            quiet_start, quiet_end = int(start_str), int(end_str)
+            if not (0 <= quiet_start <= 23 and 0 <= quiet_end <= 23):
+                raise ValueError
+        except ValueError:
+            await send_scheduler.answer(message, "❌ Quiet hours must look like <code>23-8</code> (hours 0-23, Eastern).")
+            return
+
+    if not await subscription_manager.set_quiet_hours(message.from_user.id, quiet_start, quiet_end):
+        await send_scheduler.answer(message, "You need an active subscription first. Use /subscribe to start one.")
+        return
+    if quiet_start is None:
+        await send_scheduler.answer(message, "🔔 Quiet hours cleared.")
+    else:
+        await send_scheduler.answer(message, f"🌙 No alerts will be sent between {quiet_start:02d}:00 and {quiet_end:02d}:00 ET.")
+    logger.info(f"User {message.from_user.id} set quiet hours to {quiet_start}-{quiet_end}.")
+
+def register_subscription_handlers(dp: Dispatcher):
+    """Register fade alert subscription command handlers."""
+    dp.message.register(
+        rate_limited_command("Please wait before updating your subscription again.")(cmd_subscribe),
+        Command("subscribe")
+    )
+
+    dp.message.register(
+        rate_limited_command("Please wait before updating your subscription again.")(cmd_unsubscribe),
+        Command("unsubscribe")
+    )
+
+    dp.message.register(
+        rate_limited_command("Please wait before checking your subscription again.")(cmd_mysubscription),
+        Command("mysubscription")
+    )
+
+    dp.message.register(
+        rate_limited_command("Please wait before updating quiet hours again.")(cmd_quiet),
+        Command("quiet")
+    )
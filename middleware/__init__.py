@@ -1,9 +1,11 @@
 from .maintenance import MaintenanceMiddleware
 from .user_tracking import UserTrackingMiddleware
 from .error_handling import ErrorHandlingMiddleware
+from .fast_path import FastPathMiddleware
 
 __all__ = [
     'MaintenanceMiddleware',
     'UserTrackingMiddleware',
-    'ErrorHandlingMiddleware'
+    'ErrorHandlingMiddleware',
+    'FastPathMiddleware'
 ]
\ No newline at end of file
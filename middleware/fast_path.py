@@ -0,0 +1,84 @@
+import time
+from aiogram import types
+from logging_setup import logger
+from config import config
+from services.metrics import metrics
+from services.user_manager import user_manager
+from services.send_scheduler import send_scheduler
+from utils.rate_limiter import parse_command, precheck_rate_limit, reset_rate_limit_precheck
+from .error_handling import handle_update_error
+from .user_tracking import UserTrackingMiddleware
+
+MAINTENANCE_MESSAGE = "🔧 The bot is currently undergoing maintenance. Please try again later."
+
+def classify_update(event) -> tuple:
+    """Returns (inner event, command) for an update, parsing the command text once."""
+    inner = event.event if isinstance(event, types.Update) else event
+    if isinstance(inner, types.Message):
+        return inner, parse_command(inner.text)
+    if isinstance(inner, types.CallbackQuery) and inner.data:
+        return inner, f"callback:{inner.data.split(':')[0]}"
+    return inner, "unknown"
+
+class FastPathMiddleware:
+    """
+    Single pre-dispatch stage replacing the Maintenance, ErrorHandling and UserTracking chain.
+
+    The command is parsed once per update. Maintenance, ban and rate-limit checks read
+    in-memory snapshots without locks or awaits, and activity goes into UserManager's
+    ring buffer instead of a task per update. The rate-limit decision is handed to
+    rate_limited_command so handlers don't parse or check again.
+    """
+    async def __call__(self, handler, event: types.Update, data: dict):
+        user = data.get("event_from_user")
+        if not user:
+            return await self._handle(handler, event, data, event)
+
+        inner, command = classify_update(event)
+        is_admin = config.is_admin(user.id)
+
+        if not is_admin and config.get('maintenance_mode', False):
+            metrics.count_update('maintenance')
+            await self._reply(inner, MAINTENANCE_MESSAGE)
+            return
+
+        ban = user_manager.get_ban(user.id)
+        if ban and command not in UserTrackingMiddleware.ALLOWED_BANNED_COMMANDS:
+            metrics.count_update('banned')
+            await self._reply(inner, self._ban_message(ban))
+            return
+
+        metrics.count_update('handled')
+        user_manager.record_activity(user.id, command)
+        if command.startswith('/') and not is_admin:
+            precheck_rate_limit(user.id, command)
+        try:
+            return await self._handle(handler, event, data, inner)
+        finally:
+            reset_rate_limit_precheck()
+
+    async def _handle(self, handler, event, data: dict, inner):
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            return await handle_update_error(inner, data, e)
+
+    @staticmethod
+    def _ban_message(ban: dict) -> str:
+        time_left_hr = int(max(ban['until'] - time.time(), 0) / 3600)
+        ban_message = (
+            f"❌ You are currently banned from using most bot features.\n"
+            f"Reason: {ban.get('reason') or 'Not specified'}"
+        )
+        if time_left_hr > 0:
+            ban_message += f"\nTime remaining: ~{time_left_hr} hours"
+        ban_message += f"\n\nYou can still use: {' '.join(UserTrackingMiddleware.ALLOWED_BANNED_COMMANDS)}"
+        return ban_message
+
+    @staticmethod
+    async def _reply(inner, text: str):
+        try:
+            if hasattr(inner, 'answer'):
+                await send_scheduler.answer(inner, text)
+        except Exception as e:
+            logger.error(f"Error replying to blocked update: {e}")
@@ -1,17 +1,18 @@
 import asyncio
 from config import config # Removed is_admin import
 from logging_setup import logger
+from services.send_scheduler import send_scheduler
 
 class MaintenanceMiddleware:
     async def __call__(self, handler, event, data):
         """Check maintenance mode."""
-        is_maintenance = await config.get_setting('maintenance_mode', False)
+        is_maintenance = config.get('maintenance_mode', False)  # Lock-free snapshot read
         if is_maintenance:
             user = data.get("event_from_user")
             # Use the config object's method to check admin status
             if user and not config.is_admin(user.id):  # Allow admins during maintenance
                 try:
-                    await event.answer("🔧 The bot is currently undergoing maintenance. Please try again later.")
+                    await send_scheduler.answer(event, "🔧 The bot is currently undergoing maintenance. Please try again later.")
                 except Exception:
                     pass  # Ignore errors sending maintenance message
                 return  # Stop processing for non-admins
@@ -3,6 +3,7 @@ import time
 from aiogram import types
 from logging_setup import logger
 from services.user_manager import user_manager
+from services.send_scheduler import send_scheduler
 
 class UserTrackingMiddleware:
     # List of commands allowed even when banned
@@ -42,7 +43,7 @@ class UserTrackingMiddleware:
                 try:
                     # Use event.answer() if available (Message, CallbackQuery)
                     if hasattr(event, 'answer'):
-                        await event.answer(ban_message)
+                        await send_scheduler.answer(event, ban_message)
                     # Fallback for other update types might be needed if applicable
                 except Exception as e:
                     logger.error(f"Error sending banned message to {user.id}: {e}")
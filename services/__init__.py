@@ -1,9 +1,29 @@
 from .alert_monitor import alert_monitor
 from .metrics import metrics
 from .user_manager import user_manager
+from .subscriptions import subscription_manager
+from .send_scheduler import send_scheduler
+from .outbox import outbox
+from .broadcast import broadcast_engine
+from .alert_cards import alert_cards
+from .slate_cache import slate_cache
+from .admission import admission
+from .loop_monitor import loop_monitor
+from .metrics_server import metrics_server
+from .tracing import tracer
 
 __all__ = [
     'alert_monitor',
     'metrics',
     'user_manager',
+    'subscription_manager',
+    'send_scheduler',
+    'outbox',
+    'broadcast_engine',
+    'alert_cards',
+    'slate_cache',
+    'admission',
+    'loop_monitor',
+    'metrics_server',
+    'tracer',
 ]
\ No newline at end of file
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from aiogram import types
+from logging_setup import logger
+
+# Heavy commands grouped by the resources they load: the upstream API and game collections
+# (slates), the fade pipeline (fades), or aggregation queries over fade alerts (stats)
+COMMAND_CLASSES = {
+    'nba': 'slate',
+    'ncaab': 'slate',
+    'nbateam': 'slate',
+    'ncaabteam': 'slate',
+    'fadenba': 'fades',
+    'fadencaab': 'fades',
+    'fades': 'fades',
+    'fadestats': 'stats',
+    'fadehistory': 'stats',
+}
+
+# Command class -> (max running, max waiting, max wait in seconds)
+DEFAULT_LIMITS = {
+    'slate': (4, 20, 5.0),
+    'fades': (3, 15, 5.0),
+    'stats': (2, 10, 3.0),
+}
+
+BUSY_MESSAGE = "⏳ The bot is busy right now. Please try again in a few seconds."
+
+class AdmissionController:
+    """
+    Concurrency limits for expensive commands, per command class.
+
+    Each class runs at most `max running` commands at once. Further requests wait in
+    a bounded queue for up to `max wait` seconds; when the queue is full or the wait
+    runs out the request is shed. A shed command gets a cached (possibly stale)
+    answer from a registered fallback if one can serve it, otherwise a fast busy reply,
+    so a spike can't pile work onto the executor, Mongo and the upstream API at once.
+    """
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, int, float]]] = None):
+        self.limits = dict(limits or DEFAULT_LIMITS)
+        self._semaphores = {name: asyncio.Semaphore(running) for name, (running, _, _) in self.limits.items()}
+        self._waiting: Dict[str, int] = {name: 0 for name in self.limits}
+        self._running: Dict[str, int] = {name: 0 for name in self.limits}
+        self._fallbacks: Dict[str, Callable[[types.Message], Awaitable[bool]]] = {}
+        self.stats = {
+            name: {'admitted': 0, 'queued': 0, 'shed_full': 0, 'shed_timeout': 0, 'served_stale': 0,
+                   'total_wait_ms': 0.0, 'max_wait_ms': 0.0}
+            for name in self.limits
+        }
+
+    @staticmethod
+    def command_class(command: str) -> Optional[str]:
+        command_key = command[1:] if command.startswith('/') else command
+        return COMMAND_CLASSES.get(command_key.split('@')[0])
+
+    def register_fallback(self, command: str, fallback: Callable[[types.Message], Awaitable[bool]]):
+        """Registers a cached answer for a shed command. The fallback returns False if it can't serve."""
+        self._fallbacks[command.lstrip('/')] = fallback
+
+    @asynccontextmanager
+    async def admit(self, command: str):
+        """Yields True once the command may run, or False if it was shed. Unclassified commands always run."""
+        name = self.command_class(command)
+        if name is None:
+            yield True
+            return
+        if not await self._acquire(name):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._running[name] -= 1
+            self._semaphores[name].release()
+
+    async def reject(self, message: types.Message, command: str):
+        """Answers a shed command from its fallback if possible, otherwise with a busy reply."""
+        from services.send_scheduler import send_scheduler  # Import here to avoid circular imports
+        command_key = command.lstrip('/').split('@')[0]
+        fallback = self._fallbacks.get(command_key)
+        if fallback:
+            try:
+                if await fallback(message):
+                    self.stats[self.command_class(command)]['served_stale'] += 1
+                    return
+            except Exception as e:
+                logger.error(f"Error serving cached answer for shed {command}: {e}", exc_info=True)
+        try:
+            await send_scheduler.answer(message, BUSY_MESSAGE)
+        except Exception as e:
+            logger.error(f"Error sending busy reply to {message.from_user.id}: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            name: {
+                **stats,
+                'running': self._running[name],
+                'waiting': self._waiting[name],
+                'limit': self.limits[name][0],
+                'avg_wait_ms': stats['total_wait_ms'] / stats['queued'] if stats['queued'] else 0.0,
+            }
+            for name, stats in self.stats.items()
+        }
+
+    # --- Internals ---
+
+    async def _acquire(self, name: str) -> bool:
+        semaphore = self._semaphores[name]
+        stats = self.stats[name]
+        _, max_waiting, max_wait = self.limits[name]
+        if not semaphore.locked():
+            await semaphore.acquire()  # Free slot: doesn't block
+        else:
+            if self._waiting[name] >= max_waiting:
+                stats['shed_full'] += 1
+                return False
+            self._waiting[name] += 1
+            stats['queued'] += 1
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=max_wait)
+            except asyncio.TimeoutError:
+                stats['shed_timeout'] += 1
+                return False
+            finally:
+                self._waiting[name] -= 1
+                waited_ms = (time.perf_counter() - started) * 1000
+                stats['total_wait_ms'] += waited_ms
+                stats['max_wait_ms'] = max(stats['max_wait_ms'], waited_ms)
+        self._running[name] += 1
+        stats['admitted'] += 1
+        return True
+
+# Create singleton instance
+admission = AdmissionController()
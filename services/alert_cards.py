@@ -0,0 +1,135 @@
+import asyncio
+from typing import Dict, List, Optional
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from logging_setup import logger
+from db.connection import get_nba_collection, get_ncaab_collection
+from db.game_repo import get_game_by_id
+from db.alert_repo import fade_alert_ref, get_fade_alerts_for_games
+from db.outbox_repo import get_alert_cards, update_alert_cards
+from utils.formatters import format_fade_alert, render_fade_digest_page, TELEGRAM_MESSAGE_LIMIT
+from services.send_scheduler import send_scheduler, PRIORITY_ALERT
+
+class AlertCardManager:
+    """
+    Keeps delivered fade alerts current by editing them in place.
+
+    Every alert delivered through the outbox records the chat, the Telegram message
+    ID and the alerts it shows. When a game snapshot changes (line move, tip-off,
+    final score) or an alert is graded, the affected messages are re-rendered and
+    edited through the send scheduler. Unchanged cards are skipped, so users see one
+    evolving card per alert instead of a new message for every status change.
+    """
+    def __init__(self, lookback_days: int = 3, concurrency: int = 10):
+        self.lookback_days = lookback_days
+        self.concurrency = concurrency
+        self.stats = {'edited': 0, 'unchanged': 0, 'failed': 0, 'closed': 0}
+
+    async def refresh_games(self, games: List[dict]) -> int:
+        """
+        Re-renders every live card showing one of the given (processed) games and
+        edits those whose text changed. Returns the number of cards edited.
+        """
+        games_by_id = {g['game_id']: g for g in games if g and g.get('game_id') is not None}
+        if not games_by_id:
+            return 0
+        try:
+            loop = asyncio.get_running_loop()
+            cards = await loop.run_in_executor(
+                None, lambda: get_alert_cards(list(games_by_id.keys()), self.lookback_days))
+            if not cards:
+                return 0
+
+            # A digest can also show games outside this refresh; load those alerts and games too
+            card_game_ids = list({gid for card in cards for gid in card.get('game_ids', [])})
+            alerts = await loop.run_in_executor(None, lambda: get_fade_alerts_for_games(card_game_ids))
+            alerts_by_ref = {fade_alert_ref(alert): alert for alert in alerts}
+            await self._load_missing_games(games_by_id, alerts)
+
+            edits = []
+            for card in cards:
+                text = self._render(card, alerts_by_ref, games_by_id)
+                if not text or len(text) > TELEGRAM_MESSAGE_LIMIT:
+                    continue
+                if text == card.get('text'):
+                    self.stats['unchanged'] += 1
+                    continue
+                edits.append((card, text))
+            if not edits:
+                return 0
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            results = await asyncio.gather(*(self._edit(card, text, semaphore) for card, text in edits))
+            edited = [(card['_id'], text) for (card, text), result in zip(edits, results) if result == 'edited']
+            closed = [card['_id'] for (card, _), result in zip(edits, results) if result == 'closed']
+            await loop.run_in_executor(None, lambda: update_alert_cards(edited, closed))
+            logger.info(f"Alert cards: {len(edited)} edited, {len(closed)} closed, "
+                        f"{len(edits) - len(edited) - len(closed)} failed of {len(cards)} live card(s).")
+            return len(edited)
+        except Exception as e:
+            logger.error(f"Error refreshing alert cards: {e}", exc_info=True)
+            return 0
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+    # --- Internals ---
+
+    async def _load_missing_games(self, games_by_id: Dict[object, dict], alerts: List[dict]):
+        loop = asyncio.get_running_loop()
+        missing = {(alert.get('sport'), alert.get('game_id')) for alert in alerts
+                   if alert.get('game_id') not in games_by_id}
+        for sport, game_id in missing:
+            get_collection = get_nba_collection if sport == "nba" else get_ncaab_collection
+            game = await loop.run_in_executor(None, lambda: get_game_by_id(get_collection(), game_id))
+            if game:
+                games_by_id[game_id] = game
+
+    def _render(self, card: dict, alerts_by_ref: Dict[str, dict], games_by_id: Dict[object, dict]) -> Optional[str]:
+        """Renders a card's current text; None if any of its alerts or games is unavailable."""
+        pairs = []
+        for ref in card.get('alert_refs', []):
+            alert = alerts_by_ref.get(ref)
+            game = games_by_id.get(alert.get('game_id')) if alert else None
+            if not game:
+                return None
+            pairs.append((game, alert))
+        if not pairs:
+            return None
+        if card.get('digest_title'):
+            return render_fade_digest_page(pairs, card['digest_title'], card.get('digest_part', ''))
+        game, alert = pairs[0]
+        return format_fade_alert(game=game, opportunity=alert, result_status=alert.get('status'))
+
+    async def _edit(self, card: dict, text: str, semaphore: asyncio.Semaphore) -> str:
+        from bot import bot  # Import here to avoid circular imports
+        chat_id = card['chat_id']
+        message_id = card['telegram_message_id']
+        async with semaphore:
+            try:
+                await send_scheduler.call(
+                    chat_id,
+                    lambda: bot.edit_message_text(text, chat_id=chat_id, message_id=message_id,
+                                                  parse_mode=card.get('parse_mode')),
+                    PRIORITY_ALERT
+                )
+                self.stats['edited'] += 1
+                return 'edited'
+            except TelegramBadRequest as e:
+                error = str(e).lower()
+                if 'message is not modified' in error:
+                    self.stats['unchanged'] += 1
+                    return 'edited'  # Already shows this text; record it so we stop retrying
+                if 'message to edit not found' in error or "message can't be edited" in error:
+                    self.stats['closed'] += 1
+                    return 'closed'
+                logger.warning(f"Could not edit alert card {message_id} in chat {chat_id}: {e}")
+            except TelegramForbiddenError:
+                self.stats['closed'] += 1
+                return 'closed'
+            except Exception as e:
+                logger.warning(f"Could not edit alert card {message_id} in chat {chat_id}: {e}")
+            self.stats['failed'] += 1
+            return 'failed'
+
+# Create singleton instance
+alert_cards = AlertCardManager()
@@ -1,3 +1,4 @@
+import html
 import time
 import asyncio
 import psutil
@@ -7,6 +8,8 @@ from aiogram import Bot
 from aiogram.exceptions import TelegramAPIError
 from logging_setup import logger
 from config import ADMIN_IDS
+from services.send_scheduler import send_scheduler, PRIORITY_ALERT
+from services.loop_monitor import loop_monitor
 
 class AlertMonitor:
     """Monitors system metrics and sends alerts when thresholds are exceeded."""
@@ -15,7 +18,9 @@ class AlertMonitor:
         self.alert_thresholds = {
             'high_cpu': 80,    # CPU usage percentage
             'high_memory': 500, # Memory usage in MB
-            'slow_response': 5  # Response time in seconds
+            'slow_response': 5,  # Response time in seconds
+            'loop_lag_p99': 250,  # Event loop lag p99 since the last check, in ms
+            'loop_stall': 2000,  # Longest single event loop stall since the last check, in ms
         }
         self.cooldown = 3600  # Alert cooldown in seconds (1 hour)
 
@@ -46,6 +51,22 @@ class AlertMonitor:
                     )
                     self.last_alert['memory'] = current_time
 
+            # Check event loop lag
+            lag = loop_monitor.take_window()
+            if lag.count:
+                p50, p99 = lag.percentiles([0.5, 0.99])
+                if (p99 * 1000 > self.alert_thresholds['loop_lag_p99']
+                        or lag.max * 1000 > self.alert_thresholds['loop_stall']):
+                    if current_time - self.last_alert['loop_lag'] > self.cooldown:
+                        alert = (f"⚠️ Event Loop Stalling: lag p50 {p50 * 1000:.0f}ms, p99 {p99 * 1000:.0f}ms, "
+                                 f"max {lag.max * 1000:.0f}ms over {lag.count} samples")
+                        offenders = loop_monitor.get_offenders(limit=3)
+                        if offenders:
+                            alert += "\nTop blocking call sites:\n" + "\n".join(
+                                f"• {html.escape(o['site'])}: {o['count']}x, max {o['max_ms']:.0f}ms" for o in offenders)
+                        await self._send_alert(bot, alert)
+                        self.last_alert['loop_lag'] = current_time
+
         except psutil.NoSuchProcess:
             logger.warning("psutil.NoSuchProcess error during monitoring.")
         except Exception as e:
@@ -58,8 +79,7 @@ class AlertMonitor:
             if not admin_id:
                 continue  # Skip empty IDs
             try:
-                await bot.send_message(admin_id, message)
-                await asyncio.sleep(0.1)  # Small delay to avoid hitting limits if many admins
+                await send_scheduler.call(admin_id, lambda admin_id=admin_id: bot.send_message(admin_id, message), PRIORITY_ALERT)
             except TelegramAPIError as e:
                 logger.error(f"Telegram API error sending alert to admin {admin_id}: {e}")
             except Exception as e:
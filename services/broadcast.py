@@ -0,0 +1,239 @@
+import asyncio
+import contextvars
+import time
+from typing import Dict, Optional
+from aiogram.exceptions import TelegramBadRequest
+from logging_setup import logger
+from db.user_repo import get_user_ids_page, count_reachable_users
+from db.broadcast_repo import (
+    create_broadcast, checkpoint_broadcast, update_broadcast, get_running_broadcasts
+)
+from db.outbox_repo import get_broadcast_delivery_counts, expire_broadcast_deliveries
+from services.outbox import outbox
+from services.send_scheduler import send_scheduler, PRIORITY_REPLY
+
+class BroadcastEngine:
+    """
+    Streams broadcast recipients from the users collection page by page into the
+    outbox, one delivery per user keyed `broadcast:<id>:<user_id>`. The outbox
+    workers send them at broadcast priority and flag users who blocked the bot, so
+    later broadcasts skip them. A new page is queued once fewer than a page of
+    deliveries is still outstanding, which keeps the backlog bounded.
+
+    After each page the checkpoint (last user ID) and delivery totals are saved. A
+    broadcast interrupted by a restart resumes from the checkpoint, and re-queueing
+    a page is a no-op for users whose delivery was already queued, so nobody gets
+    the message twice. A page that can't be read or queued is retried with backoff.
+    If that keeps failing, the broadcast is marked 'interrupted' with its checkpoint
+    intact and resumes on the next start, rather than being reported complete.
+    """
+    def __init__(self, page_size: int = 500, progress_interval: float = 5.0, poll_interval: float = 2.0,
+                 page_retries: int = 5, retry_backoff: float = 5.0):
+        self.page_size = page_size
+        self.progress_interval = progress_interval
+        self.poll_interval = poll_interval
+        self.page_retries = page_retries
+        self.retry_backoff = retry_backoff
+        self._tasks: Dict[object, asyncio.Task] = {}
+        self._live: Dict[object, dict] = {}  # broadcast_id -> in-memory counters for progress/throughput
+
+    async def start_broadcast(self, text: str, admin_id: int, admin_chat_id: int) -> Optional[dict]:
+        """Creates and starts a broadcast to every reachable user. Raises if the recipients can't be counted."""
+        loop = asyncio.get_running_loop()
+        total = await loop.run_in_executor(None, count_reachable_users)
+        if not total:
+            return None
+        broadcast = await loop.run_in_executor(None, lambda: create_broadcast(text, admin_id, admin_chat_id, total))
+        if broadcast:
+            self._launch(broadcast)
+        return broadcast
+
+    async def resume(self):
+        """Restarts every broadcast that was still running when the process stopped."""
+        loop = asyncio.get_running_loop()
+        for broadcast in await loop.run_in_executor(None, get_running_broadcasts):
+            if broadcast['_id'] not in self._tasks:
+                logger.info(f"Resuming broadcast {broadcast['_id']} after user {broadcast.get('last_user_id')}.")
+                self._launch(broadcast)
+
+    async def cancel(self, broadcast_id=None) -> int:
+        """Cancels one running broadcast, or all of them. Returns how many were cancelled."""
+        targets = [broadcast_id] if broadcast_id is not None else list(self._tasks)
+        cancelled = 0
+        loop = asyncio.get_running_loop()
+        for target in targets:
+            task = self._tasks.get(target)
+            if task and not task.done():
+                task.cancel()
+                await loop.run_in_executor(None, lambda: update_broadcast(target, status="cancelled"))
+                await loop.run_in_executor(None, lambda: expire_broadcast_deliveries(target, "broadcast cancelled"))
+                cancelled += 1
+        return cancelled
+
+    async def stop(self):
+        """Stops broadcast tasks on shutdown, leaving them 'running' so they resume on restart."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_live_stats(self) -> list:
+        """Progress and current throughput of broadcasts running in this process."""
+        stats = []
+        for broadcast_id, live in self._live.items():
+            elapsed = max(time.monotonic() - live['started'], 1e-6)
+            stats.append({
+                'broadcast_id': broadcast_id,
+                'processed': live['sent'] + live['failed'] + live['pruned'],
+                'total': live['total'],
+                'sent': live['sent'],
+                'failed': live['failed'],
+                'pruned': live['pruned'],
+                'rate': live['session_processed'] / elapsed,
+            })
+        return stats
+
+    # --- Internals ---
+
+    def _launch(self, broadcast: dict):
+        broadcast_id = broadcast['_id']
+        # Fresh context: the broadcast outlives the traced /broadcast command that launched it
+        self._tasks[broadcast_id] = asyncio.create_task(self._run(broadcast), context=contextvars.Context())
+        self._tasks[broadcast_id].add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    async def _queue_page(self, broadcast: dict, last_user_id) -> list:
+        """Reads the next page of recipients and queues their deliveries, retrying with exponential backoff."""
+        loop = asyncio.get_running_loop()
+        broadcast_id = broadcast['_id']
+        for attempt in range(1, self.page_retries + 1):
+            try:
+                page = await loop.run_in_executor(None, lambda: get_user_ids_page(last_user_id, self.page_size))
+                await outbox.enqueue_many([
+                    dict(chat_id=user_id, text=broadcast['text'], message_class='broadcast',
+                         idempotency_key=f"broadcast:{broadcast_id}:{user_id}", broadcast_id=broadcast_id)
+                    for user_id in page
+                ])
+                return page
+            except Exception as e:
+                if attempt == self.page_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                logger.warning(f"Could not queue broadcast recipients after user {last_user_id} "
+                               f"(attempt {attempt}), retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+
+    async def _refresh_counts(self, broadcast_id, live: dict) -> Optional[dict]:
+        """Updates the live counters from the broadcast's deliveries in the outbox."""
+        loop = asyncio.get_running_loop()
+        counts = await loop.run_in_executor(None, lambda: get_broadcast_delivery_counts(broadcast_id))
+        if counts is not None:
+            processed = counts['sent'] + counts['failed'] + counts['pruned']
+            live['session_processed'] = processed - live['processed_at_start']
+            live.update(sent=counts['sent'], failed=counts['failed'], pruned=counts['pruned'], queued=counts['queued'])
+        return counts
+
+    async def _wait_for_deliveries(self, broadcast: dict, live: dict, max_queued: int):
+        """Waits until at most `max_queued` of the broadcast's deliveries are outstanding, reporting progress."""
+        while True:
+            counts = await self._refresh_counts(broadcast['_id'], live)
+            if counts is not None and counts['queued'] <= max_queued:
+                return
+            if time.monotonic() - live['last_progress'] >= self.progress_interval:
+                await self._report_progress(broadcast)
+                live['last_progress'] = time.monotonic()
+            await asyncio.sleep(self.poll_interval)
+
+    async def _run(self, broadcast: dict):
+        loop = asyncio.get_running_loop()
+        broadcast_id = broadcast['_id']
+        processed = broadcast.get('sent', 0) + broadcast.get('failed', 0) + broadcast.get('pruned', 0)
+        live = self._live[broadcast_id] = {
+            'total': broadcast.get('total_users', 0),
+            'sent': broadcast.get('sent', 0),
+            'failed': broadcast.get('failed', 0),
+            'pruned': broadcast.get('pruned', 0),
+            'queued': 0,
+            'processed_at_start': processed,
+            'session_processed': 0,
+            'started': time.monotonic(),
+            'last_progress': 0.0,
+        }
+        last_user_id = broadcast.get('last_user_id')
+        try:
+            while True:
+                # Keep at most about one page outstanding before queueing the next
+                await self._wait_for_deliveries(broadcast, live, max_queued=self.page_size)
+                try:
+                    page = await self._queue_page(broadcast, last_user_id)
+                except Exception as e:
+                    logger.error(f"Broadcast {broadcast_id} interrupted at user {last_user_id}: {e}")
+                    await loop.run_in_executor(
+                        None, lambda: update_broadcast(broadcast_id, status="interrupted", error=str(e)))
+                    await self._report_progress(broadcast, interrupted=True)
+                    return
+                if not page:
+                    break
+
+                last_user_id = page[-1]
+                await loop.run_in_executor(
+                    None, lambda: checkpoint_broadcast(broadcast_id, last_user_id, live['sent'], live['failed'], live['pruned']))
+
+            await self._wait_for_deliveries(broadcast, live, max_queued=0)
+            await loop.run_in_executor(
+                None, lambda: checkpoint_broadcast(broadcast_id, last_user_id, live['sent'], live['failed'], live['pruned']))
+            await loop.run_in_executor(None, lambda: update_broadcast(broadcast_id, status="completed"))
+            await self._report_progress(broadcast, finished=True)
+            logger.info(f"Broadcast {broadcast_id} completed: {live['sent']} sent, {live['failed']} failed, {live['pruned']} pruned.")
+        except asyncio.CancelledError:
+            logger.info(f"Broadcast {broadcast_id} stopped at user {last_user_id}.")
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {broadcast_id} aborted: {e}", exc_info=True)
+            await loop.run_in_executor(None, lambda: update_broadcast(broadcast_id, status="error", error=str(e)))
+        finally:
+            self._live.pop(broadcast_id, None)
+
+    async def _report_progress(self, broadcast: dict, finished: bool = False, interrupted: bool = False):
+        """Posts or edits the admin's progress message with counts and live throughput."""
+        from bot import bot  # Import here to avoid circular imports
+        live = self._live.get(broadcast['_id'])
+        if not live:
+            return
+        elapsed = max(time.monotonic() - live['started'], 1e-6)
+        processed = live['sent'] + live['failed'] + live['pruned']
+        if interrupted:
+            headline = "⚠️ Broadcast interrupted: recipients could not be read. It resumes after a restart."
+        else:
+            headline = '✅ Broadcast Complete!' if finished else '🚀 Broadcast in progress...'
+        text = (
+            f"{headline}\n\n"
+            f"Processed: {processed}/{live['total']}\n"
+            f"Sent: {live['sent']}\n"
+            f"Failed: {live['failed']}\n"
+            f"Pruned (blocked bot): {live['pruned']}\n"
+            f"Queued: {live['queued']}\n"
+            f"Throughput: {live['session_processed'] / elapsed:.1f} msg/s\n"
+            f"Time: {elapsed:.1f} seconds"
+        )
+        chat_id = broadcast.get('admin_chat_id')
+        if not chat_id:
+            return
+        try:
+            message_id = broadcast.get('progress_message_id')
+            if message_id:
+                await send_scheduler.call(
+                    chat_id, lambda: bot.edit_message_text(text, chat_id=chat_id, message_id=message_id), PRIORITY_REPLY)
+            else:
+                sent = await send_scheduler.send_message(chat_id, text, priority=PRIORITY_REPLY)
+                broadcast['progress_message_id'] = sent.message_id
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    None, lambda: update_broadcast(broadcast['_id'], progress_message_id=sent.message_id))
+        except TelegramBadRequest as e:
+            if 'message is not modified' not in str(e).lower():
+                logger.warning(f"Could not update broadcast progress for {broadcast['_id']}: {e}")
+        except Exception as e:
+            logger.warning(f"Could not update broadcast progress for {broadcast['_id']}: {e}")
+
+# Create singleton instance
+broadcast_engine = BroadcastEngine()
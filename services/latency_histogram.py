@@ -0,0 +1,105 @@
+from array import array
+from typing import List, Optional
+
+# HDR-style bucketing: values (integer microseconds) below 2 * SUB_BUCKETS get one bucket
+# each; above that every power of two is split into SUB_BUCKETS linear sub-buckets, so
+# any recorded value is within 1/SUB_BUCKETS (~3%) of its bucket.
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_VALUE_BITS = 31  # Values are clamped to ~35 minutes
+BUCKET_COUNT = ((MAX_VALUE_BITS - SUB_BUCKET_BITS) << SUB_BUCKET_BITS) + SUB_BUCKETS
+MAX_VALUE = (1 << MAX_VALUE_BITS) - 1
+_ZEROS = array('I', bytes(4 * BUCKET_COUNT))
+
+def bucket_index(value: int) -> int:
+    """Bucket for a non-negative integer value (microseconds)."""
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return ((shift + 1) << SUB_BUCKET_BITS) + (value >> shift) - SUB_BUCKETS
+
+def bucket_value(index: int) -> float:
+    """Midpoint of a bucket's value range."""
+    if index < 2 * SUB_BUCKETS:
+        return float(index)
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    lower = ((index & (SUB_BUCKETS - 1)) + SUB_BUCKETS) << shift
+    return lower + (1 << shift) / 2
+
+class LatencyHistogram:
+    """
+    Fixed-memory log-bucketed latency histogram.
+
+    Recording is O(1) with no allocation; memory is BUCKET_COUNT counters whatever the
+    number of samples. Percentiles are read by walking the buckets.
+    """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = array('I', _ZEROS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        micros = min(max(int(seconds * 1_000_000), 0), MAX_VALUE)
+        self.counts[bucket_index(micros)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'LatencyHistogram'):
+        counts = self.counts
+        for index, value in enumerate(other.counts):
+            if value:
+                counts[index] += value
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def reset(self):
+        """Zeroes the histogram in place (no reallocation)."""
+        self.counts[:] = _ZEROS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def percentiles(self, quantiles: List[float]) -> List[Optional[float]]:
+        """Values in seconds at the given quantiles (0-1, ascending), in one pass. None if empty."""
+        if not self.count:
+            return [None] * len(quantiles)
+        targets = [max(1, int(q * self.count + 0.999999)) for q in quantiles]
+        results = []
+        seen = 0
+        t = 0
+        for index, value in enumerate(self.counts):
+            if not value:
+                continue
+            seen += value
+            while t < len(targets) and seen >= targets[t]:
+                results.append(min(bucket_value(index) / 1_000_000, self.max))
+                t += 1
+            if t == len(targets):
+                break
+        return results
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        return self.percentiles([quantile])[0]
+
+    def cumulative_counts(self, bounds: List[float]) -> List[int]:
+        """Samples at or below each bound (seconds, ascending), as Prometheus `le` buckets expect."""
+        limits = [bound * 1_000_000 for bound in bounds]
+        results = []
+        seen = 0
+        b = 0
+        for index, value in enumerate(self.counts):
+            if not value:
+                continue
+            midpoint = bucket_value(index)
+            while b < len(limits) and midpoint > limits[b]:
+                results.append(seen)
+                b += 1
+            seen += value
+        results.extend([seen] * (len(limits) - b))
+        return results
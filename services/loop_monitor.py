@@ -0,0 +1,153 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+from logging_setup import logger
+from services.latency_histogram import LatencyHistogram
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def call_site(frames: traceback.StackSummary) -> str:
+    """The innermost frame in our own code (not the stdlib or site-packages) as 'path:line in function'."""
+    for frame in reversed(frames):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(PROJECT_ROOT + os.sep) and 'site-packages' not in path:
+            return f"{os.path.relpath(path, PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    frame = frames[-1] if frames else None
+    return f"{frame.filename}:{frame.lineno} in {frame.name}" if frame else "unknown"
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag and catches the code that causes it.
+
+    Every `interval` seconds a sampler sleeps and records how far past its deadline
+    it resumed. Anything blocking the loop (sync I/O, heavy CPU in a handler) shows
+    up directly as lag, which delays every other update being handled.
+
+    A watchdog thread checks the sampler's deadline; once it is overdue by more than
+    `block_threshold` the loop is stuck in a callback, so the watchdog captures the
+    loop thread's stack. When the sampler wakes, the stall's full lag is charged to
+    the call site (the innermost frame in our code), so offenders aggregate by site.
+    """
+    def __init__(self, interval: float = 0.5, block_threshold: float = 0.1, max_sites: int = 100):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.max_sites = max_sites
+        self.lag = LatencyHistogram()  # Since start, for the metrics endpoint
+        self._window = LatencyHistogram()  # Since the last take_window(), for alerting
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+        self.stalls = 0
+        # Call site -> {'count', 'total_ms', 'max_ms', 'last_seen', 'stack'}
+        self.offenders: Dict[str, dict] = {}
+        self._deadline = 0.0
+        self._captured: Optional[tuple] = None  # (deadline, call site, stack) for the current stall
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._loop_thread_id = threading.get_ident()
+            self._deadline = time.perf_counter() + self.interval
+            self._task = asyncio.create_task(self._sample_loop())
+        if self._watchdog is None or not self._watchdog.is_alive():
+            self._stop_event.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        self._stop_event.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._watchdog = None
+
+    def take_window(self) -> LatencyHistogram:
+        """Lag samples since the previous call, for periodic threshold checks."""
+        window, self._window = self._window, LatencyHistogram()
+        return window
+
+    def get_offenders(self, limit: int = 5) -> List[dict]:
+        """Call sites that blocked the loop, by total stall time."""
+        ranked = sorted(self.offenders.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        return [{'site': site, **stats} for site, stats in ranked[:limit]]
+
+    def get_stats(self) -> dict:
+        p50, p99, p999 = self.lag.percentiles([0.5, 0.99, 0.999])
+        return {
+            'last_ms': self.last_lag * 1000,
+            'max_ms': self.max_lag * 1000,
+            'p50_ms': (p50 or 0.0) * 1000,
+            'p99_ms': (p99 or 0.0) * 1000,
+            'p999_ms': (p999 or 0.0) * 1000,
+            'samples': self.samples,
+            'stalls': self.stalls,
+        }
+
+    # --- Internals ---
+
+    async def _sample_loop(self):
+        while True:
+            try:
+                self._deadline = time.perf_counter() + self.interval
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.perf_counter() - self._deadline)
+                self.lag.record(lag)
+                self._window.record(lag)
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self.samples += 1
+                captured, self._captured = self._captured, None
+                if captured and lag >= self.block_threshold:
+                    self._charge(captured[1], captured[2], lag)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error sampling event loop lag: {e}")
+
+    def _watch(self):
+        """Watchdog thread: snapshots the loop thread's stack when the sampler is overdue."""
+        check_every = max(self.block_threshold / 2, 0.01)
+        while not self._stop_event.wait(check_every):
+            try:
+                deadline = self._deadline
+                if time.perf_counter() - deadline < self.block_threshold:
+                    continue
+                if self._captured and self._captured[0] == deadline:
+                    continue  # Already captured this stall
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                frames = traceback.extract_stack(frame)
+                self._captured = (deadline, call_site(frames), ''.join(traceback.format_list(frames[-12:])))
+            except Exception as e:
+                logger.error(f"Error in event loop watchdog: {e}")
+
+    def _charge(self, site: str, stack: str, lag: float):
+        lag_ms = lag * 1000
+        self.stalls += 1
+        stats = self.offenders.get(site)
+        if stats is None:
+            if len(self.offenders) >= self.max_sites:
+                smallest = min(self.offenders, key=lambda key: self.offenders[key]['total_ms'])
+                del self.offenders[smallest]
+            stats = self.offenders[site] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_seen': 0.0, 'stack': ''}
+        stats['count'] += 1
+        stats['total_ms'] += lag_ms
+        stats['max_ms'] = max(stats['max_ms'], lag_ms)
+        stats['last_seen'] = time.time()
+        stats['stack'] = stack
+        logger.warning(f"Event loop blocked for {lag_ms:.0f}ms at {site}")
+
+# Create singleton instance
+loop_monitor = LoopLagMonitor()
@@ -1,18 +1,49 @@
 import time
 import os
+import threading
 import psutil
 from collections import defaultdict
+from typing import Dict, List, Tuple
 from datetime import timedelta
 from logging_setup import logger
+from services.latency_histogram import LatencyHistogram
+
+class _CommandWindow:
+    """One time slot of a command's rolling window: a latency histogram and error count."""
+    __slots__ = ('epoch', 'latency', 'errors')
 
-class BotMetrics:
-    """Tracks and records bot performance metrics."""
     def __init__(self):
-        self.command_latency = defaultdict(list)  # Command -> List of execution times
-        self.error_counts = defaultdict(int)      # Command -> Error count
+        self.epoch = -1
+        self.latency = LatencyHistogram()
+        self.errors = 0
+
+class BotMetrics:
+    """
+    Tracks and records bot performance metrics.
+
+    Each command has a ring of `windows` slots of `window_seconds` each, holding a
+    fixed-memory latency histogram and an error counter. A slot is reset in place when
+    the ring comes back round to it, so memory per command is constant and get_stats
+    reports tail latency (p50/p90/p99/p99.9) and errors over the last
+    `windows * window_seconds` seconds rather than lifetime averages.
+
+    Lifetime histograms per command and named timings (observe) back the
+    Prometheus endpoint, which needs cumulative counters rather than windows.
+    """
+    PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, window_seconds: int = 60, windows: int = 10):
+        self.window_seconds = window_seconds
+        self.windows = windows
+        self.command_windows: Dict[str, List[_CommandWindow]] = {}  # Command -> ring of time slots
+        self.command_totals = defaultdict(lambda: [0, 0])  # Command -> [uses, errors] since start
+        self.command_lifetime: Dict[str, LatencyHistogram] = {}  # Command -> latency since start
+        # Named timings such as upstream fetches: (name, labels) -> [histogram, errors]
+        self.timings: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], list] = {}
+        self._timings_lock = threading.Lock()  # observe() may be called from executor threads
+        self.update_counts = defaultdict(int)  # Outcome (handled, maintenance, banned) -> updates
         self.user_activity = defaultdict(int)     # User ID -> Command count
         self.start_time = time.time()
-        self.max_latency_entries = 1000  # Max entries per command to keep
         self.activity_cleanup_interval = 86400  # 24 hours
         self.last_activity_cleanup = time.time()
 
@@ -20,20 +51,69 @@ class BotMetrics:
         """Log command execution metrics."""
         command_key = command[1:] if command.startswith('/') else command
 
-        self.command_latency[command_key].append(execution_time)
-        # Keep only last N latency measurements per command
-        if len(self.command_latency[command_key]) > self.max_latency_entries:
-            self.command_latency[command_key] = self.command_latency[command_key][-self.max_latency_entries:]
+        epoch = int(time.time() // self.window_seconds)
+        ring = self.command_windows.get(command_key)
+        if ring is None:
+            ring = self.command_windows[command_key] = [_CommandWindow() for _ in range(self.windows)]
+        slot = ring[epoch % self.windows]
+        if slot.epoch != epoch:  # Slot last used a full ring ago: start it over
+            slot.latency.reset()
+            slot.errors = 0
+            slot.epoch = epoch
+        slot.latency.record(execution_time)
+        lifetime = self.command_lifetime.get(command_key)
+        if lifetime is None:
+            lifetime = self.command_lifetime[command_key] = LatencyHistogram()
+        lifetime.record(execution_time)
 
+        totals = self.command_totals[command_key]
+        totals[0] += 1
         self.user_activity[user_id] += 1
         if not success:
-            self.error_counts[command_key] += 1
+            slot.errors += 1
+            totals[1] += 1
+
+    def observe(self, name: str, seconds: float, success: bool = True, **labels):
+        """Records one timed operation (e.g. an upstream fetch) under a name and labels."""
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._timings_lock:
+            entry = self.timings.get(key)
+            if entry is None:
+                entry = self.timings[key] = [LatencyHistogram(), 0]
+            entry[0].record(seconds)
+            if not success:
+                entry[1] += 1
+
+    def get_timings(self) -> List[Tuple[str, Dict[str, str], LatencyHistogram, int]]:
+        """Copies of the named timings as (name, labels, histogram, errors), sorted by name and labels."""
+        with self._timings_lock:
+            snapshot = []
+            for (name, labels), (histogram, errors) in sorted(self.timings.items(), key=lambda item: item[0]):
+                copy = LatencyHistogram()
+                copy.merge(histogram)
+                snapshot.append((name, dict(labels), copy, errors))
+        return snapshot
+
+    def count_update(self, outcome: str):
+        """Counts one incoming update by what the pre-dispatch stage did with it."""
+        self.update_counts[outcome] += 1
+
+    def get_command_window(self, command_key: str) -> Tuple[LatencyHistogram, int]:
+        """Merged latency histogram and error count for a command over the rolling window."""
+        merged = LatencyHistogram()
+        errors = 0
+        oldest = int(time.time() // self.window_seconds) - self.windows + 1
+        for slot in self.command_windows.get(command_key, []):
+            if slot.epoch >= oldest:
+                merged.merge(slot.latency)
+                errors += slot.errors
+        return merged, errors
 
     def get_stats(self) -> dict:
         """Get current bot statistics."""
         uptime_seconds = time.time() - self.start_time
-        total_commands_processed = sum(len(latencies) for latencies in self.command_latency.values())
-        total_errors = sum(self.error_counts.values())
+        total_commands_processed = sum(uses for uses, _ in self.command_totals.values())
+        total_errors = sum(errors for _, errors in self.command_totals.values())
 
         try:
             process = psutil.Process(os.getpid())
@@ -49,21 +129,27 @@ class BotMetrics:
             "total_errors_logged": total_errors,
             "overall_error_rate": (total_errors / total_commands_processed * 100) if total_commands_processed else 0,
             "memory_usage_mb": memory_mb,
+            "window_minutes": self.windows * self.window_seconds / 60,
             "command_stats": {}
         }
 
-        for cmd, times in self.command_latency.items():
-            if times:
-                usage_count = len(times)
-                cmd_errors = self.error_counts[cmd]
-                stats["command_stats"][cmd] = {
-                    "avg_latency_ms": (sum(times) / usage_count) * 1000,
-                    "max_latency_ms": max(times) * 1000,
-                    "min_latency_ms": min(times) * 1000,
-                    "usage_count": usage_count,
-                    "error_count": cmd_errors,
-                    "error_rate_percent": (cmd_errors / usage_count * 100) if usage_count else 0,
-                }
+        for cmd in self.command_windows:
+            latency, cmd_errors = self.get_command_window(cmd)
+            if not latency.count:
+                continue
+            p50, p90, p99, p999 = latency.percentiles(list(self.PERCENTILES))
+            stats["command_stats"][cmd] = {
+                "avg_latency_ms": latency.total / latency.count * 1000,
+                "max_latency_ms": latency.max * 1000,
+                "p50_ms": p50 * 1000,
+                "p90_ms": p90 * 1000,
+                "p99_ms": p99 * 1000,
+                "p999_ms": p999 * 1000,
+                "usage_count": latency.count,
+                "error_count": cmd_errors,
+                "error_rate_percent": cmd_errors / latency.count * 100,
+                "total_uses": self.command_totals[cmd][0],
+            }
         # Sort command stats by usage count
         stats["command_stats"] = dict(sorted(
             stats["command_stats"].items(), 
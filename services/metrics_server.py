@@ -0,0 +1,185 @@
+import asyncio
+from typing import Dict, List, Optional
+from aiohttp import web
+from logging_setup import logger
+from config import METRICS_HOST, METRICS_PORT
+from services.latency_histogram import LatencyHistogram
+from services.metrics import metrics
+from services.loop_monitor import loop_monitor
+
+# Histogram bucket bounds in seconds (the +Inf bucket is added on render)
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+class _Exposition:
+    """Accumulates metric families in the Prometheus text exposition format."""
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value, labels: Optional[Dict[str, str]] = None):
+        text = str(value) if isinstance(value, int) else repr(float(value))
+        self.lines.append(f"{name}{_labels(labels or {})} {text}")
+
+    def histogram(self, name: str, histogram: LatencyHistogram, labels: Optional[Dict[str, str]] = None):
+        labels = labels or {}
+        for bound, count in zip(LATENCY_BUCKETS, histogram.cumulative_counts(LATENCY_BUCKETS)):
+            self.sample(f"{name}_bucket", count, {**labels, 'le': f"{bound:g}"})
+        self.sample(f"{name}_bucket", histogram.count, {**labels, 'le': '+Inf'})
+        self.sample(f"{name}_sum", histogram.total, labels)
+        self.sample(f"{name}_count", histogram.count, labels)
+
+    def render(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+def _executor_queue_depth() -> int:
+    """Work items waiting for the loop's default executor (run_in_executor calls)."""
+    try:
+        executor = getattr(asyncio.get_running_loop(), '_default_executor', None)
+        work_queue = getattr(executor, '_work_queue', None)
+        return work_queue.qsize() if work_queue is not None else 0
+    except Exception:
+        return 0
+
+def render_metrics() -> str:
+    """Renders every metric family the bot exposes."""
+    # Import here to avoid circular imports
+    from db.connection import mongo_op_stats
+    from services.send_scheduler import send_scheduler
+    from tasks.pipeline import fade_pipeline
+
+    out = _Exposition()
+
+    # Commands
+    out.family('bot_command_duration_seconds', 'histogram', 'Command handler latency since start.')
+    for command, histogram in sorted(metrics.command_lifetime.items()):
+        out.histogram('bot_command_duration_seconds', histogram, {'command': command})
+    out.family('bot_command_errors_total', 'counter', 'Commands that raised or failed.')
+    for command, (_, errors) in sorted(metrics.command_totals.items()):
+        out.sample('bot_command_errors_total', errors, {'command': command})
+    out.family('bot_command_window_latency_seconds', 'gauge',
+               f'Command latency quantiles over the last {metrics.windows * metrics.window_seconds}s.')
+    for command in sorted(metrics.command_windows):
+        histogram, _ = metrics.get_command_window(command)
+        for quantile, value in zip(metrics.PERCENTILES, histogram.percentiles(list(metrics.PERCENTILES))):
+            if value is not None:
+                out.sample('bot_command_window_latency_seconds', value, {'command': command, 'quantile': f"{quantile:g}"})
+
+    # Updates
+    out.family('bot_updates_total', 'counter', 'Incoming updates by pre-dispatch outcome.')
+    for outcome, count in sorted(metrics.update_counts.items()):
+        out.sample('bot_updates_total', count, {'outcome': outcome})
+
+    # Named timings (upstream fetches, ...)
+    timings = metrics.get_timings()
+    for name in sorted({timing[0] for timing in timings}):
+        out.family(f'bot_{name}_duration_seconds', 'histogram', f'Duration of {name} operations.')
+        for timing_name, labels, histogram, _ in timings:
+            if timing_name == name:
+                out.histogram(f'bot_{name}_duration_seconds', histogram, labels)
+        out.family(f'bot_{name}_errors_total', 'counter', f'Failed {name} operations.')
+        for timing_name, labels, _, errors in timings:
+            if timing_name == name:
+                out.sample(f'bot_{name}_errors_total', errors, labels)
+
+    # MongoDB
+    ops = mongo_op_stats.snapshot()
+    out.family('bot_mongo_op_duration_seconds', 'summary', 'MongoDB command latency by command name.')
+    for command, op in sorted(ops.items()):
+        out.sample('bot_mongo_op_duration_seconds_sum', op['total_seconds'], {'command': command})
+        out.sample('bot_mongo_op_duration_seconds_count', op['count'], {'command': command})
+    out.family('bot_mongo_op_failures_total', 'counter', 'Failed MongoDB commands by command name.')
+    for command, op in sorted(ops.items()):
+        out.sample('bot_mongo_op_failures_total', op['failed'], {'command': command})
+
+    # Event loop and executor
+    out.family('bot_executor_queue_depth', 'gauge', 'Calls waiting for the default thread pool executor.')
+    out.sample('bot_executor_queue_depth', _executor_queue_depth())
+    out.family('bot_event_loop_lag_seconds', 'histogram', 'How late the event loop resumed a periodic sleep.')
+    out.histogram('bot_event_loop_lag_seconds', loop_monitor.lag)
+    out.family('bot_event_loop_lag_max_seconds', 'gauge', 'Largest event loop lag seen since start.')
+    out.sample('bot_event_loop_lag_max_seconds', loop_monitor.max_lag)
+    out.family('bot_event_loop_stalls_total', 'counter', 'Event loop stalls by blocking call site.')
+    for offender in loop_monitor.get_offenders(limit=loop_monitor.max_sites):
+        out.sample('bot_event_loop_stalls_total', offender['count'], {'site': offender['site']})
+
+    # Outgoing sends
+    send_stats = send_scheduler.get_stats()
+    out.family('bot_send_queue_depth', 'gauge', 'Queued outgoing Telegram sends by priority.')
+    for priority, depth in send_stats['queue_depth'].items():
+        out.sample('bot_send_queue_depth', depth, {'priority': priority})
+    out.family('bot_sends_total', 'counter', 'Outgoing Telegram sends by result.')
+    out.sample('bot_sends_total', send_stats['sent'], {'result': 'sent'})
+    out.sample('bot_sends_total', send_stats['failed'], {'result': 'failed'})
+
+    # Fade pipeline
+    stages = fade_pipeline.get_stats()['stages']
+    out.family('bot_fade_stage_seconds_total', 'counter', 'Time spent in each fade pipeline stage.')
+    for stage, stats in stages.items():
+        out.sample('bot_fade_stage_seconds_total', stats['total_ms'] / 1000, {'stage': stage})
+    out.family('bot_fade_stage_jobs_total', 'counter', 'Jobs completed by each fade pipeline stage.')
+    for stage, stats in stages.items():
+        out.sample('bot_fade_stage_jobs_total', stats['jobs'], {'stage': stage})
+    out.family('bot_fade_stage_errors_total', 'counter', 'Jobs that failed in each fade pipeline stage.')
+    for stage, stats in stages.items():
+        out.sample('bot_fade_stage_errors_total', stats['errors'], {'stage': stage})
+    out.family('bot_fade_stage_queue_depth', 'gauge', 'Jobs waiting for each fade pipeline stage.')
+    for stage, stats in stages.items():
+        out.sample('bot_fade_stage_queue_depth', stats['queued'], {'stage': stage})
+
+    return out.render()
+
+class MetricsServer:
+    """
+    Serves GET /metrics in the Prometheus text format on a local port.
+
+    Rendering reads in-memory counters only, so a scrape costs no database or API
+    calls. Bound to METRICS_HOST (localhost by default); METRICS_PORT=0 disables it.
+    """
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        if not self.port or self._runner:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        try:
+            await runner.setup()
+            await web.TCPSite(runner, self.host, self.port).start()
+        except Exception as e:
+            logger.error(f"Could not start metrics endpoint on {self.host}:{self.port}: {e}")
+            await runner.cleanup()
+            return
+        self._runner = runner
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        try:
+            body = render_metrics()
+        except Exception as e:
+            logger.error(f"Error rendering metrics: {e}", exc_info=True)
+            return web.Response(status=500, text="error rendering metrics\n")
+        return web.Response(body=body.encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+# Create singleton instance
+metrics_server = MetricsServer()
@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime
+import pytz
+from typing import List, Optional
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
+from logging_setup import logger
+from db.outbox_repo import (
+    enqueue_outbox_messages, claim_outbox_messages, mark_outbox_sent, mark_outbox_retry,
+    mark_outbox_failed, mark_outbox_expired, release_outbox_message, release_inflight_outbox_messages,
+    get_outbox_stats
+)
+from db.user_repo import mark_users_blocked
+from services.send_scheduler import send_scheduler, PRIORITY_ALERT, PRIORITY_BROADCAST
+
+# Message classes and the send priority each one is delivered at
+MESSAGE_CLASS_PRIORITY = {
+    'alert': PRIORITY_ALERT,
+    'broadcast': PRIORITY_BROADCAST,
+}
+
+class Outbox:
+    """
+    Durable delivery queue backed by the outbox collection.
+
+    Messages are written to Mongo first (deduplicated by idempotency key) and then
+    drained by worker tasks through the send scheduler, highest priority and lowest
+    rank first. Messages past their expires_at are dropped. Transient failures are
+    retried with exponential backoff. Messages that were in flight when the process
+    stopped are picked up again on the next start, so delivery is at-least-once.
+
+    A claim is a lease of `lease_seconds`. Sends still waiting in the scheduler
+    `lease_margin` seconds before it runs out are cancelled and the message is put
+    back, so another worker never reclaims a message this one is still holding.
+    """
+    def __init__(self, workers: int = 4, batch_size: int = 25, poll_interval: float = 5.0,
+                 max_attempts: int = 5, base_backoff: float = 10.0, lease_seconds: int = 60,
+                 lease_margin: float = 5.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.lease_margin = lease_margin
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self):
+        """Releases messages left in flight by a previous run and starts the workers."""
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        released = await loop.run_in_executor(None, release_inflight_outbox_messages)
+        if released:
+            logger.info(f"Outbox: resuming {released} message(s) that were in flight at shutdown.")
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()  # Drain anything already queued straight away
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Outbox started with {self.workers} workers.")
+
+    async def stop(self):
+        """Stops the workers. Unsent messages stay queued in Mongo for the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue_many(self, messages: List[dict]) -> int:
+        """Queues many messages in one write. Returns how many were new."""
+        for message in messages:
+            message.setdefault('priority', MESSAGE_CLASS_PRIORITY.get(message.get('message_class'), PRIORITY_BROADCAST))
+        loop = asyncio.get_running_loop()
+        queued = await loop.run_in_executor(None, lambda: enqueue_outbox_messages(messages))
+        if queued and self._wakeup:
+            self._wakeup.set()
+        return queued
+
+    async def get_stats(self, hours: int = 24) -> List[dict]:
+        """Per-class delivery counts and latency."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: get_outbox_stats(hours))
+
+    async def _worker(self, index: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Taken before the claim, so the local deadline never outlives the stored lock
+                deadline = loop.time() + self.lease_seconds - self.lease_margin
+                batch = await loop.run_in_executor(
+                    None, lambda: claim_outbox_messages(self.batch_size, self.lease_seconds)
+                )
+                if not batch:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await asyncio.gather(*(self._deliver(doc, deadline) for doc in batch))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker {index} error: {e}", exc_info=True)
+                await asyncio.sleep(self.poll_interval)
+
+    async def _deliver(self, doc: dict, deadline: float):
+        loop = asyncio.get_running_loop()
+        message_id = doc['_id']
+        expires_at = doc.get('expires_at')
+        if expires_at:
+            if expires_at.tzinfo is None:
+                expires_at = pytz.UTC.localize(expires_at)
+            if datetime.now(pytz.UTC) >= expires_at:
+                # e.g. a pre-game alert whose game has tipped off while it was queued
+                await loop.run_in_executor(None, lambda: mark_outbox_expired(message_id, "expired before delivery"))
+                return
+        lease = asyncio.timeout_at(deadline)
+        try:
+            try:
+                async with lease:
+                    sent = await send_scheduler.send_message(
+                        doc['chat_id'], doc['text'],
+                        priority=doc.get('priority', PRIORITY_BROADCAST),
+                        rank=doc.get('rank') or 0,
+                        parse_mode=doc.get('parse_mode')
+                    )
+            except TimeoutError:
+                if not lease.expired():
+                    raise  # The send itself timed out; retried below like any transient failure
+                # Still queued behind paced sends when the lease ran out: hand it back uncounted
+                logger.warning(f"Outbox message {doc.get('idempotency_key')} to {doc['chat_id']} not sent before its lease ran out; requeued.")
+                await loop.run_in_executor(None, lambda: release_outbox_message(message_id))
+                return
+            await loop.run_in_executor(None, lambda: mark_outbox_sent(message_id, getattr(sent, 'message_id', None)))
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Blocked bot, deleted chat or malformed message: retrying won't help
+            logger.warning(f"Outbox message {doc.get('idempotency_key')} to {doc['chat_id']} failed permanently: {e}")
+            blocked = isinstance(e, TelegramForbiddenError) or 'chat not found' in str(e).lower()
+            await loop.run_in_executor(None, lambda: mark_outbox_failed(message_id, str(e), blocked))
+            if blocked and doc.get('message_class') == 'broadcast':
+                # Flag the user so later broadcasts skip them
+                await loop.run_in_executor(None, lambda: mark_users_blocked([doc['chat_id']]))
+        except Exception as e:
+            attempts = doc.get('attempts', 1)
+            if attempts >= self.max_attempts:
+                logger.error(f"Outbox message {doc.get('idempotency_key')} failed after {attempts} attempts: {e}")
+                await loop.run_in_executor(None, lambda: mark_outbox_failed(message_id, str(e)))
+            else:
+                delay = self.base_backoff * (2 ** (attempts - 1))
+                logger.warning(f"Outbox message {doc.get('idempotency_key')} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+                await loop.run_in_executor(None, lambda: mark_outbox_retry(message_id, str(e), delay))
+
+# Create singleton instance
+outbox = Outbox()
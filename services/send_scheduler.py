@@ -0,0 +1,306 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiogram import types
+from aiogram.exceptions import TelegramRetryAfter
+from logging_setup import logger
+from services.tracing import tracer
+
+# Priority classes: lower value is sent first
+PRIORITY_REPLY = 0      # Direct responses to a user's command
+PRIORITY_ALERT = 1      # Fade alerts, results and admin monitoring alerts
+PRIORITY_BROADCAST = 2  # Admin broadcasts and other bulk sends
+
+PRIORITY_NAMES = {PRIORITY_REPLY: 'reply', PRIORITY_ALERT: 'alert', PRIORITY_BROADCAST: 'broadcast'}
+
+class TokenBucket:
+    """Refilling token bucket: `rate` tokens per second, holding at most `capacity`."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        now = now if now is not None else time.monotonic()
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: Optional[float] = None):
+        now = now if now is not None else time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+
+class _SendJob:
+    __slots__ = ('chat_id', 'priority', 'rank', 'factory', 'future', 'attempts', 'enqueued_at', 'not_before')
+
+    def __init__(self, chat_id: int, priority: int, factory: Callable[[], Awaitable[Any]], future: asyncio.Future,
+                 rank: float = 0.0):
+        self.chat_id = chat_id
+        self.priority = priority
+        self.rank = rank
+        self.factory = factory
+        self.future = future
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+        self.not_before = 0.0
+
+class SendScheduler:
+    """
+    Central outbound queue for Telegram sends.
+
+    Every send passes through a global token bucket (the bot-wide ~30 msg/s limit)
+    and a per-chat bucket (about 1 msg/s in private chats and 20 msg/min in groups,
+    with a small burst allowance). Higher-priority sends go first. A RetryAfter from
+    Telegram pauses all sends for the requested time, and the message is then retried.
+
+    Jobs are queued per chat. Each chat with queued work sits either in a ready heap
+    (ordered by its best job) or in a paced heap (ordered by when its bucket frees up),
+    so a dispatch only touches ready work however many paced chats are backed up.
+    """
+    def __init__(self, global_rate: float = 30.0, private_rate: float = 1.0, group_rate: float = 20 / 60,
+                 chat_burst: int = 3, max_concurrency: int = 20, max_retries: int = 3,
+                 throughput_window: float = 60.0):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._chats: Dict[int, list] = {}  # chat_id -> heap of (priority, rank, seq, job)
+        self._ready = []  # (priority, rank, seq, chat_id) for chats whose best job can go now
+        self._paced = []  # (ready_at, seq, chat_id) for chats waiting on their bucket or a retry pause
+        self._armed: Dict[int, int] = {}  # chat_id -> seq of its live entry in _ready or _paced
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._max_concurrency = max_concurrency
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self.throughput_window = throughput_window
+        self._sent_times = deque()  # monotonic timestamps of successful sends within throughput_window
+        self.stats = {'sent': 0, 'failed': 0, 'retry_after': 0, 'retried': 0}
+        self.sent_by_priority = {p: 0 for p in PRIORITY_NAMES}
+        self.latency_total = {p: 0.0 for p in PRIORITY_NAMES}
+
+    # --- Public API ---
+
+    async def call(self, chat_id: int, factory: Callable[[], Awaitable[Any]], priority: int = PRIORITY_ALERT,
+                   rank: float = 0.0) -> Any:
+        """
+        Schedules an arbitrary Bot API call against a chat and waits for its result.
+        `factory` must create a fresh awaitable each time it is called (it is re-invoked on retry).
+        Within a priority class, lower `rank` goes first (e.g. higher-rated alerts).
+        Exceptions from the call (after retries) are raised to the caller.
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._push(_SendJob(chat_id, priority, factory, future, rank))
+        with tracer.span('telegram.send', priority=PRIORITY_NAMES.get(priority, priority)):
+            return await future
+
+    async def send_message(self, chat_id: int, text: str, priority: int = PRIORITY_ALERT, rank: float = 0.0,
+                           **kwargs) -> Any:
+        """Schedules bot.send_message and waits for the sent message."""
+        from bot import bot  # Import here to avoid circular imports
+        return await self.call(chat_id, lambda: bot.send_message(chat_id, text, **kwargs), priority, rank)
+
+    async def answer(self, event, text: str, priority: int = PRIORITY_REPLY, **kwargs) -> Any:
+        """
+        Schedules a reply to a user's message (highest priority by default). Callback
+        queries are answered with their own answer(), paced against the chat they came from.
+        """
+        if isinstance(event, types.CallbackQuery):
+            chat_id = event.message.chat.id if event.message else event.from_user.id
+        else:
+            chat_id = event.chat.id
+        return await self.call(chat_id, lambda: event.answer(text, **kwargs), priority)
+
+    def queue_depth(self) -> Dict[str, int]:
+        """Number of queued sends per priority class."""
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for *_, job in (entry for queue in self._chats.values() for entry in queue):
+            depth[PRIORITY_NAMES.get(job.priority, str(job.priority))] += 1
+        return depth
+
+    def throughput(self) -> float:
+        """Successful sends per second over the last `throughput_window` seconds."""
+        self._trim_sent_times(time.monotonic())
+        return len(self._sent_times) / self.throughput_window
+
+    def get_stats(self) -> dict:
+        """Queue depth, throughput and counters for /botstats."""
+        return {
+            'queue_depth': self.queue_depth(),
+            'throughput_per_sec': self.throughput(),
+            'paused_for': max(0.0, self._paused_until - time.monotonic()),
+            'avg_latency_ms': {
+                PRIORITY_NAMES[p]: (self.latency_total[p] / self.sent_by_priority[p] * 1000) if self.sent_by_priority[p] else 0.0
+                for p in PRIORITY_NAMES
+            },
+            **self.stats,
+        }
+
+    async def stop(self):
+        """Stops the dispatcher, failing any sends still queued."""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        for queue in self._chats.values():
+            for *_, job in queue:
+                if not job.future.done():
+                    job.future.set_exception(asyncio.CancelledError())
+        self._chats, self._ready, self._paced, self._armed = {}, [], [], {}
+
+    # --- Internals ---
+
+    def _ensure_started(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            # Fresh context: started lazily from a traced send, it must not carry that trace's span
+            self._dispatcher = asyncio.create_task(self._dispatch_loop(), context=contextvars.Context())
+            logger.info("Send scheduler started.")
+
+    def _push(self, job: _SendJob, not_before: float = 0.0):
+        job.not_before = not_before
+        heapq.heappush(self._chats.setdefault(job.chat_id, []), (job.priority, job.rank, next(self._seq), job))
+        self._arm(job.chat_id, time.monotonic())
+        self._wakeup.set()
+
+    def _arm(self, chat_id: int, now: float):
+        """(Re)files a chat under its best queued job; any older entry for the chat goes stale."""
+        queue = self._chats.get(chat_id)
+        while queue and queue[0][3].future.done():
+            heapq.heappop(queue)  # Caller gave up (e.g. timed out); don't send
+        if not queue:
+            self._chats.pop(chat_id, None)
+            self._armed.pop(chat_id, None)
+            return
+        priority, rank, _, job = queue[0]
+        seq = next(self._seq)
+        self._armed[chat_id] = seq
+        ready_at = max(job.not_before, now + self._chat_bucket(chat_id).delay(now))
+        if ready_at <= now:
+            heapq.heappush(self._ready, (priority, rank, seq, chat_id))
+        else:
+            heapq.heappush(self._paced, (ready_at, seq, chat_id))
+
+    def _trim_sent_times(self, now: float):
+        cutoff = now - self.throughput_window
+        while self._sent_times and self._sent_times[0] < cutoff:
+            self._sent_times.popleft()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Negative IDs are groups and channels, which Telegram limits much harder
+            rate = self.group_rate if chat_id < 0 else self.private_rate
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    def _next_ready(self, now: float):
+        """Pops the highest-priority job whose chat can send now; otherwise returns the shortest wait."""
+        while self._paced and self._paced[0][0] <= now:
+            _, seq, chat_id = heapq.heappop(self._paced)
+            if self._armed.get(chat_id) == seq:
+                self._arm(chat_id, now)
+        while self._ready:
+            _, _, seq, chat_id = heapq.heappop(self._ready)
+            if self._armed.get(chat_id) != seq:
+                continue  # Superseded by a later push for this chat
+            del self._armed[chat_id]
+            _, _, _, job = heapq.heappop(self._chats[chat_id])
+            if job.future.done():
+                self._arm(chat_id, now)
+                continue
+            return job, None
+        return None, (self._paced[0][0] - now if self._paced else None)
+
+    async def _dispatch_loop(self):
+        while True:
+            try:
+                if not self._chats:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                now = time.monotonic()
+                pause = max(self._paused_until - now, self.global_bucket.delay(now))
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                    continue
+
+                job, wait = self._next_ready(now)
+                if job is None:
+                    # Every queued chat is being paced; sleep until the first frees up or new work arrives
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                self.global_bucket.take(now)
+                self._chat_bucket(job.chat_id).take(now)
+                self._arm(job.chat_id, now)  # File the chat's next job, if any, under its new pacing
+                await self._semaphore.acquire()
+                asyncio.create_task(self._run(job))
+
+                # Drop pacing state for idle chats so the map doesn't grow forever
+                if len(self._chat_buckets) > 10000:
+                    self._chat_buckets = {cid: b for cid, b in self._chat_buckets.items()
+                                          if b.delay(now) > 0 or cid in self._chats}
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in send scheduler dispatch loop: {e}", exc_info=True)
+                await asyncio.sleep(1)
+
+    async def _run(self, job: _SendJob):
+        try:
+            job.attempts += 1
+            result = await job.factory()
+        except TelegramRetryAfter as e:
+            self.stats['retry_after'] += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            logger.warning(f"Telegram flood control: pausing sends for {e.retry_after}s (chat {job.chat_id}).")
+            if job.attempts <= self.max_retries:
+                self.stats['retried'] += 1
+                self._push(job, not_before=self._paused_until)
+            else:
+                self.stats['failed'] += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+        except Exception as e:
+            self.stats['failed'] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            now = time.monotonic()
+            self.stats['sent'] += 1
+            self._sent_times.append(now)
+            self._trim_sent_times(now)  # Bounded even if nothing ever reads throughput()
+            if job.priority in self.sent_by_priority:
+                self.sent_by_priority[job.priority] += 1
+                self.latency_total[job.priority] += now - job.enqueued_at
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._semaphore.release()
+
+# Create singleton instance
+send_scheduler = SendScheduler()
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from logging_setup import logger
+from db.connection import get_nba_collection, get_ncaab_collection
+from db.game_repo import get_scheduled_games
+from db.utils import get_eastern_time_date
+from utils.formatters import render_slate_pages
+
+SPORT_TITLES = {'nba': "🏀 <b>NBA Games for {date}</b>", 'ncaab': "🏫 <b>NCAAB Games for {date}</b>"}
+SPORT_COLLECTIONS = {'nba': get_nba_collection, 'ncaab': get_ncaab_collection}
+
+class SlateCache:
+    """
+    Rendered slate pages per (sport, date).
+
+    /nba and /ncaab re-render the slate from the fade pipeline's latest output (at most
+    once per `ttl` seconds) and send the first page; page navigation callbacks are served from the cached pages without
+    hitting the API, so a full slate costs one message plus edits.
+    """
+    def __init__(self, ttl: float = 60.0, per_page: int = 10, max_slates: int = 20):
+        self.ttl = ttl
+        self.per_page = per_page
+        self.max_slates = max_slates
+        self._slates: OrderedDict = OrderedDict()  # (sport, date) -> {'pages', 'updated', 'fetched_at'}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_pages(self, sport: str, date: str, refresh: bool = False) -> Tuple[List[str], Optional[str]]:
+        """
+        Returns (pages, updated_time_str) for a slate. With refresh=True the games come
+        from a fresh pipeline ingestion unless the cached slate is younger than the TTL; without it,
+        a cache miss falls back to the games already stored in the database. An unknown
+        sport returns no pages.
+        """
+        if sport not in SPORT_COLLECTIONS:
+            return [], None
+        key = (sport, date)
+        entry = self._slates.get(key)
+        if entry and (not refresh or time.monotonic() - entry['fetched_at'] < self.ttl):
+            self.hits += 1
+            self._slates.move_to_end(key)
+            return entry['pages'], entry['updated']
+
+        self.misses += 1
+        try:
+            if refresh:
+                from tasks.pipeline import fade_pipeline  # Import here to avoid circular imports
+                output = await fade_pipeline.get_output(sport, date)
+                games = output['games'] if output else []
+            else:
+                get_collection = SPORT_COLLECTIONS[sport]
+                loop = asyncio.get_running_loop()
+                games = await loop.run_in_executor(None, lambda: get_scheduled_games(get_collection(), date))
+        except Exception as e:
+            logger.error(f"Error loading {sport.upper()} slate for {date}: {e}", exc_info=True)
+            games = []
+
+        if not games:
+            return [], None
+        title = SPORT_TITLES[sport].format(date=date)
+        pages = render_slate_pages(games, sport, title, self.per_page)
+        updated = get_eastern_time_date()[1]
+        self._slates[key] = {'pages': pages, 'updated': updated, 'fetched_at': time.monotonic()}
+        self._slates.move_to_end(key)
+        while len(self._slates) > self.max_slates:
+            self._slates.popitem(last=False)
+        return pages, updated
+
+    def peek(self, sport: str, date: str) -> Tuple[List[str], Optional[str]]:
+        """Cached pages for a slate however old they are, without loading anything."""
+        entry = self._slates.get((sport, date))
+        return (entry['pages'], entry['updated']) if entry else ([], None)
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'slates': len(self._slates),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits / lookups * 100) if lookups else 0.0,
+        }
+
+# Create singleton instance
+slate_cache = SlateCache()
@@ -0,0 +1,142 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import pytz
+from logging_setup import logger
+from db.subscription_repo import (
+    upsert_subscription, deactivate_subscription, set_subscription_quiet_hours, get_active_subscriptions
+)
+
+SPORTS = ('nba', 'ncaab')
+MARKETS = ('Spread', 'Total', 'Moneyline')
+MAX_RATING = 5
+EASTERN = pytz.timezone('America/New_York')
+
+def in_quiet_hours(hour: int, quiet_start: Optional[int], quiet_end: Optional[int]) -> bool:
+    """True if an Eastern hour falls in [quiet_start, quiet_end), wrapping past midnight."""
+    if quiet_start is None or quiet_end is None or quiet_start == quiet_end:
+        return False
+    if quiet_start < quiet_end:
+        return quiet_start <= hour < quiet_end
+    return hour >= quiet_start or hour < quiet_end
+
+class SubscriptionManager:
+    """
+    Keeps active fade alert subscriptions in memory, indexed by segment.
+
+    Recipients of an alert are the users in its (sport, market) segment whose
+    minimum rating is at or below the alert's rating. Users are kept in a
+    cumulative set for every rating their minimum allows, so a lookup is a single
+    set intersection instead of a scan over every subscriber.
+    """
+    def __init__(self):
+        self.subscriptions: Dict[int, dict] = {}                        # user_id -> subscription
+        self._by_segment: Dict[Tuple[str, str], Set[int]] = defaultdict(set)  # (sport, market) -> user_ids
+        self._by_max_rating: List[Set[int]] = [set() for _ in range(MAX_RATING + 1)]  # rating -> user_ids with min_rating <= rating
+        self._quiet: Dict[int, Tuple[int, int]] = {}                    # user_id -> (start, end), only if set
+        self._lock = asyncio.Lock()
+        self.loaded = False
+
+    def _index(self, sub: dict):
+        user_id = sub['user_id']
+        self.subscriptions[user_id] = sub
+        for sport in sub.get('sports', []):
+            for market in sub.get('markets', []):
+                self._by_segment[(sport, market)].add(user_id)
+        min_rating = min(max(int(sub.get('min_rating') or 1), 1), MAX_RATING)
+        for rating in range(min_rating, MAX_RATING + 1):
+            self._by_max_rating[rating].add(user_id)
+        if sub.get('quiet_start') is not None and sub.get('quiet_end') is not None:
+            self._quiet[user_id] = (sub['quiet_start'], sub['quiet_end'])
+
+    def _unindex(self, user_id: int):
+        sub = self.subscriptions.pop(user_id, None)
+        if not sub:
+            return
+        for sport in sub.get('sports', []):
+            for market in sub.get('markets', []):
+                self._by_segment[(sport, market)].discard(user_id)
+        for users in self._by_max_rating:
+            users.discard(user_id)
+        self._quiet.pop(user_id, None)
+
+    async def load(self):
+        """Loads all active subscriptions from the database and rebuilds the index."""
+        loop = asyncio.get_running_loop()
+        subs = await loop.run_in_executor(None, get_active_subscriptions)
+        async with self._lock:
+            self.subscriptions.clear()
+            self._by_segment.clear()
+            self._by_max_rating = [set() for _ in range(MAX_RATING + 1)]
+            self._quiet.clear()
+            for sub in subs:
+                self._index(sub)
+            self.loaded = True
+        logger.info(f"Loaded {len(self.subscriptions)} active fade alert subscriptions.")
+
+    async def subscribe(self, user_id: int, chat_id: int, sports: List[str], markets: List[str],
+                        min_rating: int) -> Optional[dict]:
+        """Creates or replaces a subscription, keeping any quiet hours already set."""
+        existing = self.subscriptions.get(user_id) or {}
+        quiet_start, quiet_end = existing.get('quiet_start'), existing.get('quiet_end')
+        loop = asyncio.get_running_loop()
+        sub = await loop.run_in_executor(
+            None, lambda: upsert_subscription(user_id, chat_id, sports, markets, min_rating, quiet_start, quiet_end))
+        if sub:
+            async with self._lock:
+                self._unindex(user_id)
+                self._index(sub)
+            logger.info(f"User {user_id} subscribed to fade alerts: {sports} {markets} min {min_rating}*")
+        return sub
+
+    async def unsubscribe(self, user_id: int) -> bool:
+        """Deactivates a subscription. Returns False if the user had none."""
+        loop = asyncio.get_running_loop()
+        changed = await loop.run_in_executor(None, lambda: deactivate_subscription(user_id))
+        async with self._lock:
+            was_indexed = user_id in self.subscriptions
+            self._unindex(user_id)
+        if changed or was_indexed:
+            logger.info(f"User {user_id} unsubscribed from fade alerts.")
+        return changed or was_indexed
+
+    async def set_quiet_hours(self, user_id: int, quiet_start: Optional[int], quiet_end: Optional[int]) -> bool:
+        """Sets or clears (None, None) quiet hours. Returns False if the user is not subscribed."""
+        if user_id not in self.subscriptions:
+            return False
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, lambda: set_subscription_quiet_hours(user_id, quiet_start, quiet_end)):
+            return False
+        async with self._lock:
+            sub = dict(self.subscriptions[user_id], quiet_start=quiet_start, quiet_end=quiet_end)
+            self._unindex(user_id)
+            self._index(sub)
+        return True
+
+    def get(self, user_id: int) -> Optional[dict]:
+        """Returns a user's active subscription, if any."""
+        return self.subscriptions.get(user_id)
+
+    def recipients(self, sport: str, market: str, rating: int, now: Optional[datetime] = None) -> List[int]:
+        """Chat IDs that should receive an alert for this segment and rating right now."""
+        segment = self._by_segment.get((sport, market))
+        if not segment:
+            return []
+        eligible = self._by_max_rating[min(max(int(rating or 0), 0), MAX_RATING)]
+        user_ids = segment & eligible
+        if self._quiet and user_ids:
+            hour = (now or datetime.now(EASTERN)).hour
+            user_ids = {u for u in user_ids if u not in self._quiet or not in_quiet_hours(hour, *self._quiet[u])}
+        return [self.subscriptions[u].get('chat_id', u) for u in user_ids]
+
+    def get_stats(self) -> dict:
+        """Subscriber counts for admin stats."""
+        return {
+            'total': len(self.subscriptions),
+            'by_sport': {sport: len(set().union(*(u for (s, _), u in self._by_segment.items() if s == sport)))
+                         for sport in SPORTS},
+        }
+
+# Create singleton instance
+subscription_manager = SubscriptionManager()
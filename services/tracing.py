@@ -0,0 +1,274 @@
+import asyncio
+import contextvars
+import functools
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from logging_setup import logger
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+class Span:
+    """One timed step of a trace. Offsets are seconds from the start of the trace."""
+    __slots__ = ('trace', 'name', 'parent', 'offset', 'duration', 'attrs', 'error')
+
+    def __init__(self, trace: 'Trace', name: str, parent: Optional['Span'], offset: float, attrs: dict):
+        self.trace = trace
+        self.name = name
+        self.parent = parent
+        self.offset = offset
+        self.duration: Optional[float] = None
+        self.attrs = attrs
+        self.error: Optional[str] = None
+
+class Trace:
+    """A command or periodic cycle: its root span and every span opened under it."""
+    __slots__ = ('trace_id', 'started_at', 'start', 'spans')
+
+    def __init__(self, trace_id: int):
+        self.trace_id = trace_id
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []  # Root first; appended from executor threads too
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def to_dict(self) -> dict:
+        index = {id(span): i for i, span in enumerate(self.spans)}
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'started_at': self.started_at,
+            'duration_ms': round((self.root.duration or 0.0) * 1000, 3),
+            'spans': [
+                {
+                    'name': span.name,
+                    'parent': index.get(id(span.parent)),
+                    'offset_ms': round(span.offset * 1000, 3),
+                    'duration_ms': round((span.duration or 0.0) * 1000, 3),
+                    **({'attrs': span.attrs} if span.attrs else {}),
+                    **({'error': span.error} if span.error else {}),
+                }
+                for span in self.spans
+            ],
+        }
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    Thread pool that runs each call in a copy of the submitting context, so the span
+    that was current in the coroutine stays current inside run_in_executor.
+    """
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+class Tracer:
+    """
+    Lightweight span tracing for commands and the periodic cycle.
+
+    A trace is opened around a command or cycle and spans nest under whatever span
+    is current in the context (a ContextVar), including inside run_in_executor once
+    ContextThreadPoolExecutor is the loop's default executor. Outside a trace, span()
+    and record() do nothing, so instrumented code costs a ContextVar lookup when idle.
+    Finished traces go into a ring buffer for /traces and are appended to a JSON
+    lines file by a background exporter.
+    """
+    def __init__(self, capacity: int = 500, export_path: str = os.path.join("logs", "traces.jsonl"),
+                 export_interval: float = 10.0, max_file_bytes: int = 10 * 1024 * 1024, max_spans: int = 2000):
+        self.traces: deque = deque(maxlen=capacity)
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.max_file_bytes = max_file_bytes
+        self.max_spans = max_spans  # Per trace; later spans are dropped
+        self._ids = itertools.count(1)
+        self._pending: List[Trace] = []
+        self._export_task: Optional[asyncio.Task] = None
+        self.stats = {'traces': 0, 'exported': 0, 'export_errors': 0, 'dropped_spans': 0}
+
+    # --- Recording ---
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        """Opens a new trace, or a child span if one is already current."""
+        if _current_span.get() is not None:
+            with self.span(name, **attrs) as span:
+                yield span
+            return
+        trace = Trace(next(self._ids))
+        root = Span(trace, name, None, 0.0, attrs)
+        trace.spans.append(root)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.error = type(e).__name__
+            raise
+        finally:
+            root.duration = time.perf_counter() - trace.start
+            _current_span.reset(token)
+            self._finish(trace)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Times a step under the current span. No-op (yields None) outside a trace."""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        trace = parent.trace
+        if len(trace.spans) >= self.max_spans:
+            self.stats['dropped_spans'] += 1
+            yield None
+            return
+        started = time.perf_counter()
+        span = Span(trace, name, parent, started - trace.start, attrs)
+        trace.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+
+    def record(self, name: str, seconds: float, **attrs):
+        """Adds an already-finished step (e.g. a Mongo command) under the current span."""
+        parent = _current_span.get()
+        if parent is None:
+            return
+        trace = parent.trace
+        if len(trace.spans) >= self.max_spans:
+            self.stats['dropped_spans'] += 1
+            return
+        span = Span(trace, name, parent, time.perf_counter() - trace.start - seconds, attrs)
+        span.duration = seconds
+        trace.spans.append(span)
+
+    @contextmanager
+    def activate(self, span: Optional[Span]):
+        """Makes a span captured elsewhere current, e.g. in a worker task handling a queued job."""
+        if span is None:
+            yield
+            return
+        token = _current_span.set(span)
+        try:
+            yield
+        finally:
+            _current_span.reset(token)
+
+    def traced(self, name: Optional[str] = None):
+        """Decorator that wraps an async function in a span."""
+        def decorator(func):
+            span_name = name or func.__name__
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # --- Reading ---
+
+    def slowest(self, limit: int = 5, window: Optional[float] = None, name: Optional[str] = None) -> List[Trace]:
+        """Slowest finished traces, optionally only from the last `window` seconds or with a given root name."""
+        cutoff = time.time() - window if window else 0.0
+        candidates = [t for t in list(self.traces)
+                      if t.started_at >= cutoff and (name is None or t.root.name == name)]
+        return sorted(candidates, key=lambda t: t.root.duration or 0.0, reverse=True)[:limit]
+
+    @staticmethod
+    def breakdown(trace: Trace, max_depth: int = 3) -> List[dict]:
+        """
+        The trace's spans as an indented tree, siblings with the same name merged
+        (e.g. thirty `mongo.find` calls become one row): depth, name, count, total and max seconds.
+        """
+        children: Dict[int, List[Span]] = {}
+        for span in trace.spans[1:]:
+            children.setdefault(id(span.parent), []).append(span)
+
+        rows = []
+        def walk(spans: List[Span], depth: int):
+            groups: Dict[str, List[Span]] = {}
+            for span in spans:
+                groups.setdefault(span.name, []).append(span)
+            for group_name, group in sorted(groups.items(), key=lambda item: -sum(s.duration or 0.0 for s in item[1])):
+                durations = [s.duration or 0.0 for s in group]
+                rows.append({'depth': depth, 'name': group_name, 'count': len(group), 'total': sum(durations),
+                             'max': max(durations), 'errors': sum(1 for s in group if s.error)})
+                if depth < max_depth:
+                    nested = [child for s in group for child in children.get(id(s), [])]
+                    if nested:
+                        walk(nested, depth + 1)
+        walk(children.get(id(trace.root), []), 1)
+        return rows
+
+    def get_stats(self) -> dict:
+        return {**self.stats, 'buffered': len(self.traces), 'pending_export': len(self._pending)}
+
+    # --- Export ---
+
+    async def start(self):
+        if self._export_task is None or self._export_task.done():
+            self._export_task = asyncio.create_task(self._export_loop())
+
+    async def stop(self):
+        if self._export_task:
+            self._export_task.cancel()
+            try:
+                await self._export_task
+            except asyncio.CancelledError:
+                pass
+            self._export_task = None
+        await self.export()
+
+    async def export(self):
+        """Appends finished traces to the export file (in the executor, off the event loop)."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        lines = [json.dumps(trace.to_dict(), default=str) for trace in pending]
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, lambda: self._write(lines))
+            self.stats['exported'] += len(lines)
+        except Exception as e:
+            self.stats['export_errors'] += 1
+            logger.error(f"Error exporting {len(lines)} traces to {self.export_path}: {e}")
+
+    def _write(self, lines: List[str]):
+        directory = os.path.dirname(self.export_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.export_path) and os.path.getsize(self.export_path) > self.max_file_bytes:
+            os.replace(self.export_path, self.export_path + ".1")  # Keep one previous file
+        with open(self.export_path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    async def _export_loop(self):
+        while True:
+            await asyncio.sleep(self.export_interval)
+            try:
+                await self.export()
+            except Exception as e:
+                logger.error(f"Error in trace export loop: {e}")
+
+    def _finish(self, trace: Trace):
+        self.traces.append(trace)
+        self._pending.append(trace)
+        if len(self._pending) > self.traces.maxlen:
+            del self._pending[:-self.traces.maxlen]  # Exporter is stuck; keep the newest
+        self.stats['traces'] += 1
+
+# Create singleton instance
+tracer = Tracer()
@@ -1,114 +1,355 @@
 import asyncio
 import time
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
 from typing import Tuple, Optional, Dict
 from logging_setup import logger
-from db.user_repo import save_user_stats # Import the specific function
+from db.user_repo import save_user_stats_batch, get_user_state, save_user_ban, get_active_bans
+
+def _empty_delta() -> dict:
+    return {'commands': defaultdict(int), 'last_seen': 0, 'join_date': None, 'ban_history': [], 'warning_history': []}
+
+def _state_from_doc(doc: Optional[dict]) -> dict:
+    """In-memory user state from a users document (or a fresh one for unknown users)."""
+    doc = doc or {}
+    return {
+        'commands': defaultdict(int, doc.get('commands') or {}),
+        'last_seen': doc.get('last_seen') or 0,
+        'join_date': doc.get('join_date'),
+        'ban_history': list(doc.get('ban_history') or []),
+        'warning_history': list(doc.get('warning_history') or [])
+    }
 
 class UserManager:
-    def __init__(self):
-        self.banned_users = {}  # user_id -> {until: timestamp, reason: str, by_admin: int}
-        self.user_stats = defaultdict(lambda: {
-            'commands': defaultdict(int),
-            'last_seen': 0,
-            'join_date': None,
-            'ban_history': [],
-            'warning_history': []
-        })
-        self._lock = asyncio.Lock()
+    """
+    Lazily loaded user state with write-behind persistence.
+
+    A user's stats and history are loaded from the users collection the first time
+    they are touched and kept in an LRU of at most `max_cached_users` entries, so
+    memory stays flat as the user base grows. Users with unsaved changes are never
+    evicted. Active bans are persisted on the user document, indexed by expiry, and
+    loaded on start() so they survive restarts. Ban checks and stats reads take
+    no lock; only cache misses lock, on a shard picked by user ID.
+
+    Activity, bans and warnings update memory immediately and record a delta for
+    the user in a dirty buffer. The buffer is written as one bulk write every
+    `flush_interval` seconds or once `flush_max_users` users are dirty, using $inc
+    for command counters and $push for new history entries. stop() flushes what
+    is left, so nothing buffered is lost on a clean shutdown.
+    """
+    def __init__(self, flush_interval: float = 30.0, flush_max_users: int = 500, max_cached_users: int = 10000,
+                 lock_shards: int = 64, activity_buffer_size: int = 8192, activity_drain_interval: float = 1.0):
+        # Active bans only: user_id -> {until: timestamp, reason: str, by_admin: int}. Replaced, never
+        # mutated, on every change (copy-on-write), so readers use whatever dict they see without a lock.
+        self.banned_users: Dict[int, dict] = {}
+        self.user_stats: OrderedDict = OrderedDict()  # user_id -> stats, least recently used first
+        self.max_cached_users = max_cached_users
+        # Per-user locks, sharded by user ID, serialize each user's load-then-update sequence.
+        # Everything else mutates shared state without awaiting, which is atomic on the event loop.
+        self._shard_locks = [asyncio.Lock() for _ in range(lock_shards)]
         self._last_warn = defaultdict(float)  # user_id -> last warn timestamp
+        self.flush_interval = flush_interval
+        self.flush_max_users = flush_max_users
+        self._dirty: Dict[int, dict] = {}  # user_id -> changes not yet written to the DB
+        self._flushing: set = set()  # user_ids whose changes are being written right now
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.flush_stats = {'flushes': 0, 'users_written': 0, 'failed': 0, 'last_flush_ms': 0.0}
+        self.cache_stats = {'hits': 0, 'loads': 0, 'evictions': 0}
+        # Ring buffer of (user_id, command) recorded by the pre-dispatch middleware, applied in batches
+        self._activity: deque = deque(maxlen=activity_buffer_size)
+        self.activity_drain_interval = activity_drain_interval
+        self._activity_task: Optional[asyncio.Task] = None
+        self.activity_stats = {'recorded': 0, 'dropped': 0, 'applied': 0}
+
+    def get_ban(self, user_id: int) -> Optional[dict]:
+        """The user's active ban, or None. Synchronous and lock-free for the per-update fast path."""
+        ban = self.banned_users.get(user_id)
+        return ban if ban and time.time() < ban['until'] else None
 
     async def is_banned(self, user_id: int) -> Tuple[bool, Optional[str]]:
-        """Check if user is banned. Returns (is_banned, reason)."""
-        async with self._lock:
-            if user_id in self.banned_users:
-                if time.time() < self.banned_users[user_id]['until']:
-                    return True, self.banned_users[user_id]['reason']
-                else:
-                    # Ban expired, remove it
-                    del self.banned_users[user_id]
-            return False, None
+        """Check if user is banned. Returns (is_banned, reason). Lock-free; expired bans are pruned by writers."""
+        ban = self.banned_users.get(user_id)
+        if ban and time.time() < ban['until']:
+            return True, ban['reason']
+        return False, None
+
+    def get_active_bans(self) -> Dict[int, dict]:
+        """Snapshot of the bans that haven't expired yet."""
+        now = time.time()
+        return {uid: ban for uid, ban in self.banned_users.items() if ban['until'] > now}
 
     async def tempban_user(self, user_id: int, hours: int, reason: str, by_admin: int):
-        """Temporarily ban a user."""
+        """
+        Temporarily ban a user. The ban is written before it takes effect; if loading the
+        user or saving the ban fails, the error is raised and nothing is applied.
+        """
         until = time.time() + (hours * 3600)
-        async with self._lock:
-            self.banned_users[user_id] = {
-                'until': until,
-                'reason': reason,
-                'by_admin': by_admin
-            }
-            # Ensure structure exists before appending
-            if 'ban_history' not in self.user_stats[user_id]:
-                 self.user_stats[user_id]['ban_history'] = []
-            self.user_stats[user_id]['ban_history'].append({
-                'timestamp': time.time(),
-                'duration': hours,
-                'reason': reason,
-                'by_admin': by_admin
-            })
+        ban = {
+            'until': until,
+            'reason': reason,
+            'by_admin': by_admin
+        }
+        await self._ensure_loaded(user_id)
+        # Bans are written straight away rather than buffered, so a crash can't lift them
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, lambda: save_user_ban(user_id, ban))
+        self.banned_users = {**self.get_active_bans(), user_id: ban}
+        entry = {
+            'timestamp': time.time(),
+            'duration': hours,
+            'reason': reason,
+            'by_admin': by_admin
+        }
+        self._stats_for(user_id)['ban_history'].append(entry)
+        self._mark_dirty(user_id)['ban_history'].append(entry)
         logger.info(f"User {user_id} banned for {hours} hours by {by_admin}. Reason: {reason}")
 
     async def warn_user(self, user_id: int, reason: str, by_admin: int):
         """Issue a warning to a user."""
-        async with self._lock:
-            if 'warning_history' not in self.user_stats[user_id]:
-                self.user_stats[user_id]['warning_history'] = []
-            self.user_stats[user_id]['warning_history'].append({
-                'timestamp': time.time(),
-                'reason': reason,
-                'by_admin': by_admin
-            })
+        await self._ensure_loaded(user_id)
+        entry = {
+            'timestamp': time.time(),
+            'reason': reason,
+            'by_admin': by_admin
+        }
+        self._stats_for(user_id)['warning_history'].append(entry)
+        self._mark_dirty(user_id)['warning_history'].append(entry)
         logger.info(f"User {user_id} warned by {by_admin}. Reason: {reason}")
 
     def get_warnings(self, user_id: int) -> list:
-        """Get a user's warning history."""
-        # No lock needed for read-only access if modifications are properly locked
+        """Get a user's warning history (for users currently loaded)."""
         return self.user_stats.get(user_id, {}).get('warning_history', [])
 
     async def get_user_stats(self, user_id: int) -> Optional[dict]:
-        """Safely get a copy of user stats."""
-        async with self._lock:
-            if user_id in self.user_stats:
-                # Return a copy to prevent modification outside the lock
-                return self.user_stats[user_id].copy()
-            return None
+        """Get a copy of user stats, loading them from the database if needed."""
+        await self._ensure_loaded(user_id, create=False)
+        stats = self.user_stats.get(user_id)
+        # Return a copy to prevent modification by the caller
+        return stats.copy() if stats is not None else None
 
     async def update_user_activity(self, user_id: int, command: str):
         """Update user's command count and last seen time."""
-        async with self._lock:
-            stats = self.user_stats[user_id]
-            stats['commands'][command] += 1
-            stats['last_seen'] = time.time()
-            if stats['join_date'] is None:
-                stats['join_date'] = time.time()
-
-            # Save to DB periodically (e.g., every 10 commands)
-            total_commands = sum(stats['commands'].values())
-            if total_commands % 10 == 0:
-                 # Run DB save in background without blocking middleware
-                 asyncio.create_task(self._save_to_db(user_id))
-
-    async def _save_to_db(self, user_id: int):
-        """Save user stats to database (async)."""
-        stats_copy = await self.get_user_stats(user_id)
-        if not stats_copy:
-             logger.warning(f"Attempted to save stats for non-existent user ID: {user_id}")
-             return
-
-        try:
-            # Call the imported function directly
-            await save_user_stats(
-                user_id=user_id,
-                commands=dict(stats_copy.get('commands', {})),
-                last_seen=stats_copy.get('last_seen', 0),
-                join_date=stats_copy.get('join_date'),
-                ban_history=stats_copy.get('ban_history', []),
-                warning_history=stats_copy.get('warning_history', [])
-            )
-            logger.debug(f"Saved stats for user {user_id} to database.")
-        except Exception as e:
-            logger.error(f"Unexpected error saving stats for {user_id}: {e}", exc_info=True)
+        await self._ensure_loaded(user_id)
+        stats = self._stats_for(user_id)
+        stats['commands'][command] += 1
+        stats['last_seen'] = time.time()
+        if stats['join_date'] is None:
+            stats['join_date'] = time.time()
+
+        delta = self._mark_dirty(user_id)
+        delta['commands'][command] += 1
+        delta['last_seen'] = stats['last_seen']
+        delta['join_date'] = stats['join_date']
+        if len(self._dirty) >= self.flush_max_users and self._flush_wakeup:
+            self._flush_wakeup.set()
+
+    def record_activity(self, user_id: int, command: str):
+        """
+        Queues one command for update_user_activity without awaiting or spawning a task.
+        If the buffer is full the oldest entry is dropped (and counted).
+        """
+        if len(self._activity) == self._activity.maxlen:
+            self.activity_stats['dropped'] += 1
+        self._activity.append((user_id, command))
+        self.activity_stats['recorded'] += 1
+
+    async def drain_activity(self) -> int:
+        """Applies all buffered activity. Returns how many entries were applied."""
+        applied = 0
+        while self._activity:
+            user_id, command = self._activity.popleft()
+            try:
+                await self.update_user_activity(user_id, command)
+                applied += 1
+            except asyncio.CancelledError:
+                self._activity.appendleft((user_id, command))  # Applied by stop()'s final drain
+                raise
+            except Exception as e:
+                logger.error(f"Error applying activity for user {user_id}: {e}", exc_info=True)
+        self.activity_stats['applied'] += applied
+        return applied
+
+    # --- Lazy loading ---
+
+    async def load_bans(self):
+        """Loads every active ban from the database. Raises if they can't be read, so start-up fails loudly."""
+        loop = asyncio.get_running_loop()
+        bans = await loop.run_in_executor(None, lambda: get_active_bans(time.time()))
+        self.banned_users = {**bans, **self.get_active_bans()}
+        logger.info(f"Loaded {len(bans)} active user bans.")
+
+    async def _ensure_loaded(self, user_id: int, create: bool = True) -> bool:
+        """
+        Makes sure a user's state is cached, loading it from the database on first touch.
+        Only cache misses take the user's shard lock, so concurrent misses for one user load it once.
+        Unknown users get fresh state unless create=False. Returns False if the user is unknown.
+        Database errors are raised and nothing is cached, so the next touch tries again.
+        """
+        if user_id in self.user_stats:
+            self.user_stats.move_to_end(user_id)
+            self.cache_stats['hits'] += 1
+            return True
+        async with self._shard_locks[hash(user_id) % len(self._shard_locks)]:
+            if user_id in self.user_stats:  # Loaded by another task while we waited
+                self.cache_stats['hits'] += 1
+                return True
+            loop = asyncio.get_running_loop()
+            doc = await loop.run_in_executor(None, lambda: get_user_state(user_id))
+            self.cache_stats['loads'] += 1
+            if doc is not None or create:
+                self.user_stats[user_id] = _state_from_doc(doc)
+                self._evict(keep=user_id)
+            return doc is not None
+
+    def _stats_for(self, user_id: int) -> dict:
+        """A cached user's stats; creates them if the user was evicted meanwhile."""
+        stats = self.user_stats.get(user_id)
+        if stats is None:
+            stats = self.user_stats[user_id] = _state_from_doc(None)
+            self._evict(keep=user_id)
+        self.user_stats.move_to_end(user_id)
+        return stats
+
+    def _evict(self, keep: Optional[int] = None):
+        """Drops least recently used users beyond the cap, skipping `keep` and users with unsaved changes."""
+        excess = len(self.user_stats) - self.max_cached_users
+        if excess <= 0:
+            return
+        for user_id in list(self.user_stats):
+            if excess <= 0:
+                break
+            if user_id == keep or user_id in self._dirty or user_id in self._flushing:
+                continue
+            del self.user_stats[user_id]
+            self._last_warn.pop(user_id, None)
+            self.cache_stats['evictions'] += 1
+            excess -= 1
+
+    # --- Write-behind persistence ---
+
+    async def start(self):
+        """Loads active bans and starts the activity drain and flush loops."""
+        if self._flush_task:
+            return
+        await self.load_bans()
+        self._stopping = False
+        self._flush_wakeup = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        self._activity_task = asyncio.create_task(self._activity_loop())
+        logger.info(f"User stats write-behind started (every {self.flush_interval:.0f}s or {self.flush_max_users} users).")
+
+    async def stop(self):
+        """Stops the loops, applies buffered activity and writes everything still buffered."""
+        if self._activity_task:
+            self._activity_task.cancel()
+            await asyncio.gather(self._activity_task, return_exceptions=True)
+        if self._flush_task:
+            # Signalled rather than cancelled, so a flush in progress finishes its write
+            self._stopping = True
+            self._flush_wakeup.set()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        self._flush_task = self._activity_task = None
+        await self.drain_activity()
+        await self.flush()
+        if self._dirty:
+            logger.error(f"User stats: {len(self._dirty)} user(s) could not be saved at shutdown.")
+
+    async def flush(self) -> int:
+        """Writes all buffered user changes in one bulk write. Returns how many users were saved."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            batch, self._dirty = self._dirty, {}
+            self._flushing |= set(batch)
+
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            write = loop.run_in_executor(None, lambda: save_user_stats_batch(batch))
+            try:
+                # Shielded: a cancelled flush leaves the write running, and settles the batch once it lands
+                failed = await asyncio.shield(write)
+            except asyncio.CancelledError:
+                write.add_done_callback(lambda done: self._settle(batch, self._write_result(done, batch), started))
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected error flushing stats for {len(batch)} users: {e}", exc_info=True)
+                failed = list(batch.keys())
+            return self._settle(batch, failed, started)
+
+    @staticmethod
+    def _write_result(write: asyncio.Future, batch: dict) -> list:
+        """Users whose changes a finished bulk write did not save."""
+        if write.cancelled() or write.exception() is not None:
+            return list(batch.keys())
+        return write.result()
+
+    def _settle(self, batch: dict, failed: list, started: float) -> int:
+        """Re-buffers what a flush failed to write and records the flush."""
+        for user_id in failed:
+            self._merge_delta(user_id, batch[user_id])  # Retried on the next flush
+        self._flushing.difference_update(batch)
+        self._evict()
+        written = len(batch) - len(failed)
+        self.flush_stats['flushes'] += 1
+        self.flush_stats['users_written'] += written
+        self.flush_stats['failed'] += len(failed)
+        self.flush_stats['last_flush_ms'] = (time.perf_counter() - started) * 1000
+        logger.debug(f"Flushed stats for {written} users ({len(failed)} failed).")
+        return written
+
+    def get_flush_stats(self) -> dict:
+        return {**self.flush_stats, 'dirty': len(self._dirty), 'activity_buffered': len(self._activity),
+                'activity_dropped': self.activity_stats['dropped']}
+
+    def get_cache_stats(self) -> dict:
+        lookups = self.cache_stats['hits'] + self.cache_stats['loads']
+        return {
+            **self.cache_stats,
+            'cached': len(self.user_stats),
+            'active_bans': len(self.banned_users),
+            'hit_ratio': (self.cache_stats['hits'] / lookups * 100) if lookups else 0.0,
+        }
+
+    async def _activity_loop(self):
+        while True:
+            await asyncio.sleep(self.activity_drain_interval)
+            try:
+                await self.drain_activity()
+            except Exception as e:
+                logger.error(f"Error in user activity drain loop: {e}", exc_info=True)
+
+    async def _flush_loop(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            if self._stopping:
+                break  # stop() writes what is left
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error in user stats flush loop: {e}", exc_info=True)
+
+    def _mark_dirty(self, user_id: int) -> dict:
+        """The pending delta for a user."""
+        delta = self._dirty.get(user_id)
+        if delta is None:
+            delta = self._dirty[user_id] = _empty_delta()
+        return delta
+
+    def _merge_delta(self, user_id: int, old: dict):
+        """Folds an unsaved delta back under any changes made since."""
+        delta = self._mark_dirty(user_id)
+        for command, count in old['commands'].items():
+            delta['commands'][command] += count
+        delta['last_seen'] = max(delta['last_seen'], old['last_seen'])
+        delta['join_date'] = delta['join_date'] or old['join_date']
+        delta['ban_history'][:0] = old['ban_history']
+        delta['warning_history'][:0] = old['warning_history']
 
 # Create singleton instance
 user_manager = UserManager()
\ No newline at end of file
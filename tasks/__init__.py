@@ -1,9 +1,10 @@
 from .periodic import start_periodic_tasks, periodic_tasks
-from .fade_alerts import update_fade_alerts, process_new_fade_alerts
+from .fade_alerts import update_fade_alerts
+from .pipeline import fade_pipeline
 
 __all__ = [
     'start_periodic_tasks',
     'periodic_tasks',
     'update_fade_alerts',
-    'process_new_fade_alerts'
+    'fade_pipeline'
 ]
\ No newline at end of file
@@ -1,19 +1,28 @@
 import asyncio
+import hashlib
 from datetime import datetime, timedelta # Added timedelta
+import pytz
 from typing import List, Dict, Optional, Tuple
 from logging_setup import logger
 # Imports are already correct from the previous attempt. No changes needed here.
-from db.connection import get_nba_collection, get_ncaab_collection, get_fade_alerts_collection
+from db.connection import get_nba_collection, get_ncaab_collection
 from db.game_repo import get_game_by_id
 from db.alert_repo import (
-    get_pending_fade_alerts, update_fade_alert_result, get_fade_alert_subscribers,
-    get_fade_alerts_since, update_fade_performance_stats, store_fade_alert
+    get_pending_fade_alerts, update_fade_alert_result,
+    get_fade_alerts_since, update_fade_performance_stats,
+    bulk_update_fade_alert_results, fade_alert_ref
 )
 from db.utils import get_eastern_time_date
-from utils.game_processing import find_fade_opportunities, get_spread_info # Use new function
-from utils.formatters import format_fade_alert # Removed calculate_fade_rating for now
-from utils.game_processing import determine_winner # Corrected import location
-
+from utils.game_processing import get_spread_info # Use new function
+from utils.formatters import format_fade_alert, pack_fade_digests # Removed calculate_fade_rating for now
+from utils.odds_table import profit_per_unit
+from utils.settlement import grade_fades, grade_alerts_for_game, game_settlement_inputs
+from services.subscriptions import subscription_manager, MAX_RATING
+from services.outbox import outbox
+from services.alert_cards import alert_cards
+from services.tracing import tracer
+
+@tracer.traced()
 async def update_fade_alerts():
     """Update status of existing fade alerts for completed games."""
     logger.info("Updating status of fade alerts for completed games...")
@@ -28,35 +37,33 @@ async def update_fade_alerts():
             return
             
         logger.info(f"Found {len(pending_alerts)} pending fade alerts to check.")
-        
-        # Process them in small batches to avoid overloading
-        updated_count = 0
+
+        # Group alerts by game so each game is loaded and read only once
+        alerts_by_game: Dict[Tuple[str, str], List[dict]] = {}
         for alert in pending_alerts:
-            try:
-                # Extract needed information from the alert
-                game_id = alert.get('game_id')
-                sport = alert.get('sport')
-                market = alert.get('market')
-                faded_outcome_label = alert.get('faded_outcome_label')
-                alert_id = alert.get('_id') # Needed for update and logging
-
-                if not all([game_id, sport, market, faded_outcome_label, alert_id]):
-                    logger.warning(f"Incomplete alert data for ID {alert_id}: Missing required fields. Marking as 'error'.")
-                    # Attempt to update status to 'error' to prevent reprocessing
-                    try:
-                        # Use the correct function name: update_fade_alert_result
-                        await loop.run_in_executor(None, lambda: update_fade_alert_result(alert_id, "error")) # Already correct
-                    except Exception as update_err:
-                         logger.error(f"Failed to update status to 'error' for incomplete alert {alert_id}: {update_err}")
-                    continue
+            alert_id = alert.get('_id') # Needed for update and logging
+            if not all([alert.get('game_id'), alert.get('sport'), alert.get('market'), alert.get('faded_outcome_label'), alert_id]):
+                logger.warning(f"Incomplete alert data for ID {alert_id}: Missing required fields. Marking as 'error'.")
+                # Attempt to update status to 'error' to prevent reprocessing
+                try:
+                    await loop.run_in_executor(None, lambda: update_fade_alert_result(alert_id, "error"))
+                except Exception as update_err:
+                     logger.error(f"Failed to update status to 'error' for incomplete alert {alert_id}: {update_err}")
+                continue
+            alerts_by_game.setdefault((alert['sport'], alert['game_id']), []).append(alert)
 
+        # Collect settlement inputs for every alert on a completed game
+        gradable_alerts = []
+        graded_games = {} # game_id -> game, for editing delivered alert cards afterwards
+        markets, sides, lines, home_scores, away_scores, winners = [], [], [], [], [], []
+        for (sport, game_id), game_alerts in alerts_by_game.items():
+            try:
                 # Get latest game data (run sync db call in executor)
-                # Ensure game_repo is imported if not already
                 collection = get_nba_collection() if sport == "nba" else get_ncaab_collection() # Already correct
                 game = await loop.run_in_executor(None, lambda: get_game_by_id(collection, game_id)) # Already correct
 
                 if not game:
-                    logger.warning(f"Game {game_id} not found for alert update (Alert ID: {alert_id}).")
+                    logger.warning(f"Game {game_id} not found for update of {len(game_alerts)} alert(s).")
                     # Consider setting status to 'error' or 'cancelled' if game consistently not found?
                     continue
 
@@ -65,44 +72,48 @@ async def update_fade_alerts():
                 if game_status not in ['complete', 'closed', 'final']:
                     continue  # Game not finished yet, skip update for now
 
-                # --- Determine Fade Result based on Market ---
-                fade_result: Optional[bool] = None
-                if market == 'Spread':
-                    fade_result = determine_spread_fade_result(game, alert)
-                elif market == 'Total':
-                    fade_result = determine_total_fade_result(game, alert)
-                elif market == 'Moneyline':
-                    fade_result = determine_moneyline_fade_result(game, alert)
-                else:
-                    logger.warning(f"Unknown market type '{market}' for alert ID {alert_id}")
-                    continue # Skip if market is unknown
-
-                # --- Update Status ---
-                new_status = None
-                if fade_result is True:
-                    new_status = "won"
-                elif fade_result is False:
-                    new_status = "lost"
-                # If fade_result is None (push or error), keep status as 'pending'
-
-                if new_status:
-                    # Assuming update_fade_alert_status was a typo for update_fade_alert_result
-                    success = await loop.run_in_executor(None, lambda: update_fade_alert_result(alert_id, new_status)) # Already correct
-                    if success:
-                        updated_count += 1
-                        logger.info(f"Updated alert {alert_id} status to {new_status}")
-                        # Optional: Send notification ONLY if status was successfully updated
-                        # TODO: Update notify_fade_alert_result signature if needed
-                        # await notify_fade_alert_result(game, alert, new_status)
-                    else:
-                         logger.error(f"Failed to update status for alert {alert_id}")
-                else:
-                    logger.info(f"No status update needed for alert {alert_id} (Result: Push or Error)")
-
+                home_score, away_score, winner_side = game_settlement_inputs(game)
+                graded_games[game_id] = game
+                for alert in game_alerts:
+                    if alert.get('market') not in ('Spread', 'Total', 'Moneyline'):
+                        logger.warning(f"Unknown market type '{alert.get('market')}' for alert ID {alert.get('_id')}")
+                        continue # Skip if market is unknown
+                    try:
+                        line = float(alert['faded_value']) if alert.get('faded_value') is not None else None
+                    except (ValueError, TypeError):
+                        line = None
+                    gradable_alerts.append(alert)
+                    markets.append(alert['market'])
+                    sides.append(alert['faded_outcome_label'])
+                    lines.append(line)
+                    home_scores.append(home_score)
+                    away_scores.append(away_score)
+                    winners.append(winner_side)
             except Exception as e:
-                logger.error(f"Error updating fade alert {alert.get('_id')}: {e}", exc_info=True)
-                
+                logger.error(f"Error loading game {game_id} for fade alert update: {e}", exc_info=True)
+
+        if not gradable_alerts:
+            logger.info("No pending fade alerts belong to completed games yet.")
+            return
+
+        # --- Determine Fade Results in one batch ---
+        statuses = grade_fades(markets, sides, lines, home_scores, away_scores, winners).statuses()
+
+        # --- Update Status ---
+        updates = []
+        for alert, new_status in zip(gradable_alerts, statuses):
+            if not new_status:
+                logger.info(f"No status update possible for alert {alert.get('_id')} (missing result data)")
+                continue
+            updates.append((alert['_id'], new_status))
+
+        updated_count = await loop.run_in_executor(None, lambda: bulk_update_fade_alert_results(updates))
+        if updated_count < len(updates):
+            logger.error(f"Only {updated_count}/{len(updates)} graded fade alerts were updated")
         logger.info(f"Updated {updated_count} fade alert statuses.")
+
+        # Show results on the cards subscribers already have instead of sending new messages
+        await alert_cards.refresh_games(list(graded_games.values()))
         
         # Run performance analysis 
         await analyze_fade_performance()
@@ -111,49 +122,17 @@ async def update_fade_alerts():
         logger.error(f"Error in update_fade_alerts: {e}", exc_info=True)
 
 async def notify_fade_alert_result(game: dict, alert: dict):
-    """Notify subscribed users about fade alert results based on the updated alert data."""
+    """
+    Shows a graded alert's result to its subscribers by editing the alert cards
+    they already received, rather than sending each of them a new message.
+    """
+    alert_id = alert.get('_id', 'UNKNOWN') # For logging
     try:
-        loop = asyncio.get_running_loop()
-        game_id = alert.get('game_id')
-        sport = alert.get('sport')
-        result_status = alert.get('status') # Should be 'won' or 'lost' at this point
-        alert_id = alert.get('_id', 'UNKNOWN') # For logging
-
-        if not game_id or not sport or result_status not in ['won', 'lost']:
-             logger.warning(f"Cannot notify for alert {alert_id}: Missing data or invalid status '{result_status}'.")
-             return
-
-        # Get subscribed users for this game/alert (run sync db call in executor)
-        # Assuming subscription is still based on game_id and sport for now
-        subscribers = await loop.run_in_executor(None, lambda: get_fade_alert_subscribers(game_id, sport)) # Already correct
-        if not subscribers:
-            return  # No subscribers to notify
-
-        # Format the alert message using the new formatter
-        # Pass the alert dict itself as the 'opportunity' argument
-        alert_msg = format_fade_alert(
-            game=game,
-            opportunity=alert,
-            result_status=result_status
-        )
-        if not alert_msg:
-            logger.warning(f"Failed to format result message for alert {alert_id}")
-            return  # No message to send
-
-        # Import bot here to avoid circular imports
-        from bot import bot
-
-        # Send to subscribers
-        for user_id in subscribers:
-            try:
-                await bot.send_message(
-                    user_id,
-                    alert_msg
-                )
-                await asyncio.sleep(0.1)  # Small delay between messages
-            except Exception as e:
-                logger.error(f"Failed to send fade result to user {user_id} for alert {alert_id}: {e}")
-
+        if not alert.get('game_id') or alert.get('status') not in ['won', 'lost']:
+            logger.warning(f"Cannot notify for alert {alert_id}: Missing data or invalid status '{alert.get('status')}'.")
+            return
+        edited = await alert_cards.refresh_games([game])
+        logger.info(f"Fade result for alert {alert_id} applied to {edited} delivered card(s).")
     except Exception as e:
         logger.error(f"Error in notify_fade_alert_result for alert {alert_id}: {e}", exc_info=True)
 
@@ -225,46 +204,7 @@ def determine_spread_fade_result(game: dict, alert: dict) -> Optional[bool]:
     Returns:
         True if the fade won (faded side didn't cover), False if the fade lost, None if push or error.
     """
-    try:
-        faded_outcome = alert.get('faded_outcome_label') # 'Home' or 'Away'
-        spread_value = alert.get('faded_value') # The spread of the faded side
-
-        if faded_outcome not in ['Home', 'Away'] or spread_value is None:
-            logger.warning(f"Invalid spread alert data for game {game.get('id')}: {alert.get('_id')}")
-            return None
-
-        # Get final score
-        boxscore = game.get('boxscore', {})
-        home_score = boxscore.get('total_home_points')
-        away_score = boxscore.get('total_away_points')
-        home_team_id = game.get('home_team_id') or game.get('home_team', {}).get('id')
-        away_team_id = game.get('away_team_id') or game.get('away_team', {}).get('id')
-
-        if None in [home_score, away_score, home_team_id, away_team_id]:
-            logger.warning(f"Missing score or team ID data for game {game.get('id')}")
-            return None
-
-        # Calculate actual margin relative to the faded team
-        if faded_outcome == 'Home':
-            actual_margin = home_score - away_score
-        else: # Fading Away team
-            actual_margin = away_score - home_score
-
-        # Did the faded team cover their spread?
-        # Margin > Spread Value means they covered (e.g., -7 > -7.5, or +3 > +2.5)
-        # Margin == Spread Value is a push
-        if actual_margin == spread_value:
-            logger.info(f"Spread push detected for game {game.get('id')}, alert {alert.get('_id')}")
-            return None # Push
-
-        faded_team_covered = actual_margin > spread_value
-
-        # Fade wins if the faded team did NOT cover
-        return not faded_team_covered
-
-    except Exception as e:
-        logger.error(f"Error determining spread fade result for alert {alert.get('_id')}: {e}", exc_info=True)
-        return None
+    return _grade_single(game, dict(alert, market='Spread'))
 
 def determine_total_fade_result(game: dict, alert: dict) -> Optional[bool]:
     """
@@ -278,43 +218,7 @@ def determine_total_fade_result(game: dict, alert: dict) -> Optional[bool]:
     Returns:
         True if the fade won, False if the fade lost, None if push or error.
     """
-    try:
-        faded_outcome = alert.get('faded_outcome_label') # 'Over' or 'Under'
-        total_line = alert.get('faded_value') # The total line being faded
-
-        if faded_outcome not in ['Over', 'Under'] or total_line is None:
-            logger.warning(f"Invalid total alert data for game {game.get('id')}: {alert.get('_id')}")
-            return None
-
-        # Get final score
-        boxscore = game.get('boxscore', {})
-        home_score = boxscore.get('total_home_points')
-        away_score = boxscore.get('total_away_points')
-
-        if None in [home_score, away_score]:
-            logger.warning(f"Missing score data for game {game.get('id')}")
-            return None
-
-        actual_total = home_score + away_score
-
-        # Check for push
-        if actual_total == total_line:
-            logger.info(f"Total push detected for game {game.get('id')}, alert {alert.get('_id')}")
-            return None # Push
-
-        # Determine success
-        if faded_outcome == 'Over':
-            # Fade wins if actual total is UNDER the line
-            return actual_total < total_line
-        elif faded_outcome == 'Under':
-            # Fade wins if actual total is OVER the line
-            return actual_total > total_line
-        else:
-            return None # Should not happen
-
-    except Exception as e:
-        logger.error(f"Error determining total fade result for alert {alert.get('_id')}: {e}", exc_info=True)
-        return None
+    return _grade_single(game, dict(alert, market='Total'))
 
 def determine_moneyline_fade_result(game: dict, alert: dict) -> Optional[bool]:
     """
@@ -328,44 +232,35 @@ def determine_moneyline_fade_result(game: dict, alert: dict) -> Optional[bool]:
     Returns:
         True if the fade won, False if the fade lost, None if winner unclear or error.
     """
-    try:
-        faded_outcome = alert.get('faded_outcome_label') # 'Home' or 'Away'
-
-        if faded_outcome not in ['Home', 'Away']:
-            logger.warning(f"Invalid moneyline alert data for game {game.get('id')}: {alert.get('_id')}")
-            return None
-
-        # Determine the actual winner
-        # Use the determine_winner function which handles different game states/data points
-        winner_data = determine_winner(game) # Assuming determine_winner is imported
-        if not winner_data:
-            logger.warning(f"Could not determine winner for game {game.get('id')} for ML fade alert {alert.get('_id')}")
-            return None # Cannot determine winner
-
-        winning_team_id = winner_data.get('id')
-        home_team_id = game.get('home_team_id') or game.get('home_team', {}).get('id')
-        away_team_id = game.get('away_team_id') or game.get('away_team', {}).get('id')
-
-        if not home_team_id or not away_team_id:
-             logger.warning(f"Missing team IDs in game {game.get('id')}")
-             return None
-
-        # Determine success
-        if faded_outcome == 'Home':
-            # Fade wins if Away team won
-            return winning_team_id == away_team_id
-        elif faded_outcome == 'Away':
-            # Fade wins if Home team won
-            return winning_team_id == home_team_id
-        else:
-            return None # Should not happen
+    return _grade_single(game, dict(alert, market='Moneyline'))
 
+def _grade_single(game: dict, alert: dict) -> Optional[bool]:
+    """Grades one alert through the shared batch grader (push and missing data return None)."""
+    try:
+        grades = grade_alerts_for_game(game, [alert])
+        if grades.won[0]:
+            return True
+        if grades.lost[0]:
+            return False
+        return None
     except Exception as e:
-        logger.error(f"Error determining moneyline fade result for alert {alert.get('_id')}: {e}", exc_info=True)
+        logger.error(f"Error determining {alert.get('market')} fade result for alert {alert.get('_id')}: {e}", exc_info=True)
         return None
 
 
 
+def settled_units(alerts: List[dict], default_odds: int = -110) -> float:
+    """Flat-stake profit in units over settled alerts, priced at the fade side's odds."""
+    units = 0.0
+    for alert in alerts:
+        status = alert.get('status')
+        if status == 'won':
+            fade_odds = alert.get('fade_odds')
+            units += profit_per_unit(fade_odds if fade_odds is not None else default_odds) or 0.0
+        elif status == 'lost':
+            units -= 1.0
+    return units
+
 async def analyze_fade_performance():
     """Analyze historical fade performance and update statistics."""
     try:
@@ -378,13 +273,20 @@ async def analyze_fade_performance():
             logger.info("No fade alerts found for performance analysis.")
             return
             
-        # Calculate performance metrics
+        # Calculate performance metrics; pushes are settled but stay out of the win rate and ROI
         total = len(fade_alerts)
         won = sum(1 for alert in fade_alerts if alert.get('status') == 'won')
         lost = sum(1 for alert in fade_alerts if alert.get('status') == 'lost')
-        pending = total - won - lost
+        pushed = sum(1 for alert in fade_alerts if alert.get('status') == 'push')
+        pending = sum(1 for alert in fade_alerts if alert.get('status') == 'pending')
         
         win_percentage = (won / (won + lost)) * 100 if (won + lost) > 0 else 0
+        units = settled_units(fade_alerts)
+        roi = (units / (won + lost)) * 100 if (won + lost) > 0 else 0
+        # Closing line value is known at tip-off, well before results settle
+        clv_prices = [a['clv_price'] for a in fade_alerts if isinstance(a.get('clv_price'), (int, float))]
+        avg_clv = sum(clv_prices) / len(clv_prices) if clv_prices else None
+        beat_close_pct = (sum(1 for c in clv_prices if c > 0) / len(clv_prices)) * 100 if clv_prices else None
         
         # Additional analysis by rating
         by_rating = {}
@@ -395,12 +297,16 @@ async def analyze_fade_performance():
             
             if rating_won + rating_lost > 0:
                 win_pct = (rating_won / (rating_won + rating_lost)) * 100
+                rating_units = settled_units(rating_alerts)
                 by_rating[i] = {
                     'total': len(rating_alerts),
                     'won': rating_won,
                     'lost': rating_lost,
-                    'pending': len(rating_alerts) - rating_won - rating_lost,
-                    'win_percentage': win_pct
+                    'push': sum(1 for a in rating_alerts if a.get('status') == 'push'),
+                    'pending': sum(1 for a in rating_alerts if a.get('status') == 'pending'),
+                    'win_percentage': win_pct,
+                    'units': rating_units,
+                    'roi': (rating_units / (rating_won + rating_lost)) * 100
                 }
         
         # By sport analysis
@@ -416,7 +322,8 @@ async def analyze_fade_performance():
                     'total': len(sport_alerts),
                     'won': sport_won,
                     'lost': sport_lost,
-                    'pending': len(sport_alerts) - sport_won - sport_lost,
+                    'push': sum(1 for a in sport_alerts if a.get('status') == 'push'),
+                    'pending': sum(1 for a in sport_alerts if a.get('status') == 'pending'),
                     'win_percentage': win_pct
                 }
         
@@ -426,149 +333,144 @@ async def analyze_fade_performance():
             'total_alerts': total,
             'won': won,
             'lost': lost,
+            'push': pushed,
             'pending': pending,
             'win_percentage': win_percentage,
+            'units': units,
+            'roi': roi,
+            'clv_alerts': len(clv_prices),
+            'avg_clv_price': avg_clv,
+            'beat_close_percentage': beat_close_pct,
             'by_rating': by_rating,
             'by_sport': by_sport,
         }
         
         # Run sync db call in executor
         await loop.run_in_executor(None, lambda: update_fade_performance_stats(performance_data)) # Already correct
-        logger.info(f"Updated fade performance stats: {win_percentage:.1f}% win rate ({won}/{won+lost})")
+        logger.info(f"Updated fade performance stats: {win_percentage:.1f}% win rate ({won}/{won+lost}), {roi:+.1f}% ROI")
         
     except Exception as e:
         logger.error(f"Error analyzing fade performance: {e}", exc_info=True)
 
-async def process_new_fade_alerts(games: list, sport: str) -> List[str]:
+def build_fade_alert(game: dict, opp: dict, date_str: str) -> dict:
+    """Builds the fade alert document stored for an opportunity from find_fade_opportunities."""
+    home_team_name = game.get('home_team', {}).get('display_name', 'Home')
+    away_team_name = game.get('away_team', {}).get('display_name', 'Away')
+    return {
+        'game_id': opp['game_id'],
+        'sport': opp['sport'],
+        'date': date_str,
+        'market': opp['market'],
+        'faded_outcome_label': opp['faded_outcome_label'],
+        'faded_value': opp.get('faded_value'), # Spread/Total value
+        'odds': opp['odds'], # Odds of the faded outcome
+        'implied_probability': opp['implied_probability'], # Calculated IP
+        'tickets_percent': opp['T%'],
+        'money_percent': opp['M%'],
+        'rating': opp['rating'],
+        'reason': opp['reason'], # Reason based on T% vs IP
+        # No-vig market view, used by /fadestats to slice results by edge
+        'fair_probability': opp.get('fair_probability'),
+        'market_hold': opp.get('market_hold'),
+        'fair_gap': opp.get('fair_gap'),
+        'fade_ev': opp.get('fade_ev'),
+        'fade_odds': opp.get('fade_odds'),
+        'status': 'pending',
+        'created_at': datetime.now(),
+        # Team info for easier display later
+        'home_team_name': home_team_name,
+        'away_team_name': away_team_name,
+        'matchup': f"{away_team_name} @ {home_team_name}"
+    }
+
+def fade_alert_key(alert: dict, chat_id: int) -> str:
+    """Idempotency key for delivering one fade alert to one chat."""
+    return f"alert:{fade_alert_ref(alert)}:{chat_id}"
+
+# Delivery order within the alert class: market tie-breaker (lower goes first)
+MARKET_DELIVERY_ORDER = {'Spread': 0, 'Moneyline': 1, 'Total': 2}
+
+def game_tip_time(game: dict) -> Optional[datetime]:
+    """The game's scheduled start as an aware UTC datetime, or None if unknown."""
+    try:
+        return pytz.UTC.localize(datetime.strptime(game.get('start_time') or '', "%Y-%m-%dT%H:%M:%S.%fZ"))
+    except ValueError:
+        return None
+
+def alert_delivery_rank(game: dict, alert: dict, now: Optional[datetime] = None) -> float:
     """
-    Process new games for potential fade alerts, store them,
-    and return a list of formatted alert messages.
+    Sort key for delivering an alert (lower is sent first): highest rating first,
+    then the soonest tip-off, then market. Alerts on games that already started
+    sort after every pre-game alert.
     """
-    fade_alert_messages = [] # Changed variable name and type hint
-    logger.info(f"[process_new_fade_alerts] Received {len(games)} games to process.") # Added log
-    for i, game in enumerate(games): # Added index
-        game_id_log = game.get('game_id', 'N/A') # Use consistent game_id logging
-        try:
-            status = game.get('status', 'UNKNOWN_STATUS').lower()
-            # --- Add Diagnostic Logging ---
-            logger.info(f"[process_new_fade_alerts] Processing game {i+1}/{len(games)} (ID: {game_id_log}) with status: '{status}'")
-            # --- End Diagnostic Logging ---
-
-            # Skip completed games
-            if status in ['complete', 'closed', 'final']:
-                logger.info(f"[process_new_fade_alerts] Skipping game {game_id_log} due to status '{status}'.") # Added log
-                continue
-                
-            # --- This part should now be reached if status is not complete ---
-            logger.info(f"[process_new_fade_alerts] Game {game_id_log} status OK. Calling find_fade_opportunities...") # Added log
-            potential_opportunities = find_fade_opportunities(game, sport)
-
-            if not potential_opportunities:
-                logger.info(f"[process_new_fade_alerts] find_fade_opportunities returned no opportunities for game {game_id_log}.") # Added log
-                continue # No opportunities found for this game
-
-            loop = asyncio.get_running_loop() # Get loop once per game if opportunities exist
-            current_date_str = get_eastern_time_date()[0] # Already correct
-
-            for opp_index, opp in enumerate(potential_opportunities): # Add index for logging
-                logger.debug(f"Processing opportunity {opp_index + 1}/{len(potential_opportunities)} for game {game_id_log}...")
-                try:
-                    # Prepare data for storage and checking
-                    # Map faded_outcome_label to a more structured representation if needed
-                    # For now, using the label directly.
-                    # Prepare data for storage based on the new opportunity structure
-                    # Prepare data for storage based on the new opportunity structure
-                    # Extract team names from the game object (available in the outer loop)
-                    home_team_name = game.get('home_team', {}).get('display_name', 'Home')
-                    away_team_name = game.get('away_team', {}).get('display_name', 'Away')
-                    matchup_str = f"{away_team_name} @ {home_team_name}" # For easier display later
-
-                    alert_data = {
-                        'game_id': opp['game_id'],
-                        'sport': opp['sport'],
-                        'date': current_date_str,
-                        'market': opp['market'],
-                        'faded_outcome_label': opp['faded_outcome_label'],
-                        'faded_value': opp.get('faded_value'), # Spread/Total value
-                        'odds': opp['odds'], # Odds of the faded outcome
-                        'implied_probability': opp['implied_probability'], # Calculated IP
-                        'tickets_percent': opp['T%'],
-                        'money_percent': opp['M%'],
-                        'rating': opp['rating'], # Added rating
-                        'reason': opp['reason'], # New reason based on T% vs IP
-                        'status': 'pending',
-                        'created_at': datetime.now(), # Use non-timezone aware for consistency? Check DB storage.
-                        # Add team info
-                        'home_team_name': home_team_name,
-                        'away_team_name': away_team_name,
-                        'matchup': matchup_str
-                        # Removed threshold_used, team_id
-                    }
-
-                    # Check if this specific fade opportunity already exists
-                    # Check if a PENDING alert already exists
-                    existing_alert = await loop.run_in_executor(
-                        None,
-                        lambda: get_fade_alerts_collection().find_one({
-                            "game_id": alert_data['game_id'],
-                            "market": alert_data['market'],
-                            "faded_outcome_label": alert_data['faded_outcome_label'],
-                            "date": current_date_str,
-                            "status": "pending" # Check specifically for pending status
-                        })
-                    )
-                    logger.info(f"GAME {alert_data['game_id']} OPP {opp_index + 1}: Checked for existing PENDING alert. Found: {'Yes' if existing_alert else 'No'}")
-
-                    alert_to_format = None # Initialize variable to hold the alert data for formatting
-
-                    if existing_alert:
-                        # Use the existing alert data for formatting
-                        alert_to_format = existing_alert
-                        logger.info(f"GAME {alert_data['game_id']} OPP {opp_index + 1}: Using existing alert {existing_alert.get('_id')}. alert_to_format set.")
-                    
-                    elif not existing_alert: # Only try to store if no existing PENDING alert was found
-                        # Store the new fade alert and capture the result
-                        def store_wrapper(data):
-                            try:
-                                # Ensure 'created_at' is a datetime object before storing
-                                data['created_at'] = datetime.now()
-                                return store_fade_alert(**data)
-                            except Exception as e:
-                                logger.error(f"[store_wrapper] Exception inside executor: {e}", exc_info=True)
-                                return False # Indicate failure
-
-                        store_future = loop.run_in_executor(
-                            None,
-                            store_wrapper, # Call the wrapper
-                            alert_data # Pass data as argument to wrapper
-                        )
-                        store_successful = await store_future # Explicitly await the future
-                        logger.info(f"GAME {alert_data['game_id']} OPP {opp_index + 1}: Store attempt result: {store_successful}")
-
-                        if store_successful:
-                            # Use the newly created alert_data for formatting
-                            alert_to_format = alert_data
-                            logger.info(f"GAME {alert_data['game_id']} OPP {opp_index + 1}: Stored new alert. alert_to_format set.")
-                        else:
-                            logger.error(f"GAME {alert_data['game_id']} OPP {opp_index + 1}: Failed to store alert. alert_to_format remains None.")
-
-                    # Format the message if we have an alert (either existing or newly stored)
-                    if alert_to_format:
-                        logger.info(f"GAME {alert_data['game_id']} OPP {opp_index + 1}: Attempting to format message using alert data: {alert_to_format.get('_id', 'NEW')}...")
-                        # Use alert_to_format which contains either the existing doc or the new data
-                        formatted_message = format_fade_alert(game=game, opportunity=alert_to_format, result_status="pending")
-                        logger.info(f"GAME {alert_data['game_id']} OPP {opp_index + 1}: Formatting result: type={type(formatted_message).__name__}, value='{str(formatted_message)[:100]}...'")
-                        if formatted_message:
-                            fade_alert_messages.append(formatted_message)
-                        else:
-                             logger.warning(f"GAME {alert_data['game_id']} OPP {opp_index + 1}: Formatting failed. Message not appended.")
-                    else: # Add this else block
-                        logger.warning(f"GAME {alert_data['game_id']} OPP {opp_index + 1}: No alert to format (neither existing nor newly stored). Message not appended.")
-
-                except Exception as inner_e:
-                    logger.error(f"Error processing opportunity for game {game.get('id')}: {inner_e}", exc_info=True)
-            # --- END NEW FADE LOGIC ---
-        except Exception as e:
-            logger.error(f"Error processing game for fade alerts: {e}", exc_info=True)
-            
-    return fade_alert_messages # Return the list of messages
\ No newline at end of file
+    now = now or datetime.now(pytz.UTC)
+    rating = int(alert.get('rating') or 0)
+    tip = game_tip_time(game)
+    minutes_to_tip = (tip - now).total_seconds() / 60 if tip else 24 * 60
+    started = (game.get('status') or '').lower() != 'scheduled' or minutes_to_tip < 0
+    return ((1 if started else 0) * 1e8
+            + (MAX_RATING - rating) * 1e5
+            + min(max(minutes_to_tip, 0), 9999) * 10
+            + MARKET_DELIVERY_ORDER.get(alert.get('market'), 9))
+
+@tracer.traced()
+async def push_new_fade_alerts(new_alerts: List[Tuple[dict, dict]]):
+    """
+    Queues newly stored fade alerts for every subscriber whose segment, rating and
+    quiet hours match. A subscriber matching several alerts gets them as one digest.
+    Messages carry a delivery rank (see alert_delivery_rank) so the best alerts go
+    out first under throttling, and expire at tip-off if still undelivered.
+    """
+    try:
+        if not subscription_manager.loaded:
+            await subscription_manager.load()
+
+        # Group alerts by recipient so each chat gets one digest instead of one message per alert
+        now = datetime.now(pytz.UTC)
+        new_alerts = sorted(new_alerts, key=lambda pair: alert_delivery_rank(pair[0], pair[1], now))
+        by_chat = {}
+        for game, alert in new_alerts:
+            for chat_id in subscription_manager.recipients(alert.get('sport'), alert.get('market'), alert.get('rating') or 0):
+                by_chat.setdefault(chat_id, []).append((game, alert))
+
+        # Queue durably; the outbox workers deliver through the send scheduler
+        messages = []
+        for chat_id, chat_alerts in by_chat.items():
+            keys = [fade_alert_key(alert, chat_id) for _, alert in chat_alerts]
+            title = None
+            if len(chat_alerts) == 1:
+                game, alert = chat_alerts[0]
+                pages = [(format_fade_alert(game=game, opportunity=alert, result_status="pending"), chat_alerts)]
+                key_base = keys[0]
+            else:
+                sports = sorted({alert.get('sport', '') for _, alert in chat_alerts})
+                title = f"{'/'.join(sport.upper() for sport in sports)} Fade Alerts"
+                pages = pack_fade_digests(chat_alerts, title)
+                key_base = "digest:" + hashlib.sha1("|".join(sorted(keys)).encode()).hexdigest()
+            for index, (text, page_alerts) in enumerate(pages):
+                if not text:
+                    continue
+                tips = [game_tip_time(game) for game, _ in page_alerts]
+                # The card fields let services.alert_cards re-render and edit this message later
+                messages.append({
+                    'chat_id': chat_id,
+                    'text': text,
+                    'parse_mode': 'HTML',
+                    'message_class': 'alert',
+                    'idempotency_key': key_base if len(pages) == 1 else f"{key_base}:{index}",
+                    'game_ids': list(dict.fromkeys(alert.get('game_id') for _, alert in page_alerts)),
+                    'alert_refs': [fade_alert_ref(alert) for _, alert in page_alerts],
+                    'digest_title': title,
+                    'digest_part': f" ({index + 1}/{len(pages)})" if len(pages) > 1 else "",
+                    'alert_count': len(page_alerts),
+                    'rating': max(int(alert.get('rating') or 0) for _, alert in page_alerts),
+                    'rank': min(alert_delivery_rank(game, alert, now) for game, alert in page_alerts),
+                    # Pre-game alerts still undelivered once every game on the message has tipped are
+                    # dropped; alerts on games already underway were demoted by rank instead
+                    'expires_at': max(tips) if all(tips) and min(tips) > now else None,
+                })
+        messages.sort(key=lambda message: message['rank'])
+        queued = await outbox.enqueue_many(messages) if messages else 0
+        logger.info(f"Queued {queued} subscriber deliveries for {len(new_alerts)} new fade alert(s).")
+    except Exception as e:
+        logger.error(f"Error pushing new fade alerts to subscribers: {e}", exc_info=True)
\ No newline at end of file
@@ -8,10 +8,11 @@ from aiogram import Bot
 from db.utils import get_eastern_time_date # Import specific function
 # Need to check where rate_limiter comes from for line 52
 from utils.rate_limiter import rate_limiter # Assuming it's imported correctly
-from utils.game_processing import fetch_and_store_data
 from services.alert_monitor import alert_monitor
 from services.metrics import metrics
+from services.tracing import tracer
 from .fade_alerts import update_fade_alerts
+from .pipeline import fade_pipeline
 
 async def periodic_tasks(bot: Bot):
     """Runs periodic tasks like updating data, alerts, and monitoring."""
@@ -28,36 +29,36 @@ async def periodic_tasks(bot: Bot):
             start_time = current_time
             logger.info(f"--- Starting Periodic Update #{update_count} ---")
 
-            # --- Data Updates ---
-            # Run data fetches concurrently
-            date_today, _ = get_eastern_time_date()
-            nba_fetch_task = asyncio.create_task(fetch_and_store_data(date=date_today, sport="nba"))
-            ncaab_fetch_task = asyncio.create_task(fetch_and_store_data(date=date_today, sport="ncaab"))
+            with tracer.trace('periodic_cycle', cycle=update_count):
+                # --- Data Updates ---
+                # Run both slates through the fade pipeline (fetch → diff → detect → persist → notify)
+                date_today, _ = get_eastern_time_date()
+                nba_success, ncaab_success = await asyncio.gather(
+                    fade_pipeline.ingest("nba", date_today),
+                    fade_pipeline.ingest("ncaab", date_today)
+                )
+                logger.info(f"Data fetch results: NBA={nba_success}, NCAAB={ncaab_success}")
 
-            # Wait for fetches to complete
-            nba_success = await nba_fetch_task
-            ncaab_success = await ncaab_fetch_task
-            logger.info(f"Data fetch results: NBA={nba_success}, NCAAB={ncaab_success}")
+                # --- Fade Alert Updates ---
+                # Run after data fetch is complete
+                if nba_success or ncaab_success:
+                    await update_fade_alerts()
 
-            # --- Fade Alert Updates ---
-            # Run after data fetch is complete
-            if nba_success or ncaab_success:
-                await update_fade_alerts()
-
-            # --- System Monitoring & Cleanup ---
-            try:
-                await alert_monitor.check_and_alert(bot)
+                # --- System Monitoring & Cleanup ---
+                try:
+                    with tracer.span('alert_monitor'):
+                        await alert_monitor.check_and_alert(bot)
                 
-                # Less frequent cleanups
-                if current_time - last_cleanup_time > cleanup_interval:
-                    metrics.cleanup_old_data()
-                    rate_limiter.cleanup_old_data()
-                    last_cleanup_time = current_time
-                    logger.info("Performed periodic cleanup of metrics and rate limiter data.")
-            except psutil.NoSuchProcess:
-                logger.warning("psutil.NoSuchProcess error during monitoring.")
-            except Exception as e:
-                logger.error(f"Error during system monitoring or cleanup: {e}", exc_info=True)
+                    # Less frequent cleanups
+                    if current_time - last_cleanup_time > cleanup_interval:
+                        metrics.cleanup_old_data()
+                        rate_limiter.cleanup_old_data()
+                        last_cleanup_time = current_time
+                        logger.info("Performed periodic cleanup of metrics and rate limiter data.")
+                except psutil.NoSuchProcess:
+                    logger.warning("psutil.NoSuchProcess error during monitoring.")
+                except Exception as e:
+                    logger.error(f"Error during system monitoring or cleanup: {e}", exc_info=True)
 
             # --- Completion & Sleep ---
             total_time = time.time() - start_time
@@ -0,0 +1,336 @@
+import asyncio
+import contextvars
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from logging_setup import logger
+from config import config
+from db.connection import get_nba_collection, get_ncaab_collection
+from db.game_repo import get_scheduled_games
+from db.alert_repo import get_pending_fade_alerts_for_games, store_fade_alerts
+from db.utils import get_eastern_time_date
+from utils.game_processing import fetch_and_store_data, find_fade_opportunities
+from utils.market_probability import compute_slate_probabilities
+from services.alert_cards import alert_cards
+from services.tracing import tracer
+from .fade_alerts import build_fade_alert, push_new_fade_alerts
+
+COMPLETED_STATUSES = ('complete', 'closed', 'final')
+
+def game_fingerprint(game: dict) -> tuple:
+    """The parts of a game snapshot that affect detection or alert cards."""
+    return (
+        game.get('status'),
+        game.get('start_time'),
+        repr(game.get('spread')),
+        repr(game.get('total')),
+        repr(game.get('moneyline')),
+        repr(game.get('boxscore')),
+    )
+
+class _PipelineJob:
+    __slots__ = ('sport', 'date', 'future', 'games', 'changed', 'fingerprints', 'opportunities', 'new_alerts',
+                 'started', 'span')
+
+    def __init__(self, sport: str, date: str, future: asyncio.Future):
+        self.sport = sport
+        self.date = date
+        self.future = future
+        self.games: List[dict] = []
+        self.changed: List[dict] = []
+        self.fingerprints: Dict[object, tuple] = {}  # Committed once persist succeeds
+        self.opportunities: List[Tuple[dict, List[dict]]] = []
+        self.new_alerts: List[Tuple[dict, dict]] = []
+        self.started = time.monotonic()
+        self.span = tracer.current_span()  # Stages run in their own tasks; their spans nest under the ingesting caller
+
+class FadePipeline:
+    """
+    Staged ingestion pipeline: fetch → diff → detect → persist → notify.
+
+    Each stage runs as its own task and hands jobs to the next through a bounded
+    queue, so a slow stage applies backpressure instead of piling up work. Only
+    games whose snapshot changed are re-analysed, new opportunities are detected
+    once per ingestion (not once per user command), and each stage is timed.
+    Commands read the latest output via get_output instead of recomputing.
+
+    An ingestion's waiters are released once persist has updated the output;
+    notify (subscriber pushes and card edits) finishes in the background, so
+    commands never wait on Telegram delivery.
+    """
+    STAGES = ('fetch', 'diff', 'detect', 'persist', 'notify')
+    RESOLVE_AFTER = 'persist'
+
+    def __init__(self, queue_size: int = 4, max_age_slack: float = 60.0):
+        self.queue_size = queue_size
+        self.max_age_slack = max_age_slack  # Added to the periodic update interval for get_output's default max_age
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._fingerprints: Dict[Tuple[str, str], Dict[object, tuple]] = {}
+        # Latest output per (sport, date): games, alerts per game and when it was produced
+        self._output: Dict[Tuple[str, str], dict] = {}
+        self.stage_stats = {name: {'jobs': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0}
+                            for name in self.STAGES}
+        self.runs = {'completed': 0, 'failed': 0, 'unchanged': 0}
+
+    # --- Public API ---
+
+    async def ingest(self, sport: str, date: Optional[str] = None) -> bool:
+        """
+        Runs one ingestion for a slate and waits until its output is persisted (notify
+        continues in the background). Concurrent requests for the same slate share one
+        run. Returns False if the fetch failed.
+        """
+        date = date or get_eastern_time_date()[0]
+        key = (sport, date)
+        future = self._inflight.get(key)
+        with tracer.span(f"ingest.{sport}", shared=future is not None):
+            if future is None:
+                self._ensure_started()
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+                await self._queues['fetch'].put(_PipelineJob(sport, date, future))  # Blocks while the pipeline is saturated
+            return await asyncio.shield(future)
+
+    async def get_output(self, sport: str, date: Optional[str] = None, max_age: Optional[float] = None) -> Optional[dict]:
+        """
+        Latest pipeline output for a slate: {'games', 'alerts', 'updated'}, where alerts
+        are (game, alert) pairs in slate order. Runs an ingestion first if the output
+        is missing or older than `max_age` seconds. The default is one periodic update
+        interval plus slack, so commands normally just read what the periodic cycle
+        produced. None if the slate couldn't be fetched.
+        """
+        date = date or get_eastern_time_date()[0]
+        if max_age is None:
+            max_age = await config.get_setting('update_interval', 300) + self.max_age_slack
+        output = self._output.get((sport, date))
+        if output is None or time.monotonic() - output['produced_at'] > max_age:
+            await self.ingest(sport, date)
+        return self.peek_output(sport, date)
+
+    def peek_output(self, sport: str, date: Optional[str] = None) -> Optional[dict]:
+        """The latest output for a slate however old it is, without ingesting. None if there is none."""
+        date = date or get_eastern_time_date()[0]
+        output = self._output.get((sport, date))
+        if output is None or 'games' not in output:
+            return None
+        alerts = [(game, alert) for game in output['games'] for alert in output['alerts'].get(game.get('game_id'), [])]
+        return {'games': output['games'], 'alerts': alerts, 'updated': output['updated']}
+
+    def get_stats(self) -> dict:
+        """Per-stage timing, queue depth and run counters for /botstats."""
+        return {
+            'stages': {
+                name: {
+                    **stats,
+                    'avg_ms': stats['total_ms'] / stats['jobs'] if stats['jobs'] else 0.0,
+                    'queued': self._queues[name].qsize() if name in self._queues else 0,
+                }
+                for name, stats in self.stage_stats.items()
+            },
+            'inflight': len(self._inflight),
+            **self.runs,
+        }
+
+    async def stop(self):
+        """Stops the stage tasks; queued and in-flight ingestions are failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for queue in self._queues.values():
+            while not queue.empty():
+                self._finish(queue.get_nowait(), False)
+        for future in list(self._inflight.values()):
+            if not future.done():
+                future.set_result(False)
+
+    # --- Internals ---
+
+    def _ensure_started(self):
+        """Starts the stage tasks, restarting any that died on their existing queue so queued jobs still run."""
+        if len(self._tasks) == len(self.STAGES) and not any(task.done() for task in self._tasks):
+            return
+        if not self._queues:
+            self._queues = {name: asyncio.Queue(maxsize=self.queue_size) for name in self.STAGES}
+        handlers = [self._fetch, self._diff, self._detect, self._persist, self._notify]
+        tasks = self._tasks if len(self._tasks) == len(self.STAGES) else [None] * len(self.STAGES)
+        for i, (name, handler) in enumerate(zip(self.STAGES, handlers)):
+            if tasks[i] is not None and not tasks[i].done():
+                continue
+            if tasks[i] is not None and not tasks[i].cancelled() and tasks[i].exception():
+                logger.error(f"Fade pipeline stage '{name}' died: {tasks[i].exception()!r}; restarting it.")
+            next_stage = self.STAGES[i + 1] if i + 1 < len(self.STAGES) else None
+            # Fresh context, so a stage started from the traced periodic cycle doesn't keep its span;
+            # each job's span is activated explicitly instead
+            tasks[i] = asyncio.create_task(self._run_stage(name, handler, next_stage), context=contextvars.Context())
+        self._tasks = tasks
+        logger.info("Fade pipeline started.")
+
+    def _finish(self, job: _PipelineJob, success: bool):
+        if not job.future.done():
+            job.future.set_result(success)
+
+    async def _run_stage(self, name: str, handler: Callable, next_stage: Optional[str]):
+        inbox = self._queues[name]
+        stats = self.stage_stats[name]
+        while True:
+            job = await inbox.get()
+            started = time.perf_counter()
+            try:
+                # Once the waiters are released their trace may be finished; later stages trace on their own
+                span = job.span if not job.future.done() else None
+                with tracer.activate(span), tracer.trace(f"pipeline.{name}", sport=job.sport):
+                    proceed = await handler(job)
+            except asyncio.CancelledError:
+                self._finish(job, False)
+                raise
+            except Exception as e:
+                stats['errors'] += 1
+                self.runs['failed'] += 1
+                logger.error(f"Fade pipeline stage '{name}' failed for {job.sport.upper()} {job.date}: {e}", exc_info=True)
+                self._finish(job, False)
+                continue
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                stats['jobs'] += 1
+                stats['total_ms'] += elapsed_ms
+                stats['last_ms'] = elapsed_ms
+                stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+                inbox.task_done()
+
+            if proceed and name == self.RESOLVE_AFTER:
+                self._finish(job, True)  # Output is up to date; don't hold callers for notify
+            if proceed and next_stage:
+                await self._queues[next_stage].put(job)  # Waits if the next stage is backed up
+            elif proceed:
+                self.runs['completed'] += 1
+                logger.info(f"Fade pipeline: {job.sport.upper()} {job.date} done in "
+                            f"{(time.monotonic() - job.started) * 1000:.0f}ms "
+                            f"({len(job.changed)} changed games, {len(job.new_alerts)} new alerts).")
+                self._finish(job, True)
+
+    async def _fetch(self, job: _PipelineJob) -> bool:
+        """Fetches and stores the slate, then loads the processed games."""
+        if not await fetch_and_store_data(date=job.date, sport=job.sport):
+            self.runs['failed'] += 1
+            self._finish(job, False)
+            return False
+        get_collection = get_nba_collection if job.sport == "nba" else get_ncaab_collection
+        loop = asyncio.get_running_loop()
+        job.games = await loop.run_in_executor(None, lambda: get_scheduled_games(get_collection(), job.date)) or []
+        return True
+
+    async def _diff(self, job: _PipelineJob) -> bool:
+        """Keeps only games whose snapshot changed since the last ingestion."""
+        key = (job.sport, job.date)
+        previous = self._fingerprints.get(key, {})
+        current = {}
+        for game in job.games:
+            fingerprint = game_fingerprint(game)
+            current[game.get('game_id')] = fingerprint
+            if previous.get(game.get('game_id')) != fingerprint:
+                job.changed.append(game)
+        job.fingerprints = current
+
+        output = self._output.setdefault(key, {'alerts': {}})
+        output['games'] = job.games
+        output['updated'] = get_eastern_time_date()[1]
+        output['produced_at'] = time.monotonic()
+        # Drop alerts of games no longer on the slate
+        output['alerts'] = {gid: alerts for gid, alerts in output['alerts'].items() if gid in current}
+
+        if not job.changed:
+            self._fingerprints[key] = current
+            self.runs['unchanged'] += 1
+            self._finish(job, True)
+            return False
+        return True
+
+    async def _detect(self, job: _PipelineJob) -> bool:
+        """Finds fade opportunities on the changed games that haven't finished."""
+        live = [game for game in job.changed if (game.get('status') or '').lower() not in COMPLETED_STATUSES]
+        slate_probabilities = compute_slate_probabilities(live)
+        for game in live:
+            job.opportunities.append((game, find_fade_opportunities(game, job.sport, slate_probabilities)))
+        return True
+
+    async def _persist(self, job: _PipelineJob) -> bool:
+        """
+        Stores opportunities that don't already have a pending alert and updates the output.
+        The changed games' output entries are replaced only once the lookup and store have
+        succeeded, so a failed persist keeps showing the previous alerts. Fingerprints are
+        committed only here too, so games whose detection or storage failed are seen as
+        changed (and re-detected) by the next ingestion.
+        """
+        loop = asyncio.get_running_loop()
+        output_alerts = self._output[(job.sport, job.date)]['alerts']
+        # Finished games and games that lost their opportunities drop out; re-detected ones are set below
+        replacement: Dict[object, List[dict]] = {game.get('game_id'): [] for game in job.changed}
+
+        game_ids = [game.get('game_id') for game, opportunities in job.opportunities if opportunities]
+        if not game_ids:
+            self._replace_output_alerts(output_alerts, replacement)
+            self._commit_fingerprints(job)
+            return True
+        existing = await loop.run_in_executor(None, lambda: get_pending_fade_alerts_for_games(game_ids, job.date))
+        existing_by_key = {(a.get('game_id'), a.get('market'), a.get('faded_outcome_label')): a for a in existing}
+
+        to_store = []
+        for game, opportunities in job.opportunities:
+            game_alerts = []
+            for opp in opportunities:
+                alert = existing_by_key.get((opp['game_id'], opp['market'], opp['faded_outcome_label']))
+                if alert is None:
+                    alert = build_fade_alert(game, opp, job.date)
+                    to_store.append((game, alert))
+                game_alerts.append(alert)
+            replacement[game.get('game_id')] = game_alerts
+
+        failed_games = set()
+        if to_store:
+            stored = await loop.run_in_executor(None, lambda: store_fade_alerts([alert for _, alert in to_store]))
+            stored_ids = {id(alert) for alert in stored}
+            job.new_alerts = [(game, alert) for game, alert in to_store if id(alert) in stored_ids]
+            unstored = {id(alert): game.get('game_id') for game, alert in to_store if id(alert) not in stored_ids}
+            failed_games = set(unstored.values())
+            for game_id in failed_games:  # Unstored alerts are retried, not shown
+                replacement[game_id] = [alert for alert in replacement[game_id] if id(alert) not in unstored]
+            if failed_games:
+                logger.error(f"Fade pipeline: stored {len(stored)}/{len(to_store)} new {job.sport.upper()} alerts; "
+                             f"pushing the stored ones, {len(failed_games)} games retry next ingestion.")
+        self._replace_output_alerts(output_alerts, replacement)
+        self._commit_fingerprints(job, failed_games)
+        return True
+
+    @staticmethod
+    def _replace_output_alerts(output_alerts: Dict[object, List[dict]], replacement: Dict[object, List[dict]]):
+        for game_id, alerts in replacement.items():
+            if alerts:
+                output_alerts[game_id] = alerts
+            else:
+                output_alerts.pop(game_id, None)
+
+    def _commit_fingerprints(self, job: _PipelineJob, failed_games: Optional[set] = None):
+        """Records the job's snapshot as seen, except games to retry on the next ingestion."""
+        key = (job.sport, job.date)
+        fingerprints = dict(job.fingerprints)
+        if failed_games:
+            previous = self._fingerprints.get(key, {})
+            for game_id in failed_games:
+                if game_id in previous:
+                    fingerprints[game_id] = previous[game_id]
+                else:
+                    fingerprints.pop(game_id, None)
+        self._fingerprints[key] = fingerprints
+
+    async def _notify(self, job: _PipelineJob) -> bool:
+        """Pushes new alerts to subscribers and edits delivered cards for changed games."""
+        if job.new_alerts:
+            await push_new_fade_alerts(job.new_alerts)
+        await alert_cards.refresh_games(job.changed)
+        return True
+
+# Create singleton instance
+fade_pipeline = FadePipeline()
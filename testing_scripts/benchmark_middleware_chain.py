@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from datetime import datetime
+
+from aiogram import types
+
+import services.user_manager
+from middleware import MaintenanceMiddleware, ErrorHandlingMiddleware, UserTrackingMiddleware, FastPathMiddleware
+from utils.rate_limiter import rate_limited_command
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+user_manager_module = sys.modules['services.user_manager']
+COMMANDS = ['/nba', '/ncaab', '/fadenba', '/fades', '/help', '/fadestats']
+
+@rate_limited_command()
+async def handler_command(message: types.Message):
+    return True
+
+async def skip_reply(event, text, **kwargs):
+    return None
+
+async def dispatch(update: types.Update, data: dict):
+    """Stands in for aiogram's router: hands the message to a rate-limited handler."""
+    return await handler_command(update.message)
+
+def chain(middlewares):
+    """Composes outer middlewares the way aiogram does (first registered runs first)."""
+    handler = dispatch
+    for middleware in reversed(middlewares):
+        handler = (lambda mw, nxt: lambda event, data: mw(nxt, event, data))(middleware, handler)
+    return handler
+
+def make_updates(users: int, count: int, seed: int = 7):
+    rng = random.Random(seed)
+    updates = []
+    for update_id in range(count):
+        user = types.User(id=rng.randrange(1, users + 1), is_bot=False, first_name="user")
+        message = types.Message(message_id=update_id, date=datetime.now(), chat=types.Chat(id=user.id, type='private'),
+                                from_user=user, text=rng.choice(COMMANDS))
+        updates.append((types.Update(update_id=update_id, message=message), {'event_from_user': user}))
+    return updates
+
+async def run(label: str, middlewares, updates, repeat: int):
+    best = None
+    for _ in range(repeat):
+        # Fresh, warmed user state and rate limits so each run does the same work
+        manager = user_manager_module.UserManager(flush_interval=3600, flush_max_users=10 ** 9)
+        for module in ('middleware.user_tracking', 'middleware.fast_path'):
+            sys.modules[module].user_manager = manager
+        for _, data in updates:
+            manager.user_stats.setdefault(data['event_from_user'].id, user_manager_module._state_from_doc(None))
+        rate_limiter = sys.modules['utils.rate_limiter'].rate_limiter
+        rate_limiter.__init__()
+
+        handler = chain(middlewares)
+        started = time.perf_counter()
+        for update, data in updates:
+            await handler(update, dict(data))
+        # Activity is applied in the background either way; include it in the cost
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*pending)
+        await manager.drain_activity()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    logger.info(f"{label:40s} {best * 1000:8.1f} ms  ({best / len(updates) * 1e6:6.1f} us/update)")
+
+async def main_async(args):
+    updates = make_updates(args.users, args.count)
+    await run("legacy Maintenance+Error+UserTracking",
+              [MaintenanceMiddleware(), ErrorHandlingMiddleware(), UserTrackingMiddleware()], updates, args.repeat)
+    await run("fused FastPathMiddleware", [FastPathMiddleware()], updates, args.repeat)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-update middleware overhead: legacy chain vs fused fast path.")
+    parser.add_argument("--count", type=int, default=20000, help="Updates per run.")
+    parser.add_argument("--users", type=int, default=100000, help="Distinct users sending them.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant (best is reported).")
+    args = parser.parse_args()
+    user_manager_module.get_user_state = lambda user_id: None  # Keep the benchmark off the database
+    sys.modules['services.send_scheduler'].send_scheduler.answer = skip_reply  # Rate-limited replies have no bot to send through
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from aiogram import types
+
+import config as config_module
+import middleware.maintenance
+import middleware.user_tracking
+import services.user_manager
+from middleware import MaintenanceMiddleware, UserTrackingMiddleware
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+user_manager_module = sys.modules['services.user_manager']
+COMMANDS = ['/nba', '/ncaab', '/fadenba', '/fades', '/help']
+
+class LegacyConfig(config_module.Config):
+    """Config with the old locked read on every get."""
+    async def get_setting(self, key, default=None):
+        async with self._lock:
+            return self._settings.get(key, default)
+
+class LegacyMaintenanceMiddleware(MaintenanceMiddleware):
+    """The old maintenance check, awaiting the locked get_setting."""
+    async def __call__(self, handler, event, data):
+        if await middleware.maintenance.config.get_setting('maintenance_mode', False):
+            return
+        return await handler(event, data)
+
+class LegacyUserManager(user_manager_module.UserManager):
+    """UserManager with one global lock around ban checks and updates, as before sharding."""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._global_lock = asyncio.Lock()
+
+    async def is_banned(self, user_id):
+        async with self._global_lock:
+            return await super().is_banned(user_id)
+
+    async def update_user_activity(self, user_id, command):
+        async with self._global_lock:
+            return await super().update_user_activity(user_id, command)
+
+def fake_user_state(user_id, db_latency):
+    time.sleep(db_latency)  # Simulated round trip to the users collection
+    return {'commands': {'/nba': 1}, 'last_seen': 1, 'join_date': 1}
+
+def make_message(user_id: int, command: str) -> types.Message:
+    user = types.User(id=user_id, is_bot=False, first_name=f"user{user_id}")
+    return types.Message(message_id=user_id, date=datetime.now(),
+                         chat=types.Chat(id=user_id, type='private'), from_user=user, text=command)
+
+async def run_chain(users: int, updates: int, legacy: bool, db_latency: float, seed: int = 7):
+    """Drives `updates` concurrent synthetic messages through maintenance -> user tracking -> a no-op handler."""
+    manager = (LegacyUserManager if legacy else user_manager_module.UserManager)(flush_interval=3600, flush_max_users=10 ** 9)
+    settings = LegacyConfig() if legacy else config_module.Config()
+    user_manager_module.get_user_state = lambda user_id: fake_user_state(user_id, db_latency)
+    middleware.user_tracking.user_manager = manager
+    middleware.maintenance.config = settings
+
+    maintenance = LegacyMaintenanceMiddleware() if legacy else MaintenanceMiddleware()
+    tracking = UserTrackingMiddleware()
+
+    async def handler(event, data):
+        return True
+
+    rng = random.Random(seed)
+    events = []
+    for _ in range(updates):
+        user_id = rng.randrange(1, users + 1)
+        message = make_message(user_id, rng.choice(COMMANDS))
+        events.append((message, {'event_from_user': message.from_user}))
+
+    latencies = []
+
+    async def one(event, data):
+        started = time.perf_counter()
+        await maintenance(lambda e, d: tracking(handler, e, d), event, data)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(event, data) for event, data in events))
+    # Activity updates run as background tasks; wait for them too
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    await asyncio.gather(*pending)
+    elapsed = time.perf_counter() - started
+
+    counted = sum(sum(stats['commands'].values()) - 1 for stats in manager.user_stats.values())
+    latencies.sort()
+    return {
+        'elapsed': elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'counted': counted,
+        'loads': manager.cache_stats['loads'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lock contention in the middleware chain (global lock vs sharded/lock-free).")
+    parser.add_argument("--updates", type=int, default=10000, help="Concurrent synthetic updates.")
+    parser.add_argument("--users", type=int, default=2000, help="Distinct users sending them.")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="Simulated user load latency (seconds).")
+    args = parser.parse_args()
+
+    for label, legacy in (("global lock", True), ("sharded/lock-free", False)):
+        result = asyncio.run(run_chain(args.users, args.updates, legacy, args.db_latency))
+        ok = "OK" if result['counted'] == args.updates else f"MISMATCH ({result['counted']} counted)"
+        logger.info(f"{label:18s} {result['elapsed'] * 1000:8.1f} ms total, "
+                    f"{args.updates / result['elapsed']:8.0f} updates/s, chain p50 {result['p50_ms']:.2f}ms "
+                    f"p99 {result['p99_ms']:.2f}ms, {result['loads']} loads, counts {ok}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import logging
+import random
+import timeit
+
+from utils.odds_table import implied_probability, profit_per_unit
+from utils.game_processing import calculate_implied_probability
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def legacy_implied_probability(odds):
+    """The per-call conversion used before the lookup table."""
+    try:
+        odds = int(odds)
+        if odds < 0:
+            return (-odds / (-odds + 100)) * 100
+        elif odds > 0:
+            return (100 / (odds + 100)) * 100
+        else:
+            return None
+    except (ValueError, TypeError):
+        return None
+
+def legacy_profit_per_unit(odds):
+    """The per-call payout conversion used before the lookup table."""
+    try:
+        odds = int(odds)
+    except (ValueError, TypeError):
+        return None
+    if odds < 0:
+        return 100 / -odds
+    if odds > 0:
+        return odds / 100
+    return None
+
+def sample_odds(count: int, seed: int = 7):
+    """Realistic book prices: mostly -130..+130 juice with some longer moneylines."""
+    rng = random.Random(seed)
+    prices = []
+    for _ in range(count):
+        if rng.random() < 0.8:
+            price = rng.choice([-1, 1]) * rng.randint(100, 130)
+        else:
+            price = rng.choice([-1, 1]) * rng.randint(130, 2000)
+        prices.append(price)
+    return prices
+
+def check_equivalence(prices):
+    mismatches = 0
+    for price in prices + [0, '-110', '+150', 'bad', None, 25000, -25000]:
+        for new, old in ((implied_probability, legacy_implied_probability), (profit_per_unit, legacy_profit_per_unit)):
+            a, b = new(price), old(price)
+            if (a is None) != (b is None) or (a is not None and abs(a - b) > 1e-12):
+                mismatches += 1
+                logger.error(f"Mismatch for {price!r} in {new.__name__}: {a} != {b}")
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the American-odds lookup table against inline conversion.")
+    parser.add_argument("--count", type=int, default=100000, help="Number of prices per run.")
+    parser.add_argument("--repeat", type=int, default=5, help="timeit repeats (best is reported).")
+    args = parser.parse_args()
+
+    prices = sample_odds(args.count)
+    mismatches = check_equivalence(prices[:1000])
+    logger.info(f"Equivalence check: {'OK' if mismatches == 0 else f'{mismatches} mismatches'}")
+
+    cases = [
+        ("legacy implied_probability", legacy_implied_probability),
+        ("odds_table.implied_probability", implied_probability),
+        ("calculate_implied_probability", calculate_implied_probability),
+        ("legacy profit_per_unit", legacy_profit_per_unit),
+        ("odds_table.profit_per_unit", profit_per_unit),
+    ]
+    for label, func in cases:
+        best = min(timeit.repeat(lambda: [func(p) for p in prices], number=1, repeat=args.repeat))
+        logger.info(f"{label:32s} {best * 1000:8.2f} ms  ({best / len(prices) * 1e9:6.1f} ns/call)")
+
+if __name__ == "__main__":
+    main()
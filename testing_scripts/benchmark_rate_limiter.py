@@ -0,0 +1,95 @@
+import argparse
+import logging
+import random
+import time
+import timeit
+from collections import defaultdict
+
+from utils.rate_limiter import RateLimiter
+from utils.timing_wheel import TimingWheel
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+COMMANDS = ['/nba', '/ncaab', '/fadenba', '/fades', '/help', '/start', '/fadestats']
+
+class LegacyRateLimiter:
+    """The per-user timestamp-list limiter used before GCRA."""
+    def __init__(self, cooldowns):
+        self.command_times = defaultdict(list)
+        self.cooldowns = cooldowns
+
+    def check_rate_limit(self, user_id, command):
+        current_time = time.time()
+        command_key = command[1:] if command.startswith('/') else command
+        cooldown = self.cooldowns.get(command_key, self.cooldowns['default'])
+        self.command_times[user_id] = [t for t in self.command_times[user_id]
+                                       if current_time - t < max(self.cooldowns.values())]
+        if self.command_times[user_id]:
+            time_since_last = current_time - self.command_times[user_id][-1]
+            if time_since_last < cooldown:
+                return True, cooldown - time_since_last
+        self.command_times[user_id].append(current_time)
+        return False, 0
+
+    def cleanup_old_data(self):
+        current_time = time.time()
+        longest_cooldown = max(self.cooldowns.values())
+        for user_id in list(self.command_times.keys()):
+            self.command_times[user_id] = [t for t in self.command_times[user_id]
+                                           if current_time - t < longest_cooldown]
+            if not self.command_times[user_id]:
+                del self.command_times[user_id]
+
+def sample_traffic(users: int, count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [(rng.randrange(users), rng.choice(COMMANDS)) for _ in range(count)]
+
+def check_wheel_expiry(keys: int = 20000, seed: int = 7):
+    """Every key comes back from the wheel exactly once, never before it is due."""
+    rng = random.Random(seed)
+    wheel = TimingWheel(tick=1.0, slots=64, levels=2)
+    due = {}
+    for key in range(keys):
+        due[key] = rng.uniform(0, 6000)  # Some beyond the 4096s horizon
+        wheel.schedule(key, due[key])
+    returned, errors, now = set(), 0, 0.0
+    while now < 7000:
+        now += rng.uniform(0.5, 30)
+        for key in wheel.advance(now):
+            if due[key] > now:
+                wheel.schedule(key, due[key])  # Parked at the horizon; reschedule like RateLimiter does
+                continue
+            if key in returned:
+                errors += 1
+            returned.add(key)
+    errors += keys - len(returned)
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GCRA rate limiter against the legacy timestamp lists.")
+    parser.add_argument("--users", type=int, default=100000, help="Number of active users.")
+    parser.add_argument("--count", type=int, default=200000, help="Number of checks per run.")
+    parser.add_argument("--repeat", type=int, default=5, help="timeit repeats (best is reported).")
+    args = parser.parse_args()
+
+    errors = check_wheel_expiry()
+    logger.info(f"Timing wheel expiry check: {'OK' if errors == 0 else f'{errors} errors'}")
+
+    traffic = sample_traffic(args.users, args.count)
+    gcra = RateLimiter()
+    legacy = LegacyRateLimiter(dict(gcra.cooldowns))
+    for user_id, command in traffic:  # Warm both limiters up to the full active-user set
+        gcra.check_rate_limit(user_id, command)
+        legacy.check_rate_limit(user_id, command)
+    logger.info(f"Active users: {args.users}, GCRA keys tracked: {gcra.get_stats()['tracked_keys']}")
+
+    for label, limiter in (("legacy check_rate_limit", legacy), ("GCRA check_rate_limit", gcra)):
+        best = min(timeit.repeat(lambda: [limiter.check_rate_limit(u, c) for u, c in traffic], number=1, repeat=args.repeat))
+        logger.info(f"{label:28s} {best * 1000:8.2f} ms  ({best / len(traffic) * 1e9:7.1f} ns/check)")
+    for label, limiter in (("legacy cleanup_old_data", legacy), ("GCRA cleanup_old_data", gcra)):
+        best = min(timeit.repeat(limiter.cleanup_old_data, number=1, repeat=args.repeat))
+        logger.info(f"{label:28s} {best * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from .rate_limiter import rate_limiter, rate_limited_command
-from .formatters import get_game_status_icon, format_fade_alert # Removed calculate_fade_rating
+from .formatters import get_game_status_icon, format_fade_alert, render_fade_digests # Removed calculate_fade_rating
 from .game_processing import get_bet_percentages, get_spread_info, determine_winner
 from .message_helpers import send_long_message, send_games_in_chunks
 
@@ -9,6 +9,7 @@ __all__ = [
     'get_game_status_icon',
     # 'calculate_fade_rating', # Removed
     'format_fade_alert',
+    'render_fade_digests',
     'get_bet_percentages', # Note: This is deprecated but might be used elsewhere
     'get_spread_info',
     'determine_winner',
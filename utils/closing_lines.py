@@ -0,0 +1,140 @@
+import asyncio
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple, Any
+from logging_setup import logger
+from db.alert_repo import get_fade_alerts_awaiting_close, bulk_set_fade_alert_fields
+from utils.market_probability import MARKET_SIDES, game_market_probabilities, fair_market_probabilities
+
+# Game statuses (normalized like get_game_status_icon) that mean the game has tipped and
+# the line is closed. Anything else, including delayed, postponed or an unknown status,
+# keeps the line open so CLV is not locked in from a snapshot taken before a reschedule.
+TIPPED_STATUSES = ('inprogress', 'halftime', 'suspended', 'complete', 'closed', 'final')
+
+def _has_tipped(game: dict) -> bool:
+    """True once a game's status says it is under way or over."""
+    status = (game.get('status') or '').lower().replace('_', '').replace('-', '')
+    return status in TIPPED_STATUSES
+
+def _outcome_for_alert(game: dict, alert: dict) -> Optional[dict]:
+    """Finds the outcome on a processed game matching the alert's market and faded side."""
+    market = (alert.get('market') or '').lower()
+    side = (alert.get('faded_outcome_label') or '').lower()
+    if market not in MARKET_SIDES or side not in MARKET_SIDES[market]:
+        return None
+    outcomes = game.get(market)
+    if not isinstance(outcomes, list):
+        return None
+    return next((o for o in outcomes if isinstance(o, dict) and o.get('side') == side), None)
+
+def closing_snapshot(game: dict, alert: dict,
+                     market_probabilities: Optional[Dict[Tuple[str, str], Dict[str, float]]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Reads the current line and odds for an alert's faded outcome from a processed game.
+
+    Returns:
+        The closing_* fields to store on the alert, or None if the outcome is not on the board.
+    """
+    outcome = _outcome_for_alert(game, alert)
+    if not outcome or outcome.get('odds') is None:
+        return None
+    if market_probabilities is None:
+        market_probabilities = game_market_probabilities(game)
+    probs = market_probabilities.get((alert['market'].lower(), alert['faded_outcome_label'].lower())) or {}
+    return {
+        'closing_value': outcome.get('value'),
+        'closing_odds': outcome.get('odds'),
+        'closing_fade_odds': probs.get('fade_odds'),
+        'closing_fade_fair_probability': probs.get('fade_fair_probability'),
+        'closing_captured_at': datetime.now(),
+    }
+
+def compute_clv(alert: dict) -> Dict[str, Optional[float]]:
+    """
+    Closing line value for the fade (the side opposite the faded outcome).
+
+    clv_line: Points gained on the line, positive when the close moved against the
+        faded side (spread/total only).
+    clv_price: No-vig closing probability of the fade side minus its no-vig
+        probability when the alert was issued, in percentage points. Positive
+        means the market moved toward the fade after the alert. None if the
+        issued price can't be de-vigged (alerts from before both sides were stored).
+    """
+    clv_line = None
+    alert_value, closing_value = alert.get('faded_value'), alert.get('closing_value')
+    if alert_value is not None and closing_value is not None:
+        try:
+            moved = float(closing_value) - float(alert_value)
+            # A higher total helps the faded Over and hurts an Under fade, so flip for Over
+            clv_line = -moved if alert.get('faded_outcome_label') == 'Over' else moved
+        except (ValueError, TypeError):
+            clv_line = None
+
+    clv_price = None
+    closing_fair = alert.get('closing_fade_fair_probability')
+    if closing_fair is not None:
+        # Compare no-vig to no-vig so an unmoved price scores zero rather than minus the hold
+        issued_fair = None
+        if alert.get('fair_probability') is not None:
+            issued_fair = 100 - alert['fair_probability']
+        elif alert.get('odds') is not None and alert.get('fade_odds') is not None:
+            # De-vig the issued two-way line the same way as the close
+            try:
+                probs = fair_market_probabilities(alert.get('game_id'), (alert.get('market') or '').lower(),
+                                                  int(alert['odds']), int(alert['fade_odds']))
+            except (ValueError, TypeError):
+                probs = None
+            issued_fair = probs['fair_b'] if probs else None
+        if issued_fair is not None:
+            clv_price = closing_fair - issued_fair
+
+    return {'clv_line': clv_line, 'clv_price': clv_price}
+
+async def capture_closing_lines(games: List[dict], sport: str) -> int:
+    """
+    Tracks closing lines for open alerts from an ingested slate snapshot.
+
+    Until a game is reported in progress or final, each alert's latest line and odds
+    are recorded. Once the game has tipped, the last recorded snapshot is the close
+    and CLV is computed and stored for all of that game's alerts in one bulk write.
+
+    Returns:
+        The number of alerts updated.
+    """
+    games_by_id = {g['game_id']: g for g in games if g and g.get('game_id') is not None}
+    if not games_by_id:
+        return 0
+
+    try:
+        loop = asyncio.get_running_loop()
+        alerts = await loop.run_in_executor(
+            None, lambda: get_fade_alerts_awaiting_close(sport, list(games_by_id.keys())))
+        if not alerts:
+            return 0
+
+        updates = []
+        probabilities_by_game = {}
+        for alert in alerts:
+            game = games_by_id.get(alert.get('game_id'))
+            if not game:
+                continue
+            if _has_tipped(game):
+                # Game has started: lock in CLV from the last pre-tip snapshot
+                fields = {'clv_final': True}
+                if alert.get('closing_captured_at'):
+                    fields.update(compute_clv(alert))
+                updates.append((alert['_id'], fields))
+            else:
+                game_id = game['game_id']
+                if game_id not in probabilities_by_game:
+                    probabilities_by_game[game_id] = game_market_probabilities(game)
+                snapshot = closing_snapshot(game, alert, probabilities_by_game[game_id])
+                if snapshot:
+                    updates.append((alert['_id'], snapshot))
+
+        updated = await loop.run_in_executor(None, lambda: bulk_set_fade_alert_fields(updates))
+        finalized = sum(1 for _, fields in updates if fields.get('clv_final'))
+        logger.info(f"[capture_closing_lines] {sport.upper()}: updated {updated} alerts ({finalized} finalized with CLV).")
+        return updated
+    except Exception as e:
+        logger.error(f"Error capturing closing lines for {sport}: {e}", exc_info=True)
+        return 0
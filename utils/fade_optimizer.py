@@ -0,0 +1,318 @@
+"""
+Offline threshold sweep for the fade rating formula.
+
+Builds a graded corpus of historical book 15 outcomes from the stored daily
+snapshots, places it in a shared-memory block and evaluates candidate scoring
+parameters (overvaluation threshold, star band edges, T% > M% margin) across
+all cores. Results come back as a table ranked by ROI.
+
+Usage:
+    python -m utils.fade_optimizer nba --days 60
+    python -m utils.fade_optimizer all --search coordinate --top 10
+"""
+import argparse
+import itertools
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+from logging_setup import logger
+from utils.game_processing import (
+    calculate_fade_rating_v2,
+    FADE_OVERVALUED_THRESHOLD, FADE_DIFFERENCE_BANDS, FADE_TICKET_BANDS, FADE_PUBLIC_MARGIN
+)
+from utils.odds_table import implied_probability, profit_per_unit
+from utils.settlement import grade_alerts_for_game
+
+# Corpus column layout (one float64 per row per column)
+COL_T_PCT = 0
+COL_M_PCT = 1
+COL_IMPLIED_PROB = 2
+COL_FADE_WON = 3      # 1.0 fade won, 0.0 fade lost (pushes are dropped at build time)
+COL_FADE_PROFIT = 4   # Profit per unit staked on the opposite side if the fade wins
+COL_MARKET = 5        # Index into MARKETS
+NUM_COLUMNS = 6
+ROW_FORMAT = struct.Struct(f'{NUM_COLUMNS}d')
+
+MARKETS = ('Spread', 'Total', 'Moneyline')
+OPPOSITE_SIDE = {'home': 'away', 'away': 'home', 'over': 'under', 'under': 'over'}
+DEFAULT_FADE_ODDS = -110 # Used when the opposite side's odds are missing
+
+# Default sweep grid
+GRID_THRESHOLDS = (10.0, 12.5, 15.0, 17.5, 20.0)
+GRID_DIFFERENCE_EDGES = (20.0, 25.0, 30.0, 35.0, 40.0)
+GRID_TICKET_EDGES = (75.0, 80.0, 85.0, 90.0, 95.0)
+GRID_PUBLIC_MARGINS = (0.0, 5.0, 10.0, 15.0)
+
+# --- Corpus Construction ---
+
+def corpus_rows_for_game(game: dict) -> List[Tuple[float, ...]]:
+    """Extracts one graded corpus row per book 15 outcome of a completed game."""
+    if game.get('status', '').lower() not in ['complete', 'closed', 'final']:
+        return []
+
+    candidates = [] # (t_pct, m_pct, implied_prob, fade_profit, market_index)
+    hypothetical_alerts = []
+    for market_index, market in enumerate(MARKETS):
+        outcomes = game.get(market.lower())
+        if not isinstance(outcomes, list):
+            continue
+        odds_by_side = {o.get('side'): o.get('odds') for o in outcomes if isinstance(o, dict)}
+
+        for outcome in outcomes:
+            if not isinstance(outcome, dict):
+                continue
+            bet_info = outcome.get('bet_info', {})
+            t_pct = bet_info.get('tickets', {}).get('percent')
+            m_pct = bet_info.get('money', {}).get('percent')
+            side = outcome.get('side')
+            implied_prob = implied_probability(outcome.get('odds'))
+            if None in [t_pct, m_pct, implied_prob] or side not in OPPOSITE_SIDE:
+                continue
+
+            if market == 'Total':
+                faded_label = 'Over' if side == 'over' else 'Under'
+            else:
+                faded_label = 'Home' if side == 'home' else 'Away'
+
+            fade_profit = profit_per_unit(odds_by_side.get(OPPOSITE_SIDE[side]))
+            if fade_profit is None:
+                fade_profit = profit_per_unit(DEFAULT_FADE_ODDS)
+
+            candidates.append((float(t_pct), float(m_pct), implied_prob, fade_profit, float(market_index)))
+            hypothetical_alerts.append({'market': market, 'faded_outcome_label': faded_label,
+                                        'faded_value': outcome.get('value')})
+
+    if not candidates:
+        return []
+
+    # Grade every outcome of the game with the same rules as live settlement
+    grades = grade_alerts_for_game(game, hypothetical_alerts)
+    rows = []
+    for (t_pct, m_pct, implied_prob, fade_profit, market_index), won, lost in zip(candidates, grades.won, grades.lost):
+        if not (won or lost):
+            continue # Push or ungradeable
+        rows.append((t_pct, m_pct, implied_prob, 1.0 if won else 0.0, fade_profit, market_index))
+    return rows
+
+def load_corpus(sports: List[str], days: int) -> List[Tuple[float, ...]]:
+    """Loads and grades all stored snapshots for the given sports over the past N days."""
+    from db.connection import get_nba_collection, get_ncaab_collection
+    from db.game_repo import get_scheduled_games
+
+    start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
+    rows = []
+    for sport in sports:
+        collection = get_nba_collection() if sport == "nba" else get_ncaab_collection()
+        dates = sorted(collection.distinct("date", {"date": {"$gte": start_date}}))
+        logger.info(f"[fade_optimizer] Loading {len(dates)} {sport.upper()} snapshot dates since {start_date}")
+        for date in dates:
+            for game in get_scheduled_games(collection, date):
+                rows.extend(corpus_rows_for_game(game))
+    logger.info(f"[fade_optimizer] Corpus built with {len(rows)} graded outcomes")
+    return rows
+
+def create_shared_corpus(rows: List[Tuple[float, ...]]) -> shared_memory.SharedMemory:
+    """Copies the corpus rows into a new shared-memory block (row-major float64)."""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(rows)) * ROW_FORMAT.size)
+    for i, row in enumerate(rows):
+        ROW_FORMAT.pack_into(shm.buf, i * ROW_FORMAT.size, *row)
+    return shm
+
+# --- Worker Side ---
+
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_corpus_size = 0
+
+def _init_worker(shm_name: str, num_rows: int):
+    """
+    Attaches a worker process to the shared corpus. Rows are decoded from the shared
+    block on each pass rather than copied, so workers add no per-process corpus memory.
+    """
+    global _worker_shm, _worker_corpus_size
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    # The block may be rounded up to a page; only the packed rows are corpus
+    _worker_corpus_size = num_rows * ROW_FORMAT.size
+
+def evaluate_candidate(rows: Iterable[Tuple[float, ...]], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Evaluates one parameter set against the corpus (any iterable of rows, read once), flat-staking one unit per alert."""
+    wins = losses = 0
+    units = 0.0
+    by_rating = {stars: [0, 0] for stars in range(1, 6)} # stars -> [wins, losses]
+
+    for row in rows:
+        rating = calculate_fade_rating_v2(
+            row[COL_T_PCT], row[COL_M_PCT], row[COL_IMPLIED_PROB],
+            threshold=params['threshold'],
+            difference_bands=params['difference_bands'],
+            ticket_bands=params['ticket_bands'],
+            public_margin=params['public_margin'],
+        )
+        if rating == 0:
+            continue
+        if row[COL_FADE_WON]:
+            wins += 1
+            units += row[COL_FADE_PROFIT]
+            by_rating[rating][0] += 1
+        else:
+            losses += 1
+            units -= 1.0
+            by_rating[rating][1] += 1
+
+    total = wins + losses
+    return {
+        **params,
+        'alerts': total,
+        'wins': wins,
+        'losses': losses,
+        'win_rate': (wins / total * 100) if total else 0.0,
+        'units': units,
+        'roi': (units / total * 100) if total else 0.0,
+        'by_rating': {stars: (w / (w + l) * 100 if w + l else None, w + l) for stars, (w, l) in by_rating.items()},
+    }
+
+def _evaluate_batch(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Slice per batch and release it, so no view of the block outlives the batch and
+    # SharedMemory.close() doesn't raise BufferError when the worker shuts down
+    with _worker_shm.buf[:_worker_corpus_size] as corpus:
+        return [evaluate_candidate(ROW_FORMAT.iter_unpack(corpus), params) for params in candidates]
+
+# --- Search Strategies ---
+
+def _valid_edges(edges: Tuple[float, ...], floor: float = 0.0) -> bool:
+    return all(a < b for a, b in zip(edges, edges[1:])) and edges[0] > floor
+
+def grid_candidates(thresholds=GRID_THRESHOLDS, difference_edges=GRID_DIFFERENCE_EDGES,
+                    ticket_edges=GRID_TICKET_EDGES, margins=GRID_PUBLIC_MARGINS) -> List[Dict[str, Any]]:
+    """Enumerates every consistent parameter combination in the grid."""
+    candidates = []
+    for threshold, margin in itertools.product(thresholds, margins):
+        for diff_bands in itertools.combinations(difference_edges, len(FADE_DIFFERENCE_BANDS)):
+            if not _valid_edges(diff_bands, floor=threshold):
+                continue
+            for ticket_bands in itertools.combinations(ticket_edges, len(FADE_TICKET_BANDS)):
+                candidates.append({
+                    'threshold': threshold,
+                    'difference_bands': diff_bands,
+                    'ticket_bands': ticket_bands,
+                    'public_margin': margin,
+                })
+    return candidates
+
+def default_params() -> Dict[str, Any]:
+    return {
+        'threshold': FADE_OVERVALUED_THRESHOLD,
+        'difference_bands': FADE_DIFFERENCE_BANDS,
+        'ticket_bands': FADE_TICKET_BANDS,
+        'public_margin': FADE_PUBLIC_MARGIN,
+    }
+
+def _score(result: Dict[str, Any], min_alerts: int) -> float:
+    """Ranking key: ROI, with undersized samples pushed to the bottom."""
+    return result['roi'] if result['alerts'] >= min_alerts else float('-inf')
+
+def _run_parallel(pool: ProcessPoolExecutor, candidates: List[Dict[str, Any]], workers: int) -> List[Dict[str, Any]]:
+    chunk_size = max(1, len(candidates) // (workers * 4))
+    chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+    results = []
+    for batch in pool.map(_evaluate_batch, chunks):
+        results.extend(batch)
+    return results
+
+def coordinate_search(pool: ProcessPoolExecutor, workers: int, min_alerts: int,
+                      max_rounds: int = 5) -> List[Dict[str, Any]]:
+    """Sweeps one parameter at a time from the live defaults until no parameter improves the score."""
+    axes = {
+        'threshold': [(v,) for v in GRID_THRESHOLDS],
+        'difference_bands': list(itertools.combinations(GRID_DIFFERENCE_EDGES, len(FADE_DIFFERENCE_BANDS))),
+        'ticket_bands': list(itertools.combinations(GRID_TICKET_EDGES, len(FADE_TICKET_BANDS))),
+        'public_margin': [(v,) for v in GRID_PUBLIC_MARGINS],
+    }
+    best = _run_parallel(pool, [default_params()], workers)[0]
+    seen = {}
+
+    for round_num in range(1, max_rounds + 1):
+        improved = False
+        for axis, values in axes.items():
+            candidates = []
+            for value in values:
+                params = {k: best[k] for k in default_params()}
+                params[axis] = value[0] if len(value) == 1 else value
+                if not _valid_edges(params['difference_bands'], floor=params['threshold']):
+                    continue
+                candidates.append(params)
+            for result in _run_parallel(pool, candidates, workers):
+                seen[_params_key(result)] = result
+                if _score(result, min_alerts) > _score(best, min_alerts):
+                    best = result
+                    improved = True
+        logger.info(f"[fade_optimizer] Coordinate round {round_num}: best ROI {best['roi']:.2f}% over {best['alerts']} alerts")
+        if not improved:
+            break
+    return list(seen.values())
+
+def _params_key(result: Dict[str, Any]) -> tuple:
+    return (result['threshold'], result['difference_bands'], result['ticket_bands'], result['public_margin'])
+
+def run_sweep(rows: List[Tuple[float, ...]], search: str = "grid", workers: Optional[int] = None,
+              min_alerts: int = 30) -> List[Dict[str, Any]]:
+    """Evaluates candidates over the corpus on all cores and returns results ranked by ROI."""
+    workers = workers or os.cpu_count() or 1
+    shm = create_shared_corpus(rows)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shm.name, len(rows))) as pool:
+            if search == "coordinate":
+                results = coordinate_search(pool, workers, min_alerts)
+            else:
+                results = _run_parallel(pool, grid_candidates(), workers)
+    finally:
+        shm.close()
+        shm.unlink()
+    return sorted(results, key=lambda r: (_score(r, min_alerts), r['alerts']), reverse=True)
+
+def format_results_table(results: List[Dict[str, Any]], top: int = 20) -> str:
+    """Renders the ranked results as a plain-text table."""
+    header = f"{'#':>3} {'thr':>5} {'diff bands':>12} {'ticket bands':>12} {'margin':>6} {'alerts':>6} {'win%':>6} {'units':>8} {'roi%':>7}  per-star win% (n)"
+    lines = [header, "-" * len(header)]
+    for rank, r in enumerate(results[:top], 1):
+        per_star = " ".join(
+            f"{stars}*:{rate:.0f}({n})" for stars, (rate, n) in r['by_rating'].items() if rate is not None
+        )
+        lines.append(
+            f"{rank:>3} {r['threshold']:>5.1f} {str(r['difference_bands']):>12} {str(r['ticket_bands']):>12} "
+            f"{r['public_margin']:>6.1f} {r['alerts']:>6} {r['win_rate']:>6.1f} {r['units']:>8.2f} {r['roi']:>7.2f}  {per_star}"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep fade rating parameters against historical snapshots.")
+    parser.add_argument("sport", choices=["nba", "ncaab", "all"], help="Sport corpus to evaluate.")
+    parser.add_argument("--days", type=int, default=30, help="How many days of stored snapshots to use.")
+    parser.add_argument("--search", choices=["grid", "coordinate"], default="grid", help="Search strategy.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--min-alerts", type=int, default=30, help="Minimum alerts for a candidate to rank.")
+    parser.add_argument("--top", type=int, default=20, help="Rows to print.")
+    args = parser.parse_args()
+
+    sports = ["nba", "ncaab"] if args.sport == "all" else [args.sport]
+    rows = load_corpus(sports, args.days)
+    if not rows:
+        print("No graded outcomes found for the requested range.")
+        return
+
+    start = time.monotonic()
+    results = run_sweep(rows, search=args.search, workers=args.workers, min_alerts=args.min_alerts)
+    elapsed = time.monotonic() - start
+
+    baseline = evaluate_candidate(rows, default_params())
+    print(f"Evaluated {len(results)} candidates over {len(rows)} outcomes in {elapsed:.1f}s")
+    print(f"Live defaults: {baseline['alerts']} alerts, {baseline['win_rate']:.1f}% win rate, {baseline['roi']:.2f}% ROI\n")
+    print(format_results_table(results, top=args.top))
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List
 from datetime import datetime
 import logging
 from logging_setup import logger
 from utils.game_processing import get_spread_info # Removed get_bet_percentages
+from utils.render_cache import render_cache, alert_identity, game_state_version
 
 def get_game_status_icon(status: str) -> str:
     """Returns appropriate icon for game status."""
@@ -91,7 +92,170 @@ def format_game_info(game: dict, sport: str = "nba") -> str:
         logger.error(f"Error formatting game info: {e}", exc_info=True)
         return "Error formatting game information"
 
+def render_slate_pages(games: List[dict], sport: str, title: str, per_page: int = 8,
+                       max_length: int = 4096) -> List[str]:
+    """
+    Splits a day's slate into pages of at most `per_page` games, each under
+    Telegram's length limit. Each page starts with the title and a page marker.
+    """
+    pages, current, current_len = [], [], 0
+    header_reserve = len(f"{title} · Page 999/999\n\n")
+    for game in games:
+        game_text = format_game_info(game, sport)
+        if current and (len(current) >= per_page or header_reserve + current_len + len(game_text) + 2 > max_length):
+            pages.append(current)
+            current, current_len = [], 0
+        current.append(game_text)
+        current_len += len(game_text) + 2
+    if current:
+        pages.append(current)
+    return [f"{title} · Page {index}/{len(pages)}\n\n" + "\n\n".join(page)
+            for index, page in enumerate(pages, start=1)]
+
+# Explanatory text per market; shown under a single alert, or once per digest
+MARKET_EXPLANATIONS = {
+    'Total': "<i>Fading the total means betting on the opposite outcome to what the public heavily favors. 'Over' means betting the combined score will be higher than the line; 'Under' means betting it will be lower.</i>",
+    'Spread': "<i>Fading the spread means betting on the opposing team to cover the point spread against the publicly favored side.</i>",
+    'Moneyline': "<i>Fading the moneyline means betting on the opposing team to win outright against the publicly favored side.</i>",
+}
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+def _fade_alert_fields(game: dict, opportunity: dict) -> Optional[dict]:
+    """
+    Extracts the display fields shared by the single-alert and digest formats.
+    Returns None if the game or opportunity is missing data needed to render.
+    """
+    # --- Extract Game Info ---
+    home_team = game.get('home_team')
+    away_team = game.get('away_team')
+    game_id_fmt = game.get('game_id', 'N/A')
+    logger.debug(f"[format_fade_alert] Checking game {game_id_fmt}. Game keys: {list(game.keys())}. Home team type: {type(home_team).__name__}, Away team type: {type(away_team).__name__}")
+    # Use team abbreviations if display names are missing/long
+    home_display = home_team.get('abbr') if home_team else 'Home'
+    away_display = away_team.get('abbr') if away_team else 'Away'
+    if not home_team or not away_team:
+        logger.warning(f"[format_fade_alert] Returning None because home_team or away_team is missing/falsy for game {game_id_fmt}")
+        return None # Need team objects
+
+    sport = opportunity.get('sport', 'unknown')
+    sport_name = 'NBA' if sport == 'nba' else 'NCAAB' if sport == 'ncaab' else sport.upper()
+    game_status = game.get('status', 'unknown')
+    game_id_log = opportunity.get('game_id', 'N/A') # For logging
+
+    # --- Extract Opportunity Info ---
+    market = opportunity.get('market')
+    faded_outcome_label = opportunity.get('faded_outcome_label')
+    faded_value = opportunity.get('faded_value') # Spread/Total value
+    odds = opportunity.get('odds')
+    implied_prob = opportunity.get('implied_probability')
+    # Accept either key format for flexibility
+    tickets_pct = opportunity.get('T%') or opportunity.get('tickets_percent')
+    money_pct = opportunity.get('M%') or opportunity.get('money_percent')
+    rating = opportunity.get('rating', 0) # Get the rating
+
+    if not all([market, faded_outcome_label, odds is not None, implied_prob is not None, tickets_pct is not None, money_pct is not None]):
+        logger.warning(f"Incomplete opportunity data for formatting: {game_id_log}")
+        return None
+
+    # --- Determine "Bet Against" Side and Value ---
+    bet_against_label = "N/A"
+    bet_against_value_str = "" # For spread/total value
+
+    if market == 'Spread':
+        opponent_spread_val = None
+        if faded_value is not None:
+            try:
+                opponent_spread_val = -float(faded_value)
+                bet_against_value_str = f"{opponent_spread_val:+.1f}" # Always show sign
+            except (ValueError, TypeError):
+                bet_against_value_str = "N/A"
+
+        if faded_outcome_label == 'Home':
+            bet_against_label = f"{away_display} {bet_against_value_str}"
+        elif faded_outcome_label == 'Away':
+            bet_against_label = f"{home_display} {bet_against_value_str}"
+
+    elif market == 'Total':
+        bet_against_value_str = str(faded_value) if faded_value is not None else "N/A"
+        if faded_outcome_label == 'Over':
+            bet_against_label = f"Under {bet_against_value_str}"
+        elif faded_outcome_label == 'Under':
+            bet_against_label = f"Over {bet_against_value_str}"
+
+    elif market == 'Moneyline':
+        # No value string needed for ML bet against label
+        if faded_outcome_label == 'Home':
+            bet_against_label = f"{away_display} ML"
+        elif faded_outcome_label == 'Away':
+            bet_against_label = f"{home_display} ML"
+
+    # --- Format Faded Outcome Value ---
+    faded_value_str = ""
+    if faded_value is not None and market != 'Moneyline': # ML value is usually 0
+         try:
+             faded_val_num = float(faded_value)
+             faded_value_str = f" ({faded_val_num:+.1f})" if market == 'Spread' else f" ({faded_val_num})"
+         except (ValueError, TypeError):
+             faded_value_str = f" ({faded_value})"
+
+    # --- Line Move (latest pre-tip snapshot, see utils.closing_lines) ---
+    line_move = None
+    closing_value = opportunity.get('closing_value')
+    closing_odds = opportunity.get('closing_odds')
+    try:
+        if market == 'Moneyline':
+            if closing_odds is not None and closing_odds != odds:
+                line_move = f"{closing_odds} (was {odds})"
+        elif closing_value is not None and faded_value is not None and float(closing_value) != float(faded_value):
+            closing_str = f"{float(closing_value):+.1f}" if market == 'Spread' else f"{closing_value}"
+            line_move = f"{faded_outcome_label} {closing_str}{f' ({closing_odds})' if closing_odds is not None else ''}"
+    except (ValueError, TypeError):
+        line_move = None
+
+    # --- Game Status Line ---
+    if game_status.lower() in ['complete', 'closed', 'final']:
+        boxscore = game.get('boxscore', {})
+        away_score = boxscore.get('total_away_points', '?')
+        home_score = boxscore.get('total_home_points', '?')
+        status_line = f"Final Score: {away_display} {away_score} - {home_score} {home_display}"
+    else:
+        start_time_str = game.get('start_time')
+        time_display = "Time N/A"
+        if start_time_str:
+            try:
+                start_dt = datetime.strptime(start_time_str, "%Y-%m-%dT%H:%M:%S.%fZ")
+                time_display = start_dt.strftime("%I:%M %p UTC") # Consider converting to user's timezone later
+            except ValueError:
+                time_display = start_time_str
+        status_line = f"{time_display} - {get_game_status_icon(game_status)}"
+
+    return {
+        'sport_name': sport_name,
+        'home_display': home_display,
+        'away_display': away_display,
+        'status_line': status_line,
+        'market': market,
+        'faded_outcome_full_label': f"{faded_outcome_label}{faded_value_str}",
+        'bet_against_label': bet_against_label,
+        'odds': odds,
+        'implied_prob': implied_prob,
+        'tickets_pct': tickets_pct,
+        'money_pct': money_pct,
+        'rating': rating,
+        'line_move': line_move,
+    }
+
 def format_fade_alert(game: dict, opportunity: dict, result_status: Optional[str] = "pending") -> Optional[str]:
+    """
+    Formats a fade alert message, reusing the cached rendering for this alert,
+    result status, game state and latest line when there is one (see utils.render_cache).
+    """
+    key = ('alert', alert_identity(opportunity), result_status, game_state_version(game),
+           opportunity.get('closing_value'), opportunity.get('closing_odds'))
+    return render_cache.get_or_render(key, lambda: _render_fade_alert(game, opportunity, result_status))
+
+def _render_fade_alert(game: dict, opportunity: dict, result_status: Optional[str] = "pending") -> Optional[str]:
     """
     Formats a fade alert message based on the opportunity data and result status,
     using the Ticket% vs Implied Probability formula and includes star rating (Structure V4.11).
@@ -105,86 +269,18 @@ def format_fade_alert(game: dict, opportunity: dict, result_status: Optional[str
         A formatted string message or None if formatting fails.
     """
     try:
-        # --- Extract Game Info ---
-        home_team = game.get('home_team')
-        away_team = game.get('away_team')
-        # --- Add Logging ---
-        game_id_fmt = game.get('game_id', 'N/A')
-        logger.info(f"[format_fade_alert] Checking game {game_id_fmt}. Game keys: {list(game.keys())}. Home team type: {type(home_team).__name__}, Away team type: {type(away_team).__name__}")
-        # --- End Logging ---
-        # Use team abbreviations if display names are missing/long
-        home_display = home_team.get('abbr') if home_team else 'Home'
-        away_display = away_team.get('abbr') if away_team else 'Away'
-        if not home_team or not away_team:
-             logger.warning(f"[format_fade_alert] Returning None because home_team or away_team is missing/falsy for game {game_id_fmt}")
-             return None # Need team objects
-
-        sport = opportunity.get('sport', 'unknown')
-        sport_name = 'NBA' if sport == 'nba' else 'NCAAB' if sport == 'ncaab' else sport.upper()
-        game_status = game.get('status', 'unknown')
-        game_id_log = opportunity.get('game_id', 'N/A') # For logging
-
-        # --- Extract Opportunity Info ---
-        market = opportunity.get('market')
-        faded_outcome_label = opportunity.get('faded_outcome_label')
-        faded_value = opportunity.get('faded_value') # Spread/Total value
-        odds = opportunity.get('odds')
-        implied_prob = opportunity.get('implied_probability')
-        # Accept either key format for flexibility
-        tickets_pct = opportunity.get('T%') or opportunity.get('tickets_percent')
-        money_pct = opportunity.get('M%') or opportunity.get('money_percent')
-        rating = opportunity.get('rating', 0) # Get the rating
-
-        if not all([market, faded_outcome_label, odds is not None, implied_prob is not None, tickets_pct is not None, money_pct is not None]):
-            logger.warning(f"Incomplete opportunity data for formatting: {game_id_log}")
+        fields = _fade_alert_fields(game, opportunity)
+        if not fields:
             return None
-
-        # --- Determine "Bet Against" Side and Value ---
-        bet_against_label = "N/A"
-        bet_against_value_str = "" # For spread/total value
-
-        if market == 'Spread':
-            opponent_spread_val = None
-            if faded_value is not None:
-                try:
-                    opponent_spread_val = -float(faded_value)
-                    bet_against_value_str = f"{opponent_spread_val:+.1f}" # Always show sign
-                except (ValueError, TypeError):
-                    bet_against_value_str = "N/A"
-
-            if faded_outcome_label == 'Home':
-                bet_against_label = f"{away_display} {bet_against_value_str}"
-            elif faded_outcome_label == 'Away':
-                bet_against_label = f"{home_display} {bet_against_value_str}"
-
-        elif market == 'Total':
-            bet_against_value_str = str(faded_value) if faded_value is not None else "N/A"
-            if faded_outcome_label == 'Over':
-                bet_against_label = f"Under {bet_against_value_str}"
-            elif faded_outcome_label == 'Under':
-                bet_against_label = f"Over {bet_against_value_str}"
-
-        elif market == 'Moneyline':
-            # No value string needed for ML bet against label
-            if faded_outcome_label == 'Home':
-                bet_against_label = f"{away_display} ML"
-            elif faded_outcome_label == 'Away':
-                bet_against_label = f"{home_display} ML"
-
-        # --- Format Faded Outcome Value ---
-        faded_value_str = ""
-        if faded_value is not None and market != 'Moneyline': # ML value is usually 0
-             try:
-                 faded_val_num = float(faded_value)
-                 faded_value_str = f" ({faded_val_num:+.1f})" if market == 'Spread' else f" ({faded_val_num})"
-             except (ValueError, TypeError):
-                 faded_value_str = f" ({faded_value})"
-
-        faded_outcome_full_label = f"{faded_outcome_label}{faded_value_str}"
+        market = fields['market']
+        tickets_pct = fields['tickets_pct']
+        money_pct = fields['money_pct']
+        implied_prob = fields['implied_prob']
+        faded_outcome_full_label = fields['faded_outcome_full_label']
 
         # --- Build Message (Structure V4.11) ---
         message_lines = []
-        stars = "⭐" * rating
+        stars = "⭐" * fields['rating']
         header_icon = "🚨"
         result_prefix = "Take" # Default for pending
 
@@ -197,33 +293,20 @@ def format_fade_alert(game: dict, opportunity: dict, result_status: Optional[str
 
         # Header
         # Remove stars from header
-        message_lines.append(f"{header_icon} <b>{sport_name} Fade Alert</b> {header_icon}")
+        message_lines.append(f"{header_icon} <b>{fields['sport_name']} Fade Alert</b> {header_icon}")
 
         # Game Info
-        message_lines.append(f"<b>Game:</b> {away_display} <b>vs</b> {home_display}")
-        if game_status.lower() in ['complete', 'closed', 'final']:
-            boxscore = game.get('boxscore', {})
-            away_score = boxscore.get('total_away_points', '?')
-            home_score = boxscore.get('total_home_points', '?')
-            message_lines.append(f"<b>Status:</b> Final Score: {away_display} {away_score} - {home_score} {home_display}")
-        else:
-            start_time_str = game.get('start_time')
-            time_display = "Time N/A"
-            if start_time_str:
-                try:
-                    start_dt = datetime.strptime(start_time_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-                    time_display = start_dt.strftime("%I:%M %p UTC") # Consider converting to user's timezone later
-                except ValueError:
-                    time_display = start_time_str
-            status_icon = get_game_status_icon(game_status)
-            message_lines.append(f"<b>Status:</b> {time_display} - {status_icon}")
+        message_lines.append(f"<b>Game:</b> {fields['away_display']} <b>vs</b> {fields['home_display']}")
+        message_lines.append(f"<b>Status:</b> {fields['status_line']}")
 
         # Analysis
         message_lines.append(f"\n📊 <b>Analysis (Book ID 15 - Public Betting):</b>")
         # Remove bullet points and leading spaces
         message_lines.append(f"<b>Public Favors:</b> {faded_outcome_full_label} <b>({tickets_pct:.1f}% of tickets)</b>")
         message_lines.append(f"Money %: {money_pct:.1f}%")
-        message_lines.append(f"Odds: {odds} (Implied Probability: {implied_prob:.1f}%)")
+        message_lines.append(f"Odds: {fields['odds']} (Implied Probability: {implied_prob:.1f}%)")
+        if fields['line_move']:
+            message_lines.append(f"Line now: {fields['line_move']}")
 
         # Fade Signal
         t_minus_ip = tickets_pct - implied_prob
@@ -232,32 +315,129 @@ def format_fade_alert(game: dict, opportunity: dict, result_status: Optional[str
         # Recommendation
         message_lines.append(f"\n✅ <b>Suggested Fade:</b>")
         # Remove bullet points and leading spaces
-        message_lines.append(f"{result_prefix} <b>{bet_against_label}</b>")
+        message_lines.append(f"{result_prefix} <b>{fields['bet_against_label']}</b>")
         # Add clarification of what is being faded
         fade_type_clarification = f"(Fading {faded_outcome_full_label} {market})"
         message_lines.append(fade_type_clarification)
 
-            # Add Fade Rating at the end (indent this inside the try block)
-        message_lines.append(f"\nFade Rating : {stars}") # Correct indentation
+        # Add Fade Rating at the end
+        message_lines.append(f"\nFade Rating : {stars}")
 
         # Add explanation based on market type
-        explanation = ""
-        if market == 'Total':
-            explanation = "<i>Fading the total means betting on the opposite outcome to what the public heavily favors. 'Over' means betting the combined score will be higher than the line; 'Under' means betting it will be lower.</i>"
-        elif market == 'Spread':
-            explanation = "<i>Fading the spread means betting on the opposing team to cover the point spread against the publicly favored side.</i>"
-        elif market == 'Moneyline':
-            explanation = "<i>Fading the moneyline means betting on the opposing team to win outright against the publicly favored side.</i>"
-
+        explanation = MARKET_EXPLANATIONS.get(market, "")
         if explanation:
             message_lines.append(f"\n{explanation}")
 
-            # Return inside the try block
-        return "\n".join(message_lines) # Correct indentation
-        # Remove the duplicate/mis-indented return statement
+        return "\n".join(message_lines)
 
     except Exception as e:
         game_id_log = opportunity.get('game_id', 'UNKNOWN')
         faded_label_log = opportunity.get('faded_outcome_label', 'UNKNOWN')
         logger.error(f"Error formatting fade alert for game {game_id_log}, opp: {faded_label_log}: {e}", exc_info=True)
-        return None # Return None on error
\ No newline at end of file
+        return None # Return None on error
+
+def format_fade_digest_entry(game: dict, opportunity: dict, result_status: Optional[str] = "pending") -> Optional[Tuple[str, str]]:
+    """Cached wrapper around _render_fade_digest_entry; see format_fade_alert."""
+    key = ('digest_entry', alert_identity(opportunity), result_status, game_state_version(game),
+           opportunity.get('closing_value'), opportunity.get('closing_odds'))
+    return render_cache.get_or_render(key, lambda: _render_fade_digest_entry(game, opportunity, result_status))
+
+def _render_fade_digest_entry(game: dict, opportunity: dict, result_status: Optional[str] = "pending") -> Optional[Tuple[str, str]]:
+    """
+    Formats one alert as a compact digest entry: the pick on two lines, with the
+    public-betting analysis folded into an expandable blockquote.
+
+    Returns:
+        (entry_text, market) or None if formatting fails.
+    """
+    try:
+        fields = _fade_alert_fields(game, opportunity)
+        if not fields:
+            return None
+        icon = {'won': "✅ Won -", 'lost': "❌ Lost -"}.get(result_status, "👉")
+        t_minus_ip = fields['tickets_pct'] - fields['implied_prob']
+        line_move = f"\nLine now: {fields['line_move']}" if fields['line_move'] else ""
+        lines = [
+            f"{'⭐' * fields['rating']} {icon} <b>{fields['bet_against_label']}</b> ({fields['market']})",
+            f"{fields['away_display']} vs {fields['home_display']} · {fields['status_line']}",
+            "<blockquote expandable>"
+            f"Public: {fields['faded_outcome_full_label']} {fields['tickets_pct']:.1f}% tickets / {fields['money_pct']:.1f}% money\n"
+            f"Odds: {fields['odds']} (IP {fields['implied_prob']:.1f}%) · Signal +{t_minus_ip:.1f}%{line_move}"
+            "</blockquote>",
+        ]
+        return "\n".join(lines), fields['market']
+    except Exception as e:
+        logger.error(f"Error formatting digest entry for game {opportunity.get('game_id', 'UNKNOWN')}: {e}", exc_info=True)
+        return None
+
+DIGEST_EDIT_HEADROOM = 256  # Room left per digest for entries to grow when the card is edited later
+
+def _digest_footer(markets) -> str:
+    return "\n\n".join(MARKET_EXPLANATIONS[m] for m in MARKET_EXPLANATIONS if m in markets)
+
+def _digest_entry(game: dict, alert: dict, result_status: Optional[str]) -> Optional[Tuple[str, str]]:
+    # result_status=None renders each alert with its own stored status
+    return format_fade_digest_entry(game, alert, result_status if result_status is not None else alert.get('status'))
+
+def pack_fade_digests(alerts: List[Tuple[dict, dict]], title: str, result_status: Optional[str] = "pending",
+                      max_length: int = TELEGRAM_MESSAGE_LIMIT) -> List[Tuple[str, List[Tuple[dict, dict]]]]:
+    """
+    Packs many fade alerts into as few messages as fit under Telegram's length limit,
+    leaving DIGEST_EDIT_HEADROOM spare so the message can be edited in place later.
+
+    Args:
+        alerts: (game, alert) pairs, rendered in the given order.
+        title: Digest heading, e.g. "NBA Fade Alerts".
+        result_status: Passed to each entry ('pending', 'won', 'lost'); None uses each alert's status.
+
+    Returns:
+        (message_text, page_alerts) per message. The market explanations are added
+        once per message, for the markets that message contains.
+    """
+    budget = max_length - DIGEST_EDIT_HEADROOM
+    header_reserve = len(f"🚨 <b>{title}</b> (999/999)\n\n")
+    pages = []  # Each page: (entry_texts, markets, page_alerts)
+    current, current_markets, current_alerts, current_len = [], set(), [], 0
+    for game, alert in alerts:
+        entry = _digest_entry(game, alert, result_status)
+        if not entry:
+            continue
+        text, market = entry
+        markets = current_markets | {market}
+        projected = header_reserve + current_len + len(text) + 2 + len(_digest_footer(markets)) + 2
+        if current and projected > budget:
+            pages.append((current, current_markets, current_alerts))
+            current, current_markets, current_alerts, current_len = [], set(), [], 0
+            markets = {market}
+        current.append(text)
+        current_alerts.append((game, alert))
+        current_markets = markets
+        current_len += len(text) + 2
+
+    if current:
+        pages.append((current, current_markets, current_alerts))
+
+    packed = []
+    for index, (page_entries, page_markets, page_alerts) in enumerate(pages, start=1):
+        part = f" ({index}/{len(pages)})" if len(pages) > 1 else ""
+        body = "\n\n".join(page_entries)
+        packed.append((f"🚨 <b>{title}</b>{part}\n\n{body}\n\n{_digest_footer(page_markets)}", page_alerts))
+    return packed
+
+def render_fade_digests(alerts: List[Tuple[dict, dict]], title: str, result_status: Optional[str] = "pending",
+                        max_length: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """Message texts of pack_fade_digests."""
+    return [text for text, _ in pack_fade_digests(alerts, title, result_status, max_length)]
+
+def render_fade_digest_page(alerts: List[Tuple[dict, dict]], title: str, part: str = "",
+                            result_status: Optional[str] = None) -> Optional[str]:
+    """
+    Re-renders one already-delivered digest message with its alerts' current state.
+    `part` is the page marker it was sent with (e.g. " (2/3)"). By default each
+    alert is shown with its own stored status.
+    """
+    entries = [entry for game, alert in alerts if (entry := _digest_entry(game, alert, result_status))]
+    if len(entries) != len(alerts):
+        return None
+    body = "\n\n".join(text for text, _ in entries)
+    return f"🚨 <b>{title}</b>{part}\n\n{body}\n\n{_digest_footer({market for _, market in entries})}"
@@ -4,9 +4,13 @@ from logging_setup import logger
 from api import nba, ncaab # Corrected import
 # Import specific functions and getters
 from db.connection import get_nba_collection, get_ncaab_collection
-from db.game_repo import update_or_insert_data, get_scheduled_games
+from db.game_repo import update_or_insert_data, get_scheduled_games, process_raw_games
 from db.utils import get_eastern_time_date
 from config import config
+from utils.odds_table import implied_probability as lookup_implied_probability
+from utils.market_probability import game_market_probabilities
+from utils.closing_lines import capture_closing_lines
+from services.tracing import tracer
 # Removed import of calculate_fade_rating_v2 to break circular dependency
 
 def determine_winner(game: dict) -> Optional[dict]:
@@ -105,32 +109,40 @@ def get_bet_percentages(game: dict, team_id: int) -> Tuple[Optional[float], Opti
 # --- NEW FUNCTION ---
 # --- NEW HELPER FUNCTION ---
 def calculate_implied_probability(odds: int) -> Optional[float]:
-    """Calculates implied probability from American odds."""
+    """Calculates implied probability from American odds (via the precomputed odds table)."""
     if odds is None:
         return None
-    try:
-        odds = int(odds)
-        if odds < 0: # Negative odds
-            return (abs(odds) / (abs(odds) + 100)) * 100
-        elif odds > 0: # Positive odds
-            return (100 / (odds + 100)) * 100
-        else: # Zero odds? Unlikely but handle
-             return None
-    except (ValueError, TypeError):
+    implied_prob = lookup_implied_probability(odds)
+    if implied_prob is None and odds != 0:
         logger.warning(f"Invalid odds format for probability calculation: {odds}")
-        return None
+    return implied_prob
+
+# --- Fade Scoring Parameters ---
+# Defaults used by the live fade engine; utils/fade_optimizer.py sweeps these offline.
+FADE_OVERVALUED_THRESHOLD = 15.0     # Minimum T% - IP gap for an outcome to qualify
+FADE_DIFFERENCE_BANDS = (25.0, 35.0) # Each T% - IP edge reached adds a star
+FADE_TICKET_BANDS = (85.0, 95.0)     # Each T% edge reached adds a star
+FADE_PUBLIC_MARGIN = 0.0             # T% must exceed M% by more than this margin
 
 # --- REVISED FUNCTION ---
 # Placed before get_market_data_book15
-def calculate_fade_rating_v2(t_pct: Optional[float], m_pct: Optional[float], implied_prob: Optional[float]) -> int:
+def calculate_fade_rating_v2(t_pct: Optional[float], m_pct: Optional[float], implied_prob: Optional[float],
+                             threshold: float = FADE_OVERVALUED_THRESHOLD,
+                             difference_bands: Tuple[float, ...] = FADE_DIFFERENCE_BANDS,
+                             ticket_bands: Tuple[float, ...] = FADE_TICKET_BANDS,
+                             public_margin: float = FADE_PUBLIC_MARGIN) -> int:
     """
     Calculates a 1-5 star rating for a fade opportunity based on the new formula.
-    Requires: (T% - IP >= 15%) AND (T% > M%)
+    Requires: (T% - IP >= threshold) AND (T% - M% > public_margin)
 
     Args:
         t_pct: Ticket percentage for the faded outcome.
         m_pct: Money percentage for the faded outcome.
         implied_prob: Implied probability for the faded outcome.
+        threshold: Minimum T% - IP difference to qualify (default 15%).
+        difference_bands: T% - IP edges that each add a star (default 25%, 35%).
+        ticket_bands: T% edges that each add a star (default 85%, 95%).
+        public_margin: Required T% over M% margin (default 0, i.e. plain T% > M%).
 
     Returns:
         An integer rating from 0 to 5.
@@ -140,23 +152,21 @@ def calculate_fade_rating_v2(t_pct: Optional[float], m_pct: Optional[float], imp
 
     # Base condition check
     difference = t_pct - implied_prob
-    if not (difference >= 15.0 and t_pct > m_pct):
+    if not (difference >= threshold and t_pct - m_pct > public_margin):
         return 0 # Does not meet minimum fade criteria
 
     # Calculate stars
     stars = 1 # Start with 1 star for meeting base criteria
 
     # Add stars based on difference magnitude
-    if difference >= 25.0:
-        stars += 1
-    if difference >= 35.0:
-        stars += 1
+    for edge in difference_bands:
+        if difference >= edge:
+            stars += 1
 
     # Add stars based on Ticket % magnitude
-    if t_pct >= 85.0:
-        stars += 1
-    if t_pct >= 95.0:
-        stars += 1
+    for edge in ticket_bands:
+        if t_pct >= edge:
+            stars += 1
 
     # Cap at 5 stars
     return min(stars, 5)
@@ -165,13 +175,16 @@ def calculate_fade_rating_v2(t_pct: Optional[float], m_pct: Optional[float], imp
 # get_market_data_book15 is no longer needed as we flatten the data in _process_game_data
 
 # --- REVISED FUNCTION ---
-def find_fade_opportunities(game: dict, sport: str) -> List[Dict[str, Any]]:
+def find_fade_opportunities(game: dict, sport: str,
+                            slate_probabilities: Optional[Dict[Any, Dict[Tuple[str, str], Dict[str, float]]]] = None) -> List[Dict[str, Any]]:
     """
     Analyzes a game's betting data (book_id 15) using the Ticket% vs Implied Probability formula.
 
     Args:
         game: The game data dictionary.
         sport: The sport ('nba' or 'ncaab').
+        slate_probabilities: Optional no-vig market probabilities precomputed for the
+            slate by compute_slate_probabilities; computed for this game if omitted.
 
     Returns:
         A list of dictionaries, each representing a fade opportunity.
@@ -212,8 +225,14 @@ def find_fade_opportunities(game: dict, sport: str) -> List[Dict[str, Any]]:
         logger.warning(f"[find_fade_opportunities] No market outcomes (spread, total, moneyline lists are all empty) found in game data for {game_id}. Game keys: {list(game.keys())}. Returning empty list.")
         return []
 
+    # No-vig fair probabilities for both sides of each market
+    if slate_probabilities is None:
+        market_probabilities = game_market_probabilities(game)
+    else:
+        market_probabilities = slate_probabilities.get(game_id, {})
+
     # Thresholds
-    threshold_overvalued = 15.0 # Ticket% - Implied Probability >= 15%
+    threshold_overvalued = FADE_OVERVALUED_THRESHOLD # Ticket% - Implied Probability >= 15%
 
     # --- Process Helper ---
     def _process_outcome(outcome: dict, market_type: str):
@@ -244,7 +263,7 @@ def find_fade_opportunities(game: dict, sport: str) -> List[Dict[str, Any]]:
 
             # Apply the new formula conditions (INDENTED)
             is_overvalued = (t_pct - implied_prob) >= threshold_overvalued
-            is_public_driven = t_pct > m_pct
+            is_public_driven = (t_pct - m_pct) > FADE_PUBLIC_MARGIN
 
             # --- ADD DETAILED LOGGING FOR CHECK (INDENTED) ---
             logger.debug(f"[find_fade_opportunities._process_outcome] Game {game_id}, Market {market_type}, Side {side}, Value {value}: "
@@ -268,6 +287,7 @@ def find_fade_opportunities(game: dict, sport: str) -> List[Dict[str, Any]]:
                     faded_label = side # Fallback (shouldn't happen with current structure)
 
                 reason = f"T% ({t_pct:.1f}) - IP ({implied_prob:.1f}) >= {threshold_overvalued} AND T% > M% ({m_pct:.1f})"
+                fair = market_probabilities.get((market_type, side), {})
 
                 opportunities.append({
                     'game_id': game_id,
@@ -281,6 +301,12 @@ def find_fade_opportunities(game: dict, sport: str) -> List[Dict[str, Any]]:
                     'M%': m_pct, # Already float
                     'rating': rating,
                     'reason': reason,
+                    # Vig-free view of the same market (None if the opposite side is missing)
+                    'fair_probability': round(fair['fair_probability'], 2) if fair else None,
+                    'market_hold': round(fair['hold'], 2) if fair else None,
+                    'fair_gap': round(t_pct - fair['fair_probability'], 2) if fair else None,
+                    'fade_ev': round(fair['fade_ev'], 2) if fair else None,
+                    'fade_odds': fair['fade_odds'] if fair else None, # Price of the side we bet
                 })
         except Exception as e:
              logger.error(f"Error processing outcome {outcome} in game {game_id}: {e}", exc_info=True)
@@ -375,22 +401,28 @@ async def fetch_and_store_data(date: Optional[str] = None, sport: str = "nba") -
         try:
             logger.info(f"Attempt {attempt + 1}/{max_retries} fetching {sport.upper()} data for date: {date or 'today'}")
 
-            # Direct call - these are synchronous functions
-            data = fetch_func(date)
+            # The fetch functions are synchronous (HTTP request, raw dump and raw response storage)
+            loop = asyncio.get_running_loop()
+            with tracer.span('api_fetch', sport=sport, attempt=attempt + 1):
+                data = await loop.run_in_executor(None, fetch_func, date)
 
             if data:
                 # Convert potentially blocking operation to a background task
                 target_date = date or get_eastern_time_date()[0]  # This is synchronous
 
                 # Run the synchronous DB operation in a thread pool
-                loop = asyncio.get_running_loop()
                 # Wrap the list of games ('data') into the dict structure expected by the DB function
                 db_payload = {"metadata": {}, "data": {"games": data}}
-                result = await loop.run_in_executor(
-                    None, lambda: update_or_insert_data(collection, db_payload, target_date)
-                )
+                with tracer.span('store_games', sport=sport, games=len(data)):
+                    result = await loop.run_in_executor(
+                        None, lambda: update_or_insert_data(collection, db_payload, target_date)
+                    )
 
                 logger.info(f"{sport.upper()} data storage result for {target_date}: {result}")
+
+                # Track closing lines for open alerts from this same snapshot
+                with tracer.span('closing_lines', sport=sport):
+                    await capture_closing_lines(process_raw_games(data), sport)
                 return True  # Success
             else:
                 logger.warning(f"Attempt {attempt + 1}: No data returned from {sport.upper()} API for {date or 'today'}.")
@@ -0,0 +1,102 @@
+import functools
+from typing import Any, Optional, Dict, Tuple, List
+from logging_setup import logger
+from utils.odds_table import implied_probability, profit_per_unit
+
+# Outcome sides that form a two-way market, per market key in markets['15']['event']
+MARKET_SIDES = {
+    'spread': ('home', 'away'),
+    'moneyline': ('home', 'away'),
+    'total': ('over', 'under'),
+}
+
+def _power_devig(implied_a: float, implied_b: float, iterations: int = 60) -> Tuple[float, float]:
+    """
+    Removes the margin with the power method: finds k so that a**k + b**k == 1.
+    Unlike plain normalisation, this loads more of the margin onto the longshot
+    (favourite-longshot bias), so the two sides end up with different EVs.
+    """
+    low, high = 0.5, 10.0
+    for _ in range(iterations):
+        k = (low + high) / 2
+        if implied_a ** k + implied_b ** k > 1:
+            low = k
+        else:
+            high = k
+    k = (low + high) / 2
+    fair_a = implied_a ** k
+    return fair_a, 1 - fair_a
+
+@functools.lru_cache(maxsize=4096)
+def fair_market_probabilities(game_id, market: str, odds_a: int, odds_b: int) -> Optional[Dict[str, float]]:
+    """
+    Removes the vig from a two-way market priced at (odds_a, odds_b).
+
+    Cached per (game, market, odds pair), so refreshes where the price did not move are free.
+
+    Returns:
+        A dict with (all in percent) implied_a/implied_b, fair_a/fair_b, hold and
+        ev_a/ev_b (expected value per unit staked on each side at its own odds,
+        valued at the fair probability), or None if either side's odds are invalid.
+    """
+    implied_a = implied_probability(odds_a)
+    implied_b = implied_probability(odds_b)
+    profit_a = profit_per_unit(odds_a)
+    profit_b = profit_per_unit(odds_b)
+    if None in [implied_a, implied_b, profit_a, profit_b]:
+        return None
+
+    overround = (implied_a + implied_b) / 100
+    fair_a, fair_b = _power_devig(implied_a / 100, implied_b / 100)
+    return {
+        'implied_a': implied_a,
+        'implied_b': implied_b,
+        'fair_a': fair_a * 100,
+        'fair_b': fair_b * 100,
+        'hold': (1 - 1 / overround) * 100, # Bookmaker margin as a share of stakes
+        'ev_a': (fair_a * profit_a - (1 - fair_a)) * 100,
+        'ev_b': (fair_b * profit_b - (1 - fair_b)) * 100,
+    }
+
+def game_market_probabilities(game: dict) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """
+    Pairs both outcomes of every book 15 market on a processed game and returns
+    per-side fair probability, hold and EV keyed by (market, side).
+    """
+    game_id = game.get('game_id') or game.get('id')
+    results = {}
+    for market, (side_a, side_b) in MARKET_SIDES.items():
+        outcomes = game.get(market)
+        if not isinstance(outcomes, list):
+            continue
+        odds_by_side = {}
+        for outcome in outcomes:
+            if isinstance(outcome, dict) and outcome.get('side') in (side_a, side_b):
+                odds_by_side.setdefault(outcome['side'], outcome.get('odds'))
+        odds_a, odds_b = odds_by_side.get(side_a), odds_by_side.get(side_b)
+        if odds_a is None or odds_b is None:
+            continue
+        try:
+            probs = fair_market_probabilities(game_id, market, int(odds_a), int(odds_b))
+        except (ValueError, TypeError):
+            logger.debug(f"Invalid odds pair for game {game_id} {market}: {odds_a}/{odds_b}")
+            continue
+        if not probs:
+            continue
+        for side, own, other in ((side_a, 'a', 'b'), (side_b, 'b', 'a')):
+            results[(market, side)] = {
+                'odds': int(odds_by_side[side]),
+                'implied_probability': probs[f'implied_{own}'],
+                'fair_probability': probs[f'fair_{own}'],
+                'hold': probs['hold'],
+                'ev': probs[f'ev_{own}'],
+                # The fade bets the other side of the same market
+                'fade_odds': int(odds_by_side[side_b if side == side_a else side_a]),
+                'fade_fair_probability': probs[f'fair_{other}'],
+                'fade_ev': probs[f'ev_{other}'],
+            }
+    return results
+
+def compute_slate_probabilities(games: List[dict]) -> Dict[Any, Dict[Tuple[str, str], Dict[str, float]]]:
+    """Computes market probabilities for a whole slate: game_id -> {(market, side): probabilities}."""
+    return {game.get('id') or game.get('game_id'): game_market_probabilities(game) for game in games}
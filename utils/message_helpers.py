@@ -2,14 +2,14 @@ import asyncio
 from aiogram import Bot, types
 from logging_setup import logger
 from utils.formatters import format_game_info
+from services.send_scheduler import send_scheduler, PRIORITY_REPLY
 
-async def send_long_message(chat_id: int, text: str, parse_mode: str = None, max_length: int = 4096):
-    """Sends a long message by splitting it into chunks."""
-    from bot import bot  # Import here to avoid circular imports
-    
+async def send_long_message(chat_id: int, text: str, parse_mode: str = None, max_length: int = 4096,
+                            priority: int = PRIORITY_REPLY):
+    """Sends a long message by splitting it into chunks, paced by the send scheduler."""
     if len(text) <= max_length:
         try:
-            await bot.send_message(chat_id, text, parse_mode=parse_mode)
+            await send_scheduler.send_message(chat_id, text, priority=priority, parse_mode=parse_mode)
         except Exception as e:
             logger.error(f"Failed to send message chunk to {chat_id}: {e}")
         return
@@ -29,8 +29,7 @@ async def send_long_message(chat_id: int, text: str, parse_mode: str = None, max
 
     for part in parts:
         try:
-            await bot.send_message(chat_id, part, parse_mode=parse_mode)
-            await asyncio.sleep(0.1) # Small delay between parts
+            await send_scheduler.send_message(chat_id, part, priority=priority, parse_mode=parse_mode)
         except Exception as e:
             logger.error(f"Failed to send message chunk to {chat_id}: {e}")
 
@@ -0,0 +1,61 @@
+"""
+Precomputed American-odds lookup tables.
+
+Book odds fall in a small discrete range, so implied probability and payout are
+computed once per integer price at import time and then read by index. Prices
+outside the table (or non-integer inputs) fall back to the direct formula.
+"""
+from typing import List, Optional
+
+ODDS_MIN = -10000
+ODDS_MAX = 10000
+
+def _compute_implied(odds: int) -> Optional[float]:
+    """Implied probability in percent for integer American odds (None for 0)."""
+    if odds < 0:
+        return (-odds / (-odds + 100)) * 100
+    if odds > 0:
+        return (100 / (odds + 100)) * 100
+    return None
+
+def _compute_profit(odds: int) -> Optional[float]:
+    """Profit per unit staked for integer American odds (None for 0)."""
+    if odds < 0:
+        return 100 / -odds
+    if odds > 0:
+        return odds / 100
+    return None
+
+# Index i holds the value for odds ODDS_MIN + i
+_IMPLIED: List[Optional[float]] = [_compute_implied(o) for o in range(ODDS_MIN, ODDS_MAX + 1)]
+_PROFIT: List[Optional[float]] = [_compute_profit(o) for o in range(ODDS_MIN, ODDS_MAX + 1)]
+
+def _as_int(odds) -> Optional[int]:
+    if type(odds) is int:
+        return odds
+    try:
+        return int(odds)
+    except (ValueError, TypeError):
+        return None
+
+def implied_probability(odds) -> Optional[float]:
+    """Implied probability (percent) for American odds, or None if the odds are invalid."""
+    if type(odds) is int and ODDS_MIN <= odds <= ODDS_MAX:
+        return _IMPLIED[odds - ODDS_MIN]
+    odds = _as_int(odds)
+    if odds is None:
+        return None
+    if ODDS_MIN <= odds <= ODDS_MAX:
+        return _IMPLIED[odds - ODDS_MIN]
+    return _compute_implied(odds)
+
+def profit_per_unit(odds) -> Optional[float]:
+    """Profit per unit staked at American odds, or None if the odds are invalid."""
+    if type(odds) is int and ODDS_MIN <= odds <= ODDS_MAX:
+        return _PROFIT[odds - ODDS_MIN]
+    odds = _as_int(odds)
+    if odds is None:
+        return None
+    if ODDS_MIN <= odds <= ODDS_MAX:
+        return _PROFIT[odds - ODDS_MIN]
+    return _compute_profit(odds)
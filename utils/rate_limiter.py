@@ -1,16 +1,30 @@
 import time
 import functools
 import asyncio
-from collections import defaultdict
-from typing import Tuple, Optional
+from contextvars import ContextVar
+from typing import Dict, Tuple, Optional
 from aiogram import types
 from logging_setup import logger
 from config import ADMIN_IDS, COMMAND_TIMEOUT, config # Import config instead of is_admin
 from services.metrics import metrics
+from services.admission import admission
+from services.send_scheduler import send_scheduler
+from services.tracing import tracer
+from utils.timing_wheel import TimingWheel
 
 class RateLimiter:
+    """
+    Per-(user, command) cooldowns using GCRA (generic cell rate algorithm).
+
+    Each key stores only its theoretical arrival time (TAT): a command is allowed
+    once the TAT has passed, and each allowed command pushes the TAT one cooldown
+    ahead. Checks are O(1). Keys are dropped by a timing wheel when their TAT
+    passes, so memory is bounded by the users active within the longest cooldown
+    and no periodic full scan is needed.
+    """
     def __init__(self):
-        self.command_times = defaultdict(list)  # user_id -> list of command timestamps
+        self._tat: Dict[Tuple[int, str], float] = {}  # (user_id, command) -> theoretical arrival time
+        self._wheel = TimingWheel(tick=1.0, slots=64, levels=2, start=time.monotonic())
         self.cooldowns = {
             'default': 3,       # 3 seconds between commands
             'start': 30,        # 30 seconds between /start commands
@@ -36,34 +50,58 @@ class RateLimiter:
         }
 
     def check_rate_limit(self, user_id: int, command: str) -> Tuple[bool, float]:
-        """Check if user is rate limited. Returns (is_limited, wait_time)."""
-        current_time = time.time()
+        """Check if user is rate limited for this command. Returns (is_limited, wait_time)."""
+        now = time.monotonic()
+        self._expire(now)
         command_key = command[1:] if command.startswith('/') else command
         cooldown = self.cooldowns.get(command_key, self.cooldowns['default'])
+        key = (user_id, command_key)
 
-        self.command_times[user_id] = [t for t in self.command_times[user_id]
-                                     if current_time - t < max(self.cooldowns.values())]
-
-        if self.command_times[user_id]:
-            time_since_last = current_time - self.command_times[user_id][-1]
-            if time_since_last < cooldown:
-                return True, cooldown - time_since_last
+        tat = self._tat.get(key)
+        if tat is not None and tat > now:
+            return True, tat - now
 
-        self.command_times[user_id].append(current_time)
+        self._tat[key] = now + cooldown
+        self._wheel.schedule(key, now + cooldown)
         return False, 0
 
     def cleanup_old_data(self):
-        """Remove data older than the longest cooldown."""
-        current_time = time.time()
-        longest_cooldown = max(self.cooldowns.values())
-        for user_id in list(self.command_times.keys()):
-            self.command_times[user_id] = [t for t in self.command_times[user_id]
-                                         if current_time - t < longest_cooldown]
-            if not self.command_times[user_id]:
-                del self.command_times[user_id]
+        """Drops keys whose cooldown has passed (the checks already do this incrementally)."""
+        self._expire(time.monotonic())
+
+    def get_stats(self) -> dict:
+        return {'tracked_keys': len(self._tat), 'scheduled_expiries': self._wheel.size}
+
+    def _expire(self, now: float):
+        for key in self._wheel.advance(now):
+            tat = self._tat.get(key)
+            if tat is None:
+                continue
+            if tat <= now:
+                del self._tat[key]
+            else:
+                self._wheel.schedule(key, tat)  # Returned early (beyond the wheel's horizon)
 
 rate_limiter = RateLimiter()
 
+# Rate limit decision made by the pre-dispatch middleware for the current update:
+# (user_id, command, is_limited, wait_time). Saves handlers re-parsing and re-checking.
+_prechecked: ContextVar[Optional[tuple]] = ContextVar('rate_limit_prechecked', default=None)
+
+def parse_command(text: Optional[str]) -> str:
+    """The lower-cased command a message starts with, or "unknown"."""
+    return text.split()[0].lower() if text and text.startswith('/') else "unknown"
+
+def precheck_rate_limit(user_id: int, command: str) -> Tuple[bool, float]:
+    """Checks the rate limit once per update and records the decision for rate_limited_command."""
+    result = rate_limiter.check_rate_limit(user_id, command)
+    _prechecked.set((user_id, command) + result)
+    return result
+
+def reset_rate_limit_precheck():
+    """Forgets the recorded decision once the update has been handled."""
+    _prechecked.set(None)
+
 def rate_limited_command(cooldown_message="Please wait before using this command again."):
     def decorator(func):
         @functools.wraps(func)
@@ -79,14 +117,21 @@ def rate_limited_command(cooldown_message="Please wait before using this command
 
             user_id = message.from_user.id
             
+            prechecked = _prechecked.get()
+            if prechecked and prechecked[0] == user_id:
+                command, is_limited, wait_time = prechecked[1:]
+            else:
+                command = parse_command(getattr(message, 'text', None))
+                is_limited, wait_time = None, 0
+
             # Skip rate limiting for admins
             if config.is_admin(user_id): # Use config.is_admin()
                 # Log command but don't rate limit
-                command = message.text.split()[0].lower() if hasattr(message, 'text') and message.text and message.text.startswith('/') else "unknown"
                 start_time = time.monotonic()
                 success = True
                 try:
-                    return await func(message, *args, **kwargs)
+                    with tracer.trace(command, user_id=user_id, admin=True):
+                        return await func(message, *args, **kwargs)
                 except Exception as e:
                     success = False
                     raise e
@@ -97,33 +142,39 @@ def rate_limited_command(cooldown_message="Please wait before using this command
                     if execution_time > COMMAND_TIMEOUT:
                         logger.warning(f"Slow command execution: {command} took {execution_time:.2f}s for admin {user_id}")
                 
-            command = message.text.split()[0].lower() if hasattr(message, 'text') and message.text and message.text.startswith('/') else "unknown"
-
-            is_limited, wait_time = rate_limiter.check_rate_limit(user_id, command)
+            if is_limited is None:
+                is_limited, wait_time = rate_limiter.check_rate_limit(user_id, command)
             if is_limited:
                 try:
-                    await message.answer(
+                    await send_scheduler.answer(message,
                         f"{cooldown_message} (Try again in {wait_time:.1f} seconds)"
                     )
                 except Exception as e:
                     logger.error(f"Error sending rate limit message to {user_id}: {e}")
                 return
 
-            # Log execution time with metrics
-            start_time = time.monotonic()
-            success = True
-            try:
-                return await func(message, *args, **kwargs)
-            except Exception as e:
-                success = False
-                # Re-raise the exception to be caught by the error middleware
-                raise e
-            finally:
-                end_time = time.monotonic()
-                execution_time = end_time - start_time
-                metrics.log_command(command, user_id, execution_time, success)
-                if execution_time > COMMAND_TIMEOUT:
-                    logger.warning(f"Slow command execution: {command} took {execution_time:.2f}s for user {user_id}")
+            # Expensive commands also need a slot in their command class
+            async with admission.admit(command) as admitted:
+                if not admitted:
+                    await admission.reject(message, command)
+                    return
+
+                # Log execution time with metrics
+                start_time = time.monotonic()
+                success = True
+                try:
+                    with tracer.trace(command, user_id=user_id):
+                        return await func(message, *args, **kwargs)
+                except Exception as e:
+                    success = False
+                    # Re-raise the exception to be caught by the error middleware
+                    raise e
+                finally:
+                    end_time = time.monotonic()
+                    execution_time = end_time - start_time
+                    metrics.log_command(command, user_id, execution_time, success)
+                    if execution_time > COMMAND_TIMEOUT:
+                        logger.warning(f"Slow command execution: {command} took {execution_time:.2f}s for user {user_id}")
 
         return wrapper
     return decorator
\ No newline at end of file
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+def alert_identity(alert: dict) -> tuple:
+    """
+    Stable identity for an alert. Uses the Mongo ID when present; freshly stored
+    alerts don't carry it yet, so the unique pending-alert fields are used instead.
+    """
+    if alert.get('_id') is not None:
+        return ('id', str(alert['_id']))
+    return (alert.get('sport'), alert.get('game_id'), alert.get('market'),
+            alert.get('faded_outcome_label'), alert.get('faded_value'), alert.get('date'))
+
+def game_state_version(game: dict) -> tuple:
+    """
+    The parts of a game snapshot that appear in a rendered alert. When any of them
+    changes (status, tip time, score), the version changes and cached renders miss.
+    """
+    boxscore = game.get('boxscore') or {}
+    return (
+        game.get('status'),
+        game.get('start_time'),
+        boxscore.get('total_away_points'),
+        boxscore.get('total_home_points'),
+        (game.get('home_team') or {}).get('abbr'),
+        (game.get('away_team') or {}).get('abbr'),
+    )
+
+class RenderCache:
+    """
+    LRU cache of rendered alert HTML keyed by (format, alert identity, result status,
+    game state version). Every recipient of the same alert state shares one render.
+    Entries for older game states are never hit again and age out of the LRU.
+    """
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], Optional[object]]) -> Optional[object]:
+        """Returns the cached value for `key`, rendering and caching it on a miss. Failed (None) renders aren't cached."""
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            value = render()
+            if value is not None:
+                self._entries[key] = value
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Entry count and hit ratio for /botstats."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits / lookups * 100) if lookups else 0.0,
+        }
+
+# Create singleton instance
+render_cache = RenderCache()
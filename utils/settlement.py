@@ -0,0 +1,140 @@
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from logging_setup import logger
+
+# Faded side labels as stored on fade alerts
+HOME = 'Home'
+AWAY = 'Away'
+OVER = 'Over'
+UNDER = 'Under'
+
+class FadeGrades(NamedTuple):
+    """Parallel result vectors from grade_fades. A row with all three False could not be graded."""
+    won: List[bool]
+    lost: List[bool]
+    push: List[bool]
+
+    def statuses(self) -> List[Optional[str]]:
+        """Alert status per row ('won', 'lost', 'push') or None when ungraded."""
+        return [
+            'won' if w else 'lost' if l else 'push' if p else None
+            for w, l, p in zip(self.won, self.lost, self.push)
+        ]
+
+def game_settlement_inputs(game: dict) -> Tuple[Optional[float], Optional[float], Optional[str]]:
+    """
+    Extracts (home_score, away_score, winner_side) from a processed game once,
+    so every alert on the game can be graded without re-reading the boxscore.
+    winner_side is 'Home', 'Away' or None when the winner is unknown or tied.
+    """
+    boxscore = game.get('boxscore') or {}
+    home_score = boxscore.get('total_home_points')
+    away_score = boxscore.get('total_away_points')
+
+    home_id = game.get('home_team_id') or (game.get('home_team') or {}).get('id')
+    away_id = game.get('away_team_id') or (game.get('away_team') or {}).get('id')
+    winning_team_id = game.get('winning_team_id')
+
+    winner_side = None
+    if winning_team_id and winning_team_id == home_id:
+        winner_side = HOME
+    elif winning_team_id and winning_team_id == away_id:
+        winner_side = AWAY
+    elif home_score is not None and away_score is not None and game.get('status', '').lower() in ['complete', 'closed']:
+        if home_score > away_score:
+            winner_side = HOME
+        elif away_score > home_score:
+            winner_side = AWAY
+
+    return home_score, away_score, winner_side
+
+def grade_fades(markets: Sequence[str], faded_sides: Sequence[str], lines: Sequence[Optional[float]],
+                home_scores: Sequence[Optional[float]], away_scores: Sequence[Optional[float]],
+                winners: Sequence[Optional[str]]) -> FadeGrades:
+    """
+    Grades many fade alerts in one call.
+
+    All arguments are parallel sequences, one entry per alert:
+        markets: 'Spread', 'Total' or 'Moneyline'.
+        faded_sides: 'Home'/'Away' (spread, moneyline) or 'Over'/'Under' (total).
+        lines: The faded side's spread or the total line (ignored for moneyline).
+        home_scores / away_scores: Final scores.
+        winners: 'Home', 'Away' or None (moneyline only).
+
+    A fade wins when the faded side loses: the faded team fails to cover
+    (margin + spread < 0), the total lands on the other side of the line, or
+    the opponent wins outright. Exact landings are pushes.
+
+    Returns:
+        FadeGrades with won/lost/push vectors aligned with the inputs.
+    """
+    n = len(markets)
+    won = [False] * n
+    lost = [False] * n
+    push = [False] * n
+    ungraded = 0
+
+    for i, (market, side, line, home, away, winner) in enumerate(
+            zip(markets, faded_sides, lines, home_scores, away_scores, winners)):
+        if market == 'Moneyline':
+            if winner is None or side not in (HOME, AWAY):
+                ungraded += 1
+                continue
+            # Fade wins when the faded side did not win
+            won[i] = winner != side
+            lost[i] = not won[i]
+            continue
+
+        if home is None or away is None or line is None:
+            ungraded += 1
+            continue
+
+        if market == 'Spread':
+            if side == HOME:
+                result = (home - away) + line
+            elif side == AWAY:
+                result = (away - home) + line
+            else:
+                ungraded += 1
+                continue
+        elif market == 'Total':
+            if side == OVER:
+                result = (home + away) - line
+            elif side == UNDER:
+                result = line - (home + away)
+            else:
+                ungraded += 1
+                continue
+        else:
+            ungraded += 1
+            continue
+
+        # result > 0 means the faded side hit, so the fade lost
+        if result > 0:
+            lost[i] = True
+        elif result < 0:
+            won[i] = True
+        else:
+            push[i] = True
+
+    if ungraded:
+        logger.debug(f"[grade_fades] {ungraded}/{n} alerts could not be graded (missing scores, line or winner).")
+    return FadeGrades(won, lost, push)
+
+def grade_alerts_for_game(game: dict, alerts: List[dict]) -> FadeGrades:
+    """Convenience wrapper grading all alerts for a single completed game."""
+    home_score, away_score, winner_side = game_settlement_inputs(game)
+    n = len(alerts)
+    lines = []
+    for alert in alerts:
+        try:
+            lines.append(float(alert.get('faded_value')) if alert.get('faded_value') is not None else None)
+        except (ValueError, TypeError):
+            lines.append(None)
+    return grade_fades(
+        [a.get('market') for a in alerts],
+        [a.get('faded_outcome_label') for a in alerts],
+        lines,
+        [home_score] * n,
+        [away_score] * n,
+        [winner_side] * n,
+    )
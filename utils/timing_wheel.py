@@ -0,0 +1,69 @@
+import math
+from typing import Hashable, List, Tuple
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel for expiring keys without scanning everything.
+
+    Level 0 has `slots` buckets of one tick each; every higher level covers
+    `slots` times the span of the one below. Keys due far out sit in a coarse
+    level and cascade down as their time approaches. Scheduling is O(1), and
+    advancing costs O(1) per elapsed tick plus O(1) per key due. Keys due beyond
+    the wheel's horizon come back at the horizon, so callers should re-check a
+    returned key and reschedule it if it isn't actually due yet.
+    """
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 3, start: float = 0.0):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels: List[List[List[Tuple[int, Hashable]]]] = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._current = int(start // tick)
+        self._span = slots ** levels
+        self.size = 0
+
+    def schedule(self, key: Hashable, expire_at: float):
+        """Schedules `key` to be returned by advance() once `expire_at` has passed."""
+        self._place(max(math.ceil(expire_at / self.tick), self._current + 1), key)
+        self.size += 1
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Moves the wheel to `now` and returns the keys that became due."""
+        target = int(now // self.tick)
+        expired = []
+        if target - self._current >= self._span:
+            # Idle for longer than the wheel spans: everything scheduled is due
+            for level in self._wheels:
+                for bucket in level:
+                    expired.extend(key for _, key in bucket)
+                    bucket.clear()
+            self._current = target
+            self.size = 0
+            return expired
+
+        while self._current < target:
+            self._current += 1
+            # Cascade coarser buckets whose span starts at this tick into finer levels
+            for level in range(1, self.levels):
+                width = self.slots ** level
+                if self._current % width:
+                    break
+                index = (self._current // width) % self.slots
+                bucket, self._wheels[level][index] = self._wheels[level][index], []
+                for due, key in bucket:
+                    self._place(due, key)
+            index = self._current % self.slots
+            bucket, self._wheels[0][index] = self._wheels[0][index], []
+            expired.extend(key for _, key in bucket)
+        self.size -= len(expired)
+        return expired
+
+    def _place(self, due: int, key: Hashable):
+        for level in range(self.levels):
+            width = self.slots ** level
+            if due // width - self._current // width < self.slots:
+                self._wheels[level][(due // width) % self.slots].append((due, key))
+                return
+        # Beyond the wheel's horizon: park in the last bucket of the top level
+        width = self.slots ** (self.levels - 1)
+        due = (self._current // width + self.slots - 1) * width
+        self._wheels[-1][(due // width) % self.slots].append((due, key))